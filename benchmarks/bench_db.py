@@ -0,0 +1,262 @@
+"""Benchmark the common operations of the database layer on a synthetic dataset.
+
+Copies the template database of a scale from ``src.db.synthetic`` (building it on the
+first run) next to the database of ``DATABASE_URL``, then runs each operation repeatedly
+and reports its latency percentiles and the queries it sends. Authors, groups and posts
+are picked with the skew of the dataset, so hot groups and prolific authors are hit
+most, like in production. Writes run in a transaction that is rolled back, so every run
+sees the same data.
+
+Run with ``python -m benchmarks.bench_db``. Pass a scale (``small``, ``medium`` or
+``large``) and the runs per operation, e.g. ``large 500``.
+``src/db/tests/test_db_benchmarks.py`` runs the same operations under pytest.
+"""
+
+import random
+import statistics
+import sys
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import timedelta
+
+from sqlalchemy import Engine, create_engine, event, select
+from sqlalchemy.orm import Session
+
+from src.db.connector import database_url
+from src.db.feeds import group_feed
+from src.db.models import Groups, Posts, Users
+from src.db.post_counts import group_post_counts
+from src.db.repository import Repository
+from src.db.search import search_posts
+from src.db.synthetic import (
+    SCALES,
+    DatasetSpec,
+    clone_database,
+    domain,
+    drop_database,
+    email,
+    ensure_template,
+    word,
+    zipf_weights,
+)
+
+RUNS = 200
+Operation = Callable[[Session, random.Random], object]
+
+
+@dataclass
+class OperationStats:
+    """Latency and query counts of an operation.
+
+    Attributes
+    ----------
+    name
+        The operation.
+    runs
+        Times it ran.
+    p50, p95, p99
+        Latency percentiles in milliseconds.
+    queries
+        Queries sent per run, on average.
+    """
+
+    name: str
+    runs: int
+    p50: float
+    p95: float
+    p99: float
+    queries: float
+
+
+class QueryCounter:
+    """Counts the statements an engine sends while attached."""
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self.count = 0
+
+    def _count(self, *args) -> None:
+        self.count += 1
+
+    def __enter__(self) -> "QueryCounter":
+        event.listen(self.engine, "before_cursor_execute", self._count)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        event.remove(self.engine, "before_cursor_execute", self._count)
+
+
+def operations(spec: DatasetSpec, session: Session) -> dict[str, Operation]:
+    """Build the benchmarked operations.
+
+    Each draws its author, group or word with the skew of the dataset.
+
+    Returns
+    -------
+        dict[str, Operation]: The operations by name, taking a session and a random
+        generator
+    """
+    authors = zipf_weights(spec.users, spec.author_skew)
+    groups = zipf_weights(spec.groups, spec.group_skew)
+    words = zipf_weights(spec.vocabulary, 1.0)
+    # Ids are not assigned in rank order, look them up once rather than in every run.
+    user_ids = dict(session.execute(select(Users.email, Users.id)).tuples().all())
+    group_ids = dict(session.execute(select(Groups.domain, Groups.id)).tuples().all())
+
+    def author(rng: random.Random) -> int:
+        return user_ids[email(rng.choices(range(spec.users), cum_weights=authors)[0])]
+
+    def group(rng: random.Random) -> int:
+        return group_ids[domain(rng.choices(range(spec.groups), cum_weights=groups)[0])]
+
+    def user_with_posts(session: Session, rng: random.Random):
+        return Repository(session, strict=True).user(author(rng), profile="user_posts")
+
+    def post_by_id(session: Session, rng: random.Random):
+        return Repository(session, strict=True).post(rng.randint(1, spec.posts))
+
+    def group_feed_page(session: Session, rng: random.Random):
+        return group_feed(session, group(rng), strict=True)
+
+    def group_feed_three_pages(session: Session, rng: random.Random):
+        group_id = group(rng)
+        page = group_feed(session, group_id, strict=True)
+        for _ in range(2):
+            if page.next_cursor is None:
+                break
+            page = group_feed(session, group_id, cursor=page.next_cursor, strict=True)
+        return page
+
+    def search(session: Session, rng: random.Random):
+        return search_posts(
+            session,
+            word(rng.choices(range(spec.vocabulary), cum_weights=words)[0]),
+            strict=True,
+        )
+
+    def dashboard_counts(session: Session, rng: random.Random):
+        return group_post_counts(session, range(1, 101))
+
+    def add_post(session: Session, rng: random.Random):
+        post = Posts(
+            title="New post",
+            content="",
+            author_id=author(rng),
+            group_id=group(rng),
+            date_created=spec.start + timedelta(days=spec.days),
+        )
+        session.add(post)
+        session.flush()
+        return post
+
+    return {
+        "user_with_posts": user_with_posts,
+        "post_by_id": post_by_id,
+        "group_feed_page": group_feed_page,
+        "group_feed_three_pages": group_feed_three_pages,
+        "search": search,
+        "dashboard_counts": dashboard_counts,
+        "add_post": add_post,
+    }
+
+
+def measure(
+    engine: Engine,
+    session: Session,
+    name: str,
+    operation: Operation,
+    runs: int,
+    seed: int = 0,
+) -> OperationStats:
+    """Run an operation ``runs`` times in a session and collect its latency and queries.
+
+    The session's identity map is cleared before each run, so objects loaded by one run
+    are not reused by the next.
+
+    Returns
+    -------
+        OperationStats: The statistics
+    """
+    rng = random.Random(seed)
+    timings = []
+    with QueryCounter(engine) as counter:
+        for _ in range(runs):
+            session.expunge_all()
+            start = time.perf_counter()
+            operation(session, rng)
+            timings.append((time.perf_counter() - start) * 1000)
+    percentiles = statistics.quantiles(timings, n=100, method="inclusive")
+    return OperationStats(
+        name,
+        runs,
+        percentiles[49],
+        percentiles[94],
+        percentiles[98],
+        counter.count / runs,
+    )
+
+
+def run_benchmarks(
+    engine: Engine, spec: DatasetSpec, runs: int = RUNS
+) -> list[OperationStats]:
+    """Measure every operation in a transaction rolled back so writes leave no trace.
+
+    Returns
+    -------
+        list[OperationStats]: The statistics of each operation
+    """
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        with Session(
+            bind=connection, join_transaction_mode="create_savepoint"
+        ) as session:
+            benchmarked = operations(spec, session)
+            stats = [
+                measure(engine, session, name, operation, runs)
+                for name, operation in benchmarked.items()
+            ]
+        transaction.rollback()
+    return stats
+
+
+def print_stats(stats: list[OperationStats]) -> None:
+    """Print the statistics as a table."""
+    print(
+        f"{'operation':24} {'runs':>5} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+        f"{'queries':>7}"
+    )
+    for stat in stats:
+        print(
+            f"{stat.name:24} {stat.runs:>5} {stat.p50:>8.2f} {stat.p95:>8.2f} "
+            f"{stat.p99:>8.2f} {stat.queries:>7.1f}"
+        )
+
+
+def main(scale: str = "small", runs: int = RUNS) -> None:
+    """Print the statistics of every operation on a copy of the dataset of a scale.
+
+    Parameters
+    ----------
+    scale
+        The dataset scale, a key of ``SCALES``.
+    runs
+        Runs per operation.
+    """
+    spec = SCALES[scale]
+    url = clone_database(
+        ensure_template(database_url(), spec), f"{database_url().database}_bench"
+    )
+    engine = create_engine(url)
+    try:
+        print_stats(run_benchmarks(engine, spec, runs))
+    finally:
+        engine.dispose()
+        drop_database(url)
+
+
+if __name__ == "__main__":
+    main(
+        sys.argv[1] if len(sys.argv) > 1 else "small",
+        int(sys.argv[2]) if len(sys.argv) > 2 else RUNS,
+    )
@@ -0,0 +1,128 @@
+"""Benchmark concurrent database lookups through the sync and the async sessions.
+
+Seeds users, groups and posts into the database of ``DATABASE_URL`` (the tables are
+recreated, so never point it at data you want to keep), then runs the same mix of
+lookups at increasing concurrency: the sync path on a thread pool with ``get_session``
+and ``Repository``, the async path as tasks with ``get_async_session`` and
+``AsyncRepository``. Both load the same eager profiles and share the pool settings, so
+the difference is the driver and the thread hops.
+
+Run with ``python -m benchmarks.bench_db_async``. Pass the number of lookups per run,
+e.g. ``5000``.
+"""
+
+import asyncio
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.db.async_connector import dispose_async_engines, get_async_session
+from src.db.async_repository import AsyncRepository
+from src.db.bulk import ingest_groups, ingest_posts, ingest_users
+from src.db.connector import Base, dispose_engines, get_engine, get_session
+from src.db.passwords import hash_password
+from src.db.repository import Repository
+
+CONCURRENCY = (1, 10, 50, 100)
+USERS = 1_000
+GROUPS = 50
+POSTS_PER_USER = 5
+
+
+def seed() -> None:
+    """Recreate the tables and load the benchmark data."""
+    engine = get_engine()
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    # Hashed once, so loading the users does not hash every password.
+    password = hash_password("pw")
+    ingest_users(
+        engine,
+        (
+            {"name": f"User {i}", "email": f"user{i}@you.com", "password": password}
+            for i in range(USERS)
+        ),
+    )
+    ingest_groups(
+        engine,
+        ({"name": f"Group {i}", "domain": f"group{i}.com"} for i in range(GROUPS)),
+    )
+    ingest_posts(
+        engine,
+        (
+            {
+                "title": f"Post {i}",
+                "author_email": f"user{i % USERS}@you.com",
+                "group_domain": f"group{i % GROUPS}.com",
+            }
+            for i in range(USERS * POSTS_PER_USER)
+        ),
+    )
+
+
+def sync_lookup(i: int) -> None:
+    """Look up a user with their posts and a group, with a sync session."""
+    with get_session(readonly=True) as session:
+        repository = Repository(session, strict=True)
+        repository.user_by_email(f"user{i % USERS}@you.com", profile="user_posts")
+        repository.group_by_domain(f"group{i % GROUPS}.com")
+
+
+async def async_lookup(i: int, limiter: asyncio.Semaphore) -> None:
+    """Look up a user with their posts and a group, with an async session."""
+    async with limiter, get_async_session(readonly=True) as session:
+        repository = AsyncRepository(session)
+        await repository.user_by_email(f"user{i % USERS}@you.com")
+        await repository.group_by_domain(f"group{i % GROUPS}.com", profile="group")
+
+
+def run_sync(lookups: int, concurrency: int) -> float:
+    """Run the lookups on a thread pool and return the wall time in seconds."""
+    with ThreadPoolExecutor(concurrency) as executor:
+        start = time.perf_counter()
+        list(executor.map(sync_lookup, range(lookups)))
+        return time.perf_counter() - start
+
+
+async def run_async(lookups: int, concurrency: int) -> float:
+    """Run the lookups as tasks and return the wall time in seconds."""
+    limiter = asyncio.Semaphore(concurrency)
+    start = time.perf_counter()
+    await asyncio.gather(*(async_lookup(i, limiter) for i in range(lookups)))
+    return time.perf_counter() - start
+
+
+def main(lookups: int = 2_000) -> None:
+    """Print the lookups per second of both paths at each concurrency.
+
+    Parameters
+    ----------
+    lookups
+        The lookups per run.
+    """
+    seed()
+    # Warm up the pool so connection setup is not counted against the first run.
+    run_sync(100, 10)
+    print(f"{'concurrency':>11} {'sync/s':>9} {'async/s':>9}")
+    for concurrency in CONCURRENCY:
+        sync_seconds = run_sync(lookups, concurrency)
+
+        async def run(concurrency: int = concurrency) -> float:
+            # Connections belong to the event loop that opened them, and each run has
+            # its own loop, so warm up and dispose of the async pool per run.
+            try:
+                await run_async(100, 10)
+                return await run_async(lookups, concurrency)
+            finally:
+                await dispose_async_engines()
+
+        async_seconds = asyncio.run(run())
+        print(
+            f"{concurrency:>11} {lookups / sync_seconds:>9.0f} "
+            f"{lookups / async_seconds:>9.0f}"
+        )
+    dispose_engines()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2_000)
@@ -0,0 +1,113 @@
+"""Benchmark password verification, the CPU cost of a login.
+
+Verifies a batch of passwords with the current scrypt parameters of
+``src.db.passwords``, first inline on the event loop thread, then from concurrent
+coroutines through ``PasswordHasher`` pools of 1 to ``os.cpu_count()`` workers. For
+each, reports the logins per second, per worker (a worker keeps one core busy), the mean
+latency of a login and the longest stall of the event loop: inline verification stalls
+it for every login, the pool only while queueing.
+
+Run with ``python -m benchmarks.bench_passwords``. Pass the logins per run, e.g.
+``200``.
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+from src.db.passwords import PasswordHasher, hash_password, verify_password
+
+LOGINS = 100
+TICK = 0.001
+PASSWORD = "correct horse battery staple"
+
+
+async def loop_stall(stop: asyncio.Event) -> float:
+    """Measure the longest delay of the event loop in waking a coroutine every ``TICK``.
+
+    Runs until ``stop`` is set.
+
+    Returns
+    -------
+        float: The longest stall in milliseconds
+    """
+    longest = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        longest = max(longest, time.perf_counter() - start - TICK)
+    return longest * 1000
+
+
+async def run_logins(
+    stored: str, logins: int, hasher: None | PasswordHasher
+) -> tuple[float, float, float]:
+    """Verify ``logins`` passwords concurrently, on a hasher's pool or inline without.
+
+    Returns
+    -------
+        tuple[float, float, float]: The wall time in seconds, the mean login latency and
+        the longest loop stall in milliseconds
+    """
+
+    async def login() -> float:
+        start = time.perf_counter()
+        if hasher is None:
+            verify_password(PASSWORD, stored)
+            await asyncio.sleep(0)
+        else:
+            await hasher.verify_async(PASSWORD, stored)
+        return time.perf_counter() - start
+
+    stop = asyncio.Event()
+    stall = asyncio.create_task(loop_stall(stop))
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(login() for _ in range(logins)))
+    seconds = time.perf_counter() - start
+    stop.set()
+    return seconds, sum(latencies) / logins * 1000, await stall
+
+
+def worker_counts() -> list[int]:
+    """Return the pool sizes to measure.
+
+    Powers of 2 up to the number of cores, and the number of cores.
+    """
+    cores = os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 < cores:
+        counts.append(counts[-1] * 2)
+    return counts + [cores] if cores > 1 else counts
+
+
+def main(logins: int = LOGINS) -> None:
+    """Print the login throughput inline and for each pool size.
+
+    Parameters
+    ----------
+    logins
+        Logins verified per run.
+    """
+    stored = hash_password(PASSWORD)
+    print(
+        f"{'workers':>8} {'logins/s':>9} {'per core':>9} {'mean ms':>8} {'stall ms':>9}"
+    )
+    seconds, latency, stall = asyncio.run(run_logins(stored, logins, None))
+    print(
+        f"{'inline':>8} {logins / seconds:>9.1f} {logins / seconds:>9.1f} "
+        f"{latency:>8.1f} {stall:>9.1f}"
+    )
+    for workers in worker_counts():
+        hasher = PasswordHasher(workers)
+        seconds, latency, stall = asyncio.run(run_logins(stored, logins, hasher))
+        hasher.shutdown()
+        rate = logins / seconds
+        print(
+            f"{workers:>8} {rate:>9.1f} {rate / workers:>9.1f} "
+            f"{latency:>8.1f} {stall:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else LOGINS)
@@ -0,0 +1,111 @@
+"""Benchmark full-text search of posts against ``ILIKE``.
+
+Seeds posts made of random words into the database of ``DATABASE_URL`` (the tables are
+recreated, so never point it at data you want to keep), then times, for words from
+common to rare, the old ``ILIKE '%word%'`` search over the title, content and caption
+and ``search_posts``, each fetching the first page of 20 posts.
+
+Run with ``python -m benchmarks.bench_search``. Pass the number of posts, e.g.
+``1000000``.
+"""
+
+import random
+import sys
+import time
+
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+
+from src.db.bulk import ingest_groups, ingest_posts, ingest_users
+from src.db.connector import Base, dispose_engines, get_engine
+from src.db.models import Posts
+from src.db.search import search_posts
+
+VOCABULARY = 20_000
+WORDS_PER_POST = 40
+RUNS = 5
+
+
+def word(rank: int) -> str:
+    """Return the made-up word of a vocabulary rank."""
+    return f"w{rank:05d}x"
+
+
+def seed(posts: int) -> None:
+    """Recreate the tables and load posts with a Zipf-like word distribution."""
+    engine = get_engine()
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    ingest_users(engine, [{"name": "User", "email": "user@you.com", "password": "pw"}])
+    ingest_groups(engine, [{"name": "Group", "domain": "group.com"}])
+    rng = random.Random(0)
+    weights = [1 / rank for rank in range(1, VOCABULARY + 1)]
+    ranks = range(VOCABULARY)
+
+    def rows():
+        for i in range(posts):
+            words = [
+                word(rank) for rank in rng.choices(ranks, weights, k=WORDS_PER_POST)
+            ]
+            yield {
+                "title": " ".join(words[:5]),
+                "caption": " ".join(words[5:10]),
+                "content": " ".join(words[10:]),
+                "author_email": "user@you.com",
+                "group_domain": "group.com",
+            }
+
+    ingest_posts(engine, rows())
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.exec_driver_sql("VACUUM ANALYZE posts")
+
+
+def ilike_search(session: Session, term: str) -> list[Posts]:
+    """Search the way it was done before full-text search."""
+    pattern = f"%{term}%"
+    query = (
+        select(Posts)
+        .where(
+            or_(
+                Posts.title.ilike(pattern),
+                Posts.content.ilike(pattern),
+                Posts.caption.ilike(pattern),
+            )
+        )
+        .order_by(Posts.id.desc())
+        .limit(20)
+    )
+    return list(session.scalars(query))
+
+
+def best_of(function, *args) -> float:
+    """Return the fastest wall time of ``RUNS`` runs of a function, in milliseconds."""
+    times = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        function(*args)
+        times.append((time.perf_counter() - start) * 1000)
+    return min(times)
+
+
+def main(posts: int = 200_000) -> None:
+    """Print the time of both searches for words from common to rare.
+
+    Parameters
+    ----------
+    posts
+        The number of posts to seed.
+    """
+    seed(posts)
+    print(f"{'word rank':>9} {'ilike ms':>9} {'search ms':>9}")
+    with Session(get_engine()) as session:
+        for rank in (0, 10, 100, 1_000, 10_000):
+            term = word(rank)
+            ilike_ms = best_of(ilike_search, session, term)
+            search_ms = best_of(search_posts, session, term)
+            print(f"{rank:>9} {ilike_ms:>9.1f} {search_ms:>9.1f}")
+    dispose_engines()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
@@ -0,0 +1,62 @@
+"""Benchmark the per-call overhead of building the Sheets service client.
+
+Compares calling ``build("sheets", "v4", ...).spreadsheets().values()`` on every
+request, as ``TrackingSheet`` used to, against reusing the collection returned by
+``TrackingSheet.values_api``. No request is sent, so this runs offline and measures only
+the client setup cost; the saved TLS handshake on a live connection comes on top of it.
+
+Run with ``python -m benchmarks.bench_service_client``.
+"""
+
+import time
+
+from google.auth.credentials import AnonymousCredentials
+from googleapiclient.discovery import build
+
+from src.sheets_interface.sheets import TrackingSheet
+
+ITERATIONS = 1000
+
+
+def time_per_call(func, iterations: int = ITERATIONS) -> float:
+    """Time a function.
+
+    Parameters
+    ----------
+    func
+        The function to call without arguments.
+    iterations
+        The number of calls.
+
+    Returns
+    -------
+    float
+        The mean wall time per call in milliseconds.
+    """
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def main() -> None:
+    """Print the per-call client overhead before and after reusing the client."""
+    creds = AnonymousCredentials()
+    sheet = TrackingSheet("", "benchmark")
+    sheet.creds = creds
+
+    before = time_per_call(
+        lambda: build("sheets", "v4", credentials=creds, cache_discovery=False)
+        .spreadsheets()
+        .values(),
+        iterations=ITERATIONS // 10,
+    )
+    after = time_per_call(sheet.values_api)
+
+    print(f"build() per call:        {before:8.3f} ms")
+    print(f"reused client per call:  {after:8.3f} ms")
+    print(f"speedup:                 {before / after:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Benchmark TrackingSheet queries against the fake Sheets API.
+
+For sheets from 100 to 100k rows, runs ``find_row``, ``request_complete`` and
+``next_unused_row_sn`` through the real Sheets client against ``FakeSheetsBackend`` and
+reports, per operation, the API calls, the wall time and the peak memory traced while it
+ran (tracing also slows the wall time down, so compare wall times with each other rather
+than with production). Each query is run with the default sheet, with the snapshot cache
+(first call of a "is it done? what's the next row?" cycle pays for the fetch) and with
+streaming reads.
+
+Run with ``python -m benchmarks.bench_tracking_sheet``. Pass a latency in seconds, e.g.
+``0.05``, to simulate the round trip to Google.
+"""
+
+import sys
+import time
+import tracemalloc
+from operator import methodcaller
+
+from benchmarks.bench_tracking_table import ROWS_PER_REQUEST
+from benchmarks.bench_tracking_table import make_values
+from src.sheets_interface.fake_sheets import FakeSheetsBackend
+from src.sheets_interface.sheets import TrackingSheet
+
+SIZES = (100, 1_000, 10_000, 100_000)
+SPREADSHEET_ID = "benchmark"
+TAB = "tracking"
+
+
+def run_operation(
+    sheet: TrackingSheet, backend: FakeSheetsBackend, operation
+) -> tuple[int, float, float]:
+    """Run one operation and measure it.
+
+    Parameters
+    ----------
+    sheet
+        The sheet to query.
+    backend
+        The fake API the sheet talks to.
+    operation
+        The function taking the sheet.
+
+    Returns
+    -------
+    tuple[int, float, float]
+        The API calls, the wall time in milliseconds and the peak memory in MiB.
+    """
+    backend.reset_counters()
+    tracemalloc.start()
+    start = time.perf_counter()
+    operation(sheet)
+    elapsed = (time.perf_counter() - start) * 1000
+    peak = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    return sum(backend.calls.values()), elapsed, peak
+
+
+def main(latency: float = 0.0) -> None:
+    """Print the API calls, wall time and peak memory of each query and sheet size.
+
+    Parameters
+    ----------
+    latency
+        Seconds each fake API request waits.
+    """
+    print(f"{'rows':>8} {'mode':10} {'operation':22} {'calls':>5} {'ms':>9} {'MiB':>7}")
+    for rows in SIZES:
+        values = make_values(rows, min(rows, ROWS_PER_REQUEST))
+        # The request at the middle of the sheet, and a cell SN in it.
+        middle = values[rows // 2 + 1]
+        request_uuid, cell_sn = middle[0], middle[1]
+        operations = {
+            "find_row": methodcaller("find_row", request_uuid, cell_sn),
+            "request_complete": methodcaller("request_complete", request_uuid),
+            "next_unused_row_sn": methodcaller("next_unused_row_sn", request_uuid),
+        }
+        modes = {
+            "default": {},
+            "cached": {"cache_ttl": 60},
+            "streaming": {"window_size": 5000},
+        }
+        for mode, options in modes.items():
+            backend = FakeSheetsBackend(latency=latency)
+            backend.set_values(SPREADSHEET_ID, TAB, values)
+            sheet = TrackingSheet(SPREADSHEET_ID, TAB, http=backend.http(), **options)
+            # Build the client up front so its one-off cost is not counted against the
+            # first query.
+            sheet.values_api()
+            for name, operation in operations.items():
+                if mode == "streaming" and name == "find_row":
+                    continue
+                calls, elapsed, peak = run_operation(sheet, backend, operation)
+                print(
+                    f"{rows:>8} {mode:10} {name:22} {calls:>5} "
+                    f"{elapsed:>9.1f} {peak:>7.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 0.0)
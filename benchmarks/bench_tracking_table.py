@@ -0,0 +1,118 @@
+"""Benchmark the columnar tracking table against one dict per row, in memory and time.
+
+Parses a synthetic tracking sheet of ``ROWS`` rows with the ``list[dict]`` parser
+``TrackingSheet`` used before, with ``TrackingTable.from_values`` and with
+``TrackingData.from_values`` (table plus indexes). Memory is the size of the parsed
+result as traced by ``tracemalloc``, not counting the API response it was parsed from.
+
+Run with ``python -m benchmarks.bench_tracking_table``.
+"""
+
+import gc
+import time
+import tracemalloc
+
+from src.sheets_interface.tracking_data import TrackingData
+from src.sheets_interface.tracking_data import TrackingTable
+
+ROWS = 100_000
+ROWS_PER_REQUEST = 500
+
+
+def make_values(
+    rows: int = ROWS, rows_per_request: int = ROWS_PER_REQUEST
+) -> list[list[str]]:
+    """Make the values of a tracking sheet as the Sheets API returns them.
+
+    Parameters
+    ----------
+    rows
+        The number of data rows.
+    rows_per_request
+        The number of rows of each request UUID.
+
+    Returns
+    -------
+    list[list[str]]
+        The column names followed by the rows. The last row of each request has no
+        status.
+    """
+    values = [["Request_UUID", "Cell_SN", "Completed"]]
+    for row in range(rows):
+        request_uuid = f"request-{row // rows_per_request:08d}"
+        cell_sn = f"sn-{row:08d}"
+        if row % rows_per_request == rows_per_request - 1:
+            values.append([request_uuid, cell_sn])
+        else:
+            values.append([request_uuid, cell_sn, "Done"])
+    return values
+
+
+def parse_dicts(values: list[list[str]]) -> list[dict[str, str]]:
+    """Parse the values into one dict per row, the way ``TrackingSheet`` used to.
+
+    Parameters
+    ----------
+    values
+        The column names followed by the rows.
+
+    Returns
+    -------
+    list[dict[str, str]]
+        The values of each row, keyed by column name.
+    """
+    column_names = values[0]
+    data = []
+    for row in values[1:]:
+        row_dict = {}
+        for column_indx, column_value in enumerate(row):
+            row_dict[column_names[column_indx]] = column_value
+        data.append(row_dict)
+    return data
+
+
+def measure(parse, values: list[list[str]]) -> tuple[float, float]:
+    """Measure the parse time and the memory held by the result.
+
+    Parameters
+    ----------
+    parse
+        The parser taking the values.
+    values
+        The column names followed by the rows.
+
+    Returns
+    -------
+    tuple[float, float]
+        The parse time in milliseconds and the memory of the result in MiB.
+    """
+    gc.collect()
+    start = time.perf_counter()
+    parse(values)
+    elapsed = (time.perf_counter() - start) * 1000
+
+    gc.collect()
+    tracemalloc.start()
+    result = parse(values)
+    size = tracemalloc.get_traced_memory()[0] / 2**20
+    tracemalloc.stop()
+    del result
+    return elapsed, size
+
+
+def main() -> None:
+    """Print parse time and memory of each representation."""
+    values = make_values()
+    parsers = {
+        "list[dict]": parse_dicts,
+        "TrackingTable": TrackingTable.from_values,
+        "TrackingData (indexed)": lambda values: TrackingData.from_values(values, 2),
+    }
+    print(f"{ROWS} rows")
+    for name, parse in parsers.items():
+        elapsed, size = measure(parse, values)
+        print(f"{name:24} {elapsed:8.1f} ms {size:8.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
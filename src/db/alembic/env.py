@@ -4,6 +4,7 @@ from sqlalchemy import engine_from_config
 from sqlalchemy import pool
 
 from alembic import context
+from src.db.migration_helpers import MigrationOptions
 from src.db.models import Base
 
 # this is the Alembic Config object, which provides
@@ -57,7 +58,12 @@ def run_migrations_online() -> None:
     In this scenario we need to create an Engine
     and associate a connection with the context.
 
+    Each revision runs in its own transaction, and DDL waits at most
+    ``-x lock_timeout`` for its locks. With ``-x dry_run=true`` all
+    revisions run in one transaction that is rolled back.
+
     """
+    options = MigrationOptions.from_context()
     connectable = engine_from_config(
         config.get_section(config.config_ini_section, {}),
         prefix="sqlalchemy.",
@@ -65,8 +71,21 @@ def run_migrations_online() -> None:
     )
 
     with connectable.connect() as connection:
+        connection.exec_driver_sql(f"SET lock_timeout = '{options.lock_timeout}'")
+        connection.commit()
+        if options.dry_run:
+            with connection.begin() as transaction:
+                context.configure(
+                    connection=connection, target_metadata=target_metadata
+                )
+                context.run_migrations()
+                transaction.rollback()
+            return
+
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection,
+            target_metadata=target_metadata,
+            transaction_per_migration=True,
         )
 
         with context.begin_transaction():
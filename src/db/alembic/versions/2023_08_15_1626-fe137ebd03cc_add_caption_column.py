@@ -9,7 +9,6 @@ from typing import Sequence, Union
 
 from alembic import op
 import sqlalchemy as sa
-from sqlalchemy.dialects import postgresql
 
 # revision identifiers, used by Alembic.
 revision: str = 'fe137ebd03cc'
@@ -25,31 +24,4 @@ def upgrade() -> None:
 
 
 def downgrade() -> None:
-    # ### commands auto generated by Alembic - please adjust! ###
-    op.create_table('posts',
-    sa.Column('id', sa.INTEGER(), autoincrement=True, nullable=False),
-    sa.Column('title', sa.VARCHAR(), autoincrement=False, nullable=True),
-    sa.Column('content', sa.VARCHAR(), autoincrement=False, nullable=True),
-    sa.Column('author_id', sa.INTEGER(), autoincrement=False, nullable=True),
-    sa.Column('group_id', sa.INTEGER(), autoincrement=False, nullable=True),
-    sa.ForeignKeyConstraint(['author_id'], ['users.id'], name='posts_author_id_fkey'),
-    sa.ForeignKeyConstraint(['group_id'], ['groups.id'], name='posts_group_id_fkey'),
-    sa.PrimaryKeyConstraint('id', name='posts_pkey')
-    )
-    op.create_table('groups',
-    sa.Column('id', sa.INTEGER(), autoincrement=True, nullable=False),
-    sa.Column('name', sa.VARCHAR(), autoincrement=False, nullable=True),
-    sa.Column('domain', sa.VARCHAR(), autoincrement=False, nullable=True),
-    sa.PrimaryKeyConstraint('id', name='groups_pkey'),
-    sa.UniqueConstraint('domain', name='groups_domain_key')
-    )
-    op.create_table('users',
-    sa.Column('id', sa.INTEGER(), autoincrement=True, nullable=False),
-    sa.Column('name', sa.VARCHAR(), autoincrement=False, nullable=True),
-    sa.Column('email', sa.VARCHAR(), autoincrement=False, nullable=True),
-    sa.Column('password', sa.VARCHAR(), autoincrement=False, nullable=True),
-    sa.Column('created_at', postgresql.TIMESTAMP(), autoincrement=False, nullable=True),
-    sa.PrimaryKeyConstraint('id', name='users_pkey'),
-    sa.UniqueConstraint('email', name='users_email_key')
-    )
-    # ### end Alembic commands ###
+    op.drop_column("posts", "caption")
@@ -0,0 +1,31 @@
+"""add posts foreign key indexes
+
+Revision ID: 854e232d38b4
+Revises: dbb43029aa7a
+Create Date: 2026-10-18 15:21:04.318205
+
+"""
+from typing import Sequence, Union
+
+from src.db.migration_helpers import create_index_concurrently, drop_index_concurrently
+
+# revision identifiers, used by Alembic.
+revision: str = '854e232d38b4'
+down_revision: Union[str, None] = 'dbb43029aa7a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = {
+    'ix_posts_author_id_id': ['author_id', 'id'],
+    'ix_posts_group_id_id': ['group_id', 'id'],
+}
+
+
+def upgrade() -> None:
+    for name, columns in INDEXES.items():
+        create_index_concurrently(name, 'posts', columns)
+
+
+def downgrade() -> None:
+    for name in INDEXES:
+        drop_index_concurrently(name, 'posts')
@@ -0,0 +1,61 @@
+"""add tracking rows table
+
+Revision ID: d8ea363208ce
+Revises: 689ce52c683c
+Create Date: 2026-10-18 15:26:24.861342
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8ea363208ce'
+down_revision: Union[str, None] = '689ce52c683c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'tracking_rows',
+        sa.Column('sheet_id', sa.Text(), nullable=False),
+        sa.Column('tab_name', sa.Text(), nullable=False),
+        sa.Column('request_uuid', sa.Text(), nullable=False),
+        sa.Column('cell_sn', sa.Text(), nullable=False),
+        sa.Column('occurrence', sa.Integer(), nullable=False),
+        sa.Column('row_number', sa.Integer(), nullable=False),
+        sa.Column('status', sa.Text(), nullable=True),
+        sa.Column('incomplete', sa.Boolean(), nullable=False),
+        sa.Column('leased', sa.Boolean(), nullable=False),
+        sa.Column(
+            'date_synced',
+            sa.DateTime(timezone=True),
+            server_default=sa.func.now(),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint(
+            'sheet_id', 'tab_name', 'request_uuid', 'cell_sn', 'occurrence'
+        ),
+    )
+    # The table is new and empty, so the indexes are built in the migration's
+    # transaction.
+    op.create_index(
+        'ix_tracking_rows_incomplete',
+        'tracking_rows',
+        ['sheet_id', 'tab_name', 'request_uuid', 'row_number'],
+        postgresql_where=sa.text('incomplete'),
+    )
+    op.create_index(
+        'ix_tracking_rows_leased',
+        'tracking_rows',
+        ['sheet_id', 'tab_name', 'request_uuid'],
+        postgresql_where=sa.text('leased'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tracking_rows_leased', table_name='tracking_rows')
+    op.drop_index('ix_tracking_rows_incomplete', table_name='tracking_rows')
+    op.drop_table('tracking_rows')
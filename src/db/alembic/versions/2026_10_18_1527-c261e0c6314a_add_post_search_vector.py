@@ -0,0 +1,42 @@
+"""add post search vector
+
+Revision ID: c261e0c6314a
+Revises: d8ea363208ce
+Create Date: 2026-10-18 15:27:48.209716
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+from src.db.migration_helpers import create_index_concurrently, drop_index_concurrently
+
+# revision identifiers, used by Alembic.
+revision: str = 'c261e0c6314a'
+down_revision: Union[str, None] = 'd8ea363208ce'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(caption, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(content, '')), 'C')"
+)
+
+
+def upgrade() -> None:
+    # Adding a stored generated column rewrites posts under an exclusive lock; schedule
+    # it with that in mind. The index build commits the column first, so a rerun after a
+    # failed build finds it there.
+    op.execute(
+        'ALTER TABLE posts ADD COLUMN IF NOT EXISTS search_vector TSVECTOR '
+        f'GENERATED ALWAYS AS ({SEARCH_VECTOR}) STORED'
+    )
+    create_index_concurrently(
+        'ix_posts_search_vector', 'posts', ['search_vector'], using='gin'
+    )
+
+
+def downgrade() -> None:
+    drop_index_concurrently('ix_posts_search_vector', 'posts')
+    op.drop_column('posts', 'search_vector')
@@ -0,0 +1,150 @@
+"""partition posts by month
+
+Revision ID: e86cbafab505
+Revises: c261e0c6314a
+Create Date: 2026-10-18 15:32:11.604381
+
+The primary key of a partitioned table must include the partition key, so it becomes
+(id, date_created) and no longer enforces unique ids on its own. Ids stay unique as long
+as they come from the identity sequence, which restarts after the copied posts; never
+insert posts with explicit ids.
+
+The legacy table allowed NULL titles, authors and groups, which the new table does not;
+the upgrade stops before changing anything if posts holds any, so they can be filled in
+or deleted first.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from src.db.migration_helpers import rename_index
+
+# revision identifiers, used by Alembic.
+revision: str = 'e86cbafab505'
+down_revision: Union[str, None] = 'c261e0c6314a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(caption, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(content, '')), 'C')"
+)
+COLUMNS = 'id, title, content, caption, author_id, group_id, date_created'
+INDEXES = {
+    'ix_posts_author_id_date_created_id': ['author_id', 'date_created', 'id'],
+    'ix_posts_group_id_date_created_id': ['group_id', 'date_created', 'id'],
+}
+CHECK_NOT_NULL = """
+DO $$
+DECLARE
+    missing bigint := (
+        SELECT count(*) FROM posts
+        WHERE title IS NULL OR author_id IS NULL OR group_id IS NULL
+    );
+BEGIN
+    IF missing > 0 THEN
+        RAISE EXCEPTION
+            'posts has % rows with a NULL title, author_id or group_id', missing
+            USING HINT = 'Fill in or delete them before partitioning posts.';
+    END IF;
+END $$
+"""
+# One partition per month from the oldest post up to three months ahead, named like
+# src.db.partitions names them.
+CREATE_PARTITIONS = """
+DO $$
+DECLARE
+    bound timestamptz := date_trunc(
+        'month', coalesce((SELECT min(date_created) FROM posts_unpartitioned), now())
+    );
+BEGIN
+    WHILE bound <= date_trunc('month', now()) + interval '3 months' LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF posts FOR VALUES FROM (%L) TO (%L)',
+            'posts_p' || to_char(bound, 'YYYY_MM'), bound, bound + interval '1 month'
+        );
+        bound := bound + interval '1 month';
+    END LOOP;
+END $$
+"""
+
+
+def set_aside(table: str) -> None:
+    """Move posts, its sequence, primary key and indexes out of the new table's way."""
+    op.rename_table('posts', table)
+    op.execute(f'ALTER SEQUENCE posts_id_seq RENAME TO {table}_id_seq')
+    op.execute(f'ALTER TABLE {table} RENAME CONSTRAINT posts_pkey TO {table}_pkey')
+    for name in [*INDEXES, 'ix_posts_search_vector']:
+        rename_index(name, name.replace('posts', table, 1))
+
+
+def create_posts(primary_key: list[str], **kwargs) -> None:
+    """Create the posts table with a primary key, and any table options."""
+    op.create_table(
+        'posts',
+        sa.Column('id', sa.Integer(), sa.Identity(start=1), nullable=False),
+        sa.Column('title', sa.Text(), nullable=False),
+        sa.Column('content', sa.Text(), nullable=True),
+        sa.Column('caption', sa.Text(), nullable=True),
+        sa.Column('author_id', sa.Integer(), nullable=False),
+        sa.Column('group_id', sa.Integer(), nullable=False),
+        sa.Column(
+            'date_created',
+            sa.DateTime(timezone=True),
+            server_default=sa.func.now(),
+            nullable=False,
+        ),
+        sa.Column(
+            'search_vector',
+            postgresql.TSVECTOR(),
+            sa.Computed(SEARCH_VECTOR, persisted=True),
+        ),
+        sa.ForeignKeyConstraint(
+            ['author_id'], ['users.id'], name='posts_author_id_fkey'
+        ),
+        sa.ForeignKeyConstraint(
+            ['group_id'], ['groups.id'], name='posts_group_id_fkey'
+        ),
+        sa.PrimaryKeyConstraint(*primary_key, name='posts_pkey'),
+        **kwargs,
+    )
+
+
+def fill_posts(source: str) -> None:
+    """Copy the posts of a set aside table into the new one and index it.
+
+    The ids of the new table restart after the copied ones.
+    """
+    op.execute(f'INSERT INTO posts ({COLUMNS}) SELECT {COLUMNS} FROM {source}')
+    op.execute(
+        "SELECT setval(pg_get_serial_sequence('posts', 'id'), "
+        'coalesce(max(id), 0) + 1, false) FROM posts'
+    )
+    op.drop_table(source)
+    for name, columns in INDEXES.items():
+        op.create_index(name, 'posts', columns)
+    op.create_index(
+        'ix_posts_search_vector', 'posts', ['search_vector'], postgresql_using='gin'
+    )
+
+
+def upgrade() -> None:
+    # Posts are copied into the new table within one transaction, which blocks writes to
+    # posts until it commits; schedule it with that in mind. Month boundaries are taken
+    # in UTC, like src.db.partitions does.
+    op.execute("SET LOCAL timezone = 'UTC'")
+    op.execute(CHECK_NOT_NULL)
+    set_aside('posts_unpartitioned')
+    create_posts(['id', 'date_created'], postgresql_partition_by='RANGE (date_created)')
+    op.execute('CREATE TABLE posts_default PARTITION OF posts DEFAULT')
+    op.execute(CREATE_PARTITIONS)
+    fill_posts('posts_unpartitioned')
+
+
+def downgrade() -> None:
+    set_aside('posts_partitioned')
+    create_posts(['id'])
+    fill_posts('posts_partitioned')
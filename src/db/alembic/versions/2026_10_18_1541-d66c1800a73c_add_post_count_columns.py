@@ -0,0 +1,86 @@
+"""add post count columns
+
+Revision ID: d66c1800a73c
+Revises: e86cbafab505
+Create Date: 2026-10-18 15:41:52.730164
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+from src.db.migration_helpers import backfill
+
+# revision identifiers, used by Alembic.
+revision: str = 'd66c1800a73c'
+down_revision: Union[str, None] = 'e86cbafab505'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+POST_COUNT_CHANGES = {
+    'INSERT': 'SELECT author_id, group_id, 1 AS n FROM inserted',
+    'DELETE': 'SELECT author_id, group_id, -1 AS n FROM deleted',
+    'UPDATE': (
+        'SELECT author_id, group_id, 1 AS n FROM inserted '
+        'UNION ALL SELECT author_id, group_id, -1 FROM deleted'
+    ),
+}
+POST_COUNT_UPDATE = (
+    'UPDATE {table} SET post_count = post_count + delta.n '
+    'FROM (SELECT {key}, sum(n) AS n FROM ({changes}) changes GROUP BY {key}) delta '
+    'WHERE {table}.id = delta.{key} AND delta.n <> 0;'
+)
+TRIGGER_TABLES = {
+    'INSERT': 'NEW TABLE AS inserted',
+    'DELETE': 'OLD TABLE AS deleted',
+    'UPDATE': 'OLD TABLE AS deleted NEW TABLE AS inserted',
+}
+COUNTED = {'users': 'author_id', 'groups': 'group_id'}
+
+
+def upgrade() -> None:
+    # The backfill commits the statements before it, so they must be rerunnable if it
+    # fails. A constant default only changes the catalog, existing rows are not
+    # rewritten.
+    for table in COUNTED:
+        op.execute(
+            f'ALTER TABLE {table} ADD COLUMN IF NOT EXISTS post_count '
+            'INTEGER DEFAULT 0 NOT NULL'
+        )
+    branches = ' '.join(
+        f"IF TG_OP = '{operation}' THEN "
+        + ''.join(
+            POST_COUNT_UPDATE.format(table=table, key=key, changes=changes)
+            for table, key in COUNTED.items()
+        )
+        + ' END IF;'
+        for operation, changes in POST_COUNT_CHANGES.items()
+    )
+    op.execute(
+        'CREATE OR REPLACE FUNCTION count_posts() RETURNS trigger LANGUAGE plpgsql '
+        'AS $$ BEGIN '
+        f'{branches} RETURN NULL; END $$'
+    )
+    for operation, tables in TRIGGER_TABLES.items():
+        trigger = f'count_posts_{operation.lower()}'
+        op.execute(f'DROP TRIGGER IF EXISTS {trigger} ON posts')
+        op.execute(
+            f'CREATE TRIGGER {trigger} AFTER {operation} ON posts REFERENCING {tables} '
+            'FOR EACH STATEMENT EXECUTE FUNCTION count_posts()'
+        )
+    # The triggers count the posts written from here on, the backfill the posts written
+    # before. A post written while its author's batch runs can be missed; run python -m
+    # src.db.post_counts afterwards to fix such counts.
+    for table, key in COUNTED.items():
+        backfill(
+            table,
+            f'post_count = (SELECT count(*) FROM posts WHERE posts.{key} = {table}.id)',
+        )
+
+
+def downgrade() -> None:
+    for operation in TRIGGER_TABLES:
+        op.execute(f'DROP TRIGGER count_posts_{operation.lower()} ON posts')
+    op.execute('DROP FUNCTION count_posts()')
+    for table in COUNTED:
+        op.drop_column(table, 'post_count')
@@ -0,0 +1,147 @@
+"""Async engines and sessions for the database, on asyncpg.
+
+The async counterpart of ``src.db.connector``: the same URLs and pool settings, with the
+driver swapped for an asyncio one so queries never block the event loop.
+"""
+import asyncio
+import threading
+
+from sqlalchemy.engine.url import URL
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+
+from src.db.connector import PRIMARY, REPLICA, PoolSettings, database_url
+from src.instrumentation import instrument_engine
+
+# Async driver of each database backend.
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+
+_async_engines: dict[str, AsyncEngine] = {}
+_async_session_factories: dict[bool, async_sessionmaker[AsyncSession]] = {}
+_registry_lock = threading.Lock()
+
+
+def async_url(url: URL) -> URL:
+    """Swap the driver of a URL for the async driver of its backend.
+
+    Returns
+    -------
+        URL: The URL with the async driver
+    """
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        msg = f"No async driver for {backend}."
+        raise ValueError(msg)
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+
+def build_async_engine(url: URL, settings: None | PoolSettings = None) -> AsyncEngine:
+    """Create an async engine, pooled and instrumented like the sync engines.
+
+    Returns
+    -------
+        AsyncEngine: Connection to database
+    """
+    settings = settings or PoolSettings.from_env()
+    url = async_url(url)
+    connect_args = {}
+    if settings.statement_timeout_ms and url.get_backend_name() == "postgresql":
+        connect_args["server_settings"] = {
+            "statement_timeout": str(settings.statement_timeout_ms)
+        }
+    pool_args = {}
+    if url.get_backend_name() == "postgresql":
+        pool_args = {
+            "pool_size": settings.pool_size,
+            "max_overflow": settings.max_overflow,
+            "pool_timeout": settings.pool_timeout,
+        }
+    engine = create_async_engine(
+        url,
+        pool_recycle=settings.pool_recycle,
+        pool_pre_ping=settings.pool_pre_ping,
+        connect_args=connect_args,
+        **pool_args,
+    )
+    if settings.instrument:
+        slow_query_seconds = (
+            settings.slow_query_ms / 1000 if settings.slow_query_ms else None
+        )
+        # Cursor events are emitted by the sync engine the async engine drives.
+        instrument_engine(engine.sync_engine, slow_query_seconds=slow_query_seconds)
+    return engine
+
+
+def get_async_engine(name: str = PRIMARY) -> AsyncEngine:
+    """Return the process-wide async engine of a database, creating it on first use.
+
+    The read replica falls back to the primary engine when ``DATABASE_REPLICA_URL`` is
+    not set.
+
+    Returns
+    -------
+        AsyncEngine: Connection to database
+    """
+    with _registry_lock:
+        engine = _async_engines.get(name)
+        if engine is None:
+            url = database_url(name)
+            if url is None:
+                engine = _async_engines.get(PRIMARY) or build_async_engine(
+                    database_url(PRIMARY)
+                )
+                _async_engines[PRIMARY] = engine
+            else:
+                engine = build_async_engine(url)
+            _async_engines[name] = engine
+        return engine
+
+
+def async_session_factory(readonly: bool = False) -> async_sessionmaker[AsyncSession]:
+    """Return the process-wide async session factory.
+
+    Read-only sessions are bound to the read replica, if configured, and run their
+    transactions read-only. Objects are not expired on commit, since reloading an
+    expired attribute would be IO the event loop cannot do implicitly.
+
+    Returns
+    -------
+        async_sessionmaker: The session factory
+    """
+    with _registry_lock:
+        factory = _async_session_factories.get(readonly)
+    if factory is None:
+        if readonly:
+            bind = get_async_engine(REPLICA).execution_options(postgresql_readonly=True)
+        else:
+            bind = get_async_engine(PRIMARY)
+        factory = async_sessionmaker(bind=bind, expire_on_commit=False)
+        with _registry_lock:
+            factory = _async_session_factories.setdefault(readonly, factory)
+    return factory
+
+
+def get_async_session(readonly: bool = False) -> AsyncSession:
+    """Create a session from the process-wide async session factory.
+
+    Returns
+    -------
+        AsyncSession: The session
+    """
+    return async_session_factory(readonly)()
+
+
+async def dispose_async_engines() -> None:
+    """Close all pooled connections.
+
+    The async engines and session factories are forgotten.
+    """
+    with _registry_lock:
+        engines = set(_async_engines.values())
+        _async_engines.clear()
+        _async_session_factories.clear()
+    await asyncio.gather(*(engine.dispose() for engine in engines))
@@ -0,0 +1,214 @@
+"""Async queries over the models.
+
+The async counterpart of ``src.db.repository.Repository``. Lazy loading would need IO
+inside attribute access, which an ``AsyncSession`` cannot do, so every query loads its
+relationships up front through a loading profile, and strict mode is on by default: a
+relationship outside the profile raises ``sqlalchemy.exc.InvalidRequestError`` rather
+than failing with a missing greenlet.
+"""
+import asyncio
+from collections.abc import Sequence
+from datetime import datetime, timezone
+
+from sqlalchemy import Select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.db.models import Groups, Posts, Users
+from src.db.passwords import get_hasher, needs_rehash
+from src.db.repository import select_profile
+
+
+class AsyncRepository:
+    """Async queries and inserts of users, groups and posts by loading profile."""
+
+    def __init__(self, session: AsyncSession, strict: bool = True):
+        self.session = session
+        self.strict = strict
+
+    def select(self, model: type, profile: str) -> Select:
+        """Start a query of a model with the options of a profile.
+
+        Returns
+        -------
+            Select: The query
+        """
+        return select_profile(model, profile, self.strict)
+
+    async def _one_or_none(self, query: Select):
+        """Run a query for at most one object."""
+        return (await self.session.scalars(query)).unique().one_or_none()
+
+    async def posts(
+        self,
+        profile: str = "post_list",
+        author_id: None | int = None,
+        group_id: None | int = None,
+        limit: None | int = None,
+    ) -> Sequence[Posts]:
+        """Get posts, newest first, optionally of one author or group.
+
+        Returns
+        -------
+            Sequence[Posts]: The posts
+        """
+        query = (
+            self.select(Posts, profile)
+            .order_by(Posts.date_created.desc(), Posts.id.desc())
+            .limit(limit)
+        )
+        if author_id is not None:
+            query = query.where(Posts.author_id == author_id)
+        if group_id is not None:
+            query = query.where(Posts.group_id == group_id)
+        return (await self.session.scalars(query)).unique().all()
+
+    async def post(
+        self,
+        post_id: int,
+        profile: str = "post_list",
+        date_created: None | datetime = None,
+    ) -> None | Posts:
+        """Get a post by id.
+
+        The id alone is unique but not the partition key, so the lookup probes the index
+        of every partition of ``posts``. Pass the creation time of the post, e.g. from a
+        feed cursor, to read only its partition.
+
+        Returns
+        -------
+            None | Posts: The post, or None if not found
+        """
+        statement = self.select(Posts, profile).where(Posts.id == post_id)
+        if date_created is not None:
+            statement = statement.where(Posts.date_created == date_created)
+        return await self._one_or_none(statement)
+
+    async def user(self, user_id: int, profile: str = "user_posts") -> None | Users:
+        """Get a user by id.
+
+        Returns
+        -------
+            None | Users: The user, or None if not found
+        """
+        return await self._one_or_none(
+            self.select(Users, profile).where(Users.id == user_id)
+        )
+
+    async def user_by_email(
+        self, email: str, profile: str = "user_posts"
+    ) -> None | Users:
+        """Get a user by email.
+
+        Returns
+        -------
+            None | Users: The user, or None if not found
+        """
+        return await self._one_or_none(
+            self.select(Users, profile).where(Users.email == email)
+        )
+
+    async def group(self, group_id: int, profile: str = "group_posts") -> None | Groups:
+        """Get a group by id.
+
+        Returns
+        -------
+            None | Groups: The group, or None if not found
+        """
+        return await self._one_or_none(
+            self.select(Groups, profile).where(Groups.id == group_id)
+        )
+
+    async def group_by_domain(
+        self, domain: str, profile: str = "group_posts"
+    ) -> None | Groups:
+        """Get a group by domain.
+
+        Returns
+        -------
+            None | Groups: The group, or None if not found
+        """
+        return await self._one_or_none(
+            self.select(Groups, profile).where(Groups.domain == domain)
+        )
+
+    async def add_user(self, name: str, email: str, password: str) -> Users:
+        """Insert a user, hashing its password off the event loop. The caller commits.
+
+        Returns
+        -------
+            Users: The user, with its id
+        """
+        password = await get_hasher().hash_async(password)
+        user = Users(
+            name=name,
+            email=email,
+            password=password,
+            date_created=datetime.now(timezone.utc),
+            posts=[],
+        )
+        self.session.add(user)
+        await self.session.flush()
+        return user
+
+    async def authenticate(self, email: str, password: str) -> None | Users:
+        """Check a user's password off the event loop, upgrading its hash if needed.
+
+        The caller commits.
+
+        Returns
+        -------
+            None | Users: The user, or None if no user has the email or the password is
+            wrong
+        """
+        hasher = get_hasher()
+        user = await self.user_by_email(email, profile="user")
+        # Without a user, verify anyway so the login takes as long as with a wrong
+        # password.
+        stored = (
+            await asyncio.wrap_future(hasher.dummy_hash())
+            if user is None
+            else user.password
+        )
+        if not await hasher.verify_async(password, stored) or user is None:
+            return None
+        if needs_rehash(user.password):
+            user.password = await hasher.hash_async(password)
+        return user
+
+    async def add_group(self, name: str, domain: str) -> Groups:
+        """Insert a group. The caller commits.
+
+        Returns
+        -------
+            Groups: The group, with its id
+        """
+        group = Groups(
+            name=name, domain=domain, date_created=datetime.now(timezone.utc), posts=[]
+        )
+        self.session.add(group)
+        await self.session.flush()
+        return group
+
+    async def add_post(
+        self,
+        title: str,
+        author: Users,
+        group: Groups,
+        content: None | str = None,
+        caption: None | str = None,
+    ) -> Posts:
+        """Insert a post. The caller commits.
+
+        Returns
+        -------
+            Posts: The post, with its id and creation time
+        """
+        post = Posts(
+            title=title, content=content, caption=caption, author=author, group=group
+        )
+        self.session.add(post)
+        await self.session.flush()
+        # The creation time is set by the database, so read it back now rather than on a
+        # later attribute access.
+        await self.session.refresh(post, ["date_created"])
+        return post
@@ -0,0 +1,351 @@
+"""Bulk loading of users, groups and posts.
+
+Rows are plain mappings, read from any iterable or generator and loaded in chunks, one
+transaction per chunk. On PostgreSQL with psycopg2 each chunk is streamed into a
+temporary table with ``COPY`` and inserted from there with a single
+``INSERT ... SELECT``, which also resolves the posts' authors and groups by email and
+domain with a join. Elsewhere, or with ``use_copy=False``, chunks are sent as multi-row
+``INSERT ... RETURNING`` statements and the foreign keys are looked up once per chunk.
+Plaintext passwords of users are hashed on the password hashing pool before they are
+loaded.
+"""
+import io
+import time
+from collections.abc import Iterable, Iterator, Mapping
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from itertools import islice
+
+from sqlalchemy import Connection, Engine, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from src.db.models import Groups, Posts, Users
+from src.db.passwords import PasswordHasher, get_hasher, hash_plaintext
+
+CHUNK_SIZE = 10_000
+# Rows per multi-row INSERT, keeping the bound parameters under the driver limits.
+INSERT_BATCH_SIZE = 1_000
+
+USER_COLUMNS = ("name", "email", "password", "date_created")
+GROUP_COLUMNS = ("name", "domain", "date_created")
+POST_COLUMNS = (
+    "title",
+    "content",
+    "caption",
+    "author_email",
+    "group_domain",
+    "date_created",
+)
+
+
+@dataclass
+class IngestReport:
+    """Outcome of a bulk load.
+
+    Attributes
+    ----------
+    table
+        The table loaded.
+    rows
+        Rows read from the input.
+    written
+        Rows inserted or updated.
+    seconds
+        Wall time of the load.
+    """
+
+    table: str
+    rows: int = 0
+    written: int = 0
+    seconds: float = 0.0
+
+    @property
+    def skipped(self) -> int:
+        """Rows not written, e.g.
+
+        posts whose author or group does not exist, or duplicates not upserted.
+        """
+        return self.rows - self.written
+
+    @property
+    def rows_per_second(self) -> float:
+        """Input rows loaded per second."""
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+def chunked(rows: Iterable[Mapping], size: int) -> Iterator[list[Mapping]]:
+    """Split rows into lists of at most ``size`` rows, consuming generators lazily."""
+    iterator = iter(rows)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _uses_copy(engine: Engine, use_copy: bool) -> bool:
+    """Return True if the engine can load chunks with COPY."""
+    return (
+        use_copy
+        and engine.dialect.name == "postgresql"
+        and engine.dialect.driver == "psycopg2"
+    )
+
+
+def _with_date_created(row: Mapping) -> dict:
+    """Copy a row, defaulting its creation time to now."""
+    row = dict(row)
+    if row.get("date_created") is None:
+        row["date_created"] = datetime.now(timezone.utc)
+    return row
+
+
+def _copy_value(value) -> str:
+    """Format a value for COPY's text format, with NULL as ``\\N``.
+
+    Backslashes and line breaks are escaped.
+    """
+    if value is None:
+        return "\\N"
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def _copy_into_stage(
+    connection: Connection, stage: str, columns: tuple[str, ...], chunk: list[Mapping]
+) -> None:
+    """Create a temporary text table and COPY the chunk into it.
+
+    The rows are numbered in ``seq`` in input order.
+    """
+    typed = ", ".join(f"{column} text" for column in columns)
+    connection.exec_driver_sql(
+        f"CREATE TEMPORARY TABLE {stage} (seq integer, {typed}) ON COMMIT DROP"
+    )
+    buffer = io.StringIO()
+    for seq, row in enumerate(chunk):
+        buffer.write(
+            "\t".join([str(seq), *(_copy_value(row.get(column)) for column in columns)])
+            + "\n"
+        )
+    buffer.seek(0)
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {stage} (seq, {', '.join(columns)}) FROM STDIN", buffer
+        )
+    finally:
+        cursor.close()
+
+
+def _upsert_statement(
+    engine: Engine, model: type, key: str, columns: tuple[str, ...], upsert: bool
+):
+    """Build the dialect's INSERT with ON CONFLICT on the unique key."""
+    if engine.dialect.name == "postgresql":
+        statement = postgresql.insert(model)
+    elif engine.dialect.name == "sqlite":
+        statement = sqlite.insert(model)
+    else:
+        msg = f"Bulk loading is not supported on {engine.dialect.name}."
+        raise ValueError(msg)
+    if not upsert:
+        return statement.on_conflict_do_nothing(index_elements=[key])
+    return statement.on_conflict_do_update(
+        index_elements=[key],
+        set_={
+            column: statement.excluded[column] for column in columns if column != key
+        },
+    )
+
+
+def _ingest_unique(
+    engine: Engine,
+    model: type,
+    key: str,
+    columns: tuple[str, ...],
+    rows: Iterable[Mapping],
+    chunk_size: int,
+    upsert: bool,
+    use_copy: bool,
+) -> IngestReport:
+    """Load users or groups, inserting or upserting on their unique key."""
+    table = model.__tablename__
+    report = IngestReport(table)
+    start = time.perf_counter()
+    for chunk in chunked(rows, chunk_size):
+        report.rows += len(chunk)
+        # One statement cannot upsert the same key twice, so keep the last row of each
+        # key, at its first position.
+        unique = list({row[key]: _with_date_created(row) for row in chunk}.values())
+        with engine.begin() as connection:
+            if _uses_copy(engine, use_copy):
+                stage = f"stage_{table}"
+                _copy_into_stage(connection, stage, columns, unique)
+                update = ", ".join(
+                    f"{column} = EXCLUDED.{column}"
+                    for column in columns
+                    if column != key
+                )
+                conflict = f"DO UPDATE SET {update}" if upsert else "DO NOTHING"
+                casts = ", ".join(
+                    f"{column}::timestamptz" if column == "date_created" else column
+                    for column in columns
+                )
+                # Ids are assigned in the order rows are selected, so keep the input
+                # order.
+                result = connection.exec_driver_sql(
+                    f"INSERT INTO {table} ({', '.join(columns)}) "
+                    f"SELECT {casts} FROM {stage} ORDER BY seq "
+                    f"ON CONFLICT ({key}) {conflict}"
+                )
+                report.written += result.rowcount
+            else:
+                statement = _upsert_statement(
+                    engine, model, key, columns, upsert
+                ).returning(model.id)
+                unique = [
+                    {column: row.get(column) for column in columns} for row in unique
+                ]
+                for batch in chunked(unique, INSERT_BATCH_SIZE):
+                    report.written += len(
+                        connection.execute(statement.values(batch)).all()
+                    )
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def _with_hashed_passwords(
+    rows: Iterable[Mapping], chunk_size: int, hasher: PasswordHasher
+) -> Iterator[dict]:
+    """Copy users, hashing their plaintext passwords a chunk at a time.
+
+    Passwords are hashed on the pool of the hasher.
+    """
+    for chunk in chunked(rows, chunk_size):
+        hashes = hasher.executor.map(hash_plaintext, [row["password"] for row in chunk])
+        yield from (
+            {**row, "password": password} for row, password in zip(chunk, hashes)
+        )
+
+
+def ingest_users(
+    engine: Engine,
+    rows: Iterable[Mapping],
+    chunk_size: int = CHUNK_SIZE,
+    upsert: bool = True,
+    use_copy: bool = True,
+    hasher: None | PasswordHasher = None,
+) -> IngestReport:
+    """Load users, inserting new emails and updating existing ones.
+
+    Rows have ``name``, ``email``, ``password`` and optionally ``date_created``, which
+    defaults to now. Plaintext passwords are hashed on the pool of ``hasher``, the
+    process-wide one by default, so an upsert never stores one; hashing costs tens of
+    milliseconds per user, so load large sets of users with their passwords already
+    hashed.
+
+    Returns
+    -------
+        IngestReport: The rows read and written and the load rate
+    """
+    rows = _with_hashed_passwords(rows, chunk_size, hasher or get_hasher())
+    return _ingest_unique(
+        engine, Users, "email", USER_COLUMNS, rows, chunk_size, upsert, use_copy
+    )
+
+
+def ingest_groups(
+    engine: Engine,
+    rows: Iterable[Mapping],
+    chunk_size: int = CHUNK_SIZE,
+    upsert: bool = True,
+    use_copy: bool = True,
+) -> IngestReport:
+    """Load groups, inserting new domains and updating existing ones.
+
+    Rows have ``name``, ``domain`` and optionally ``date_created``, which defaults to
+    now.
+
+    Returns
+    -------
+        IngestReport: The rows read and written and the load rate
+    """
+    return _ingest_unique(
+        engine, Groups, "domain", GROUP_COLUMNS, rows, chunk_size, upsert, use_copy
+    )
+
+
+def ingest_posts(
+    engine: Engine,
+    rows: Iterable[Mapping],
+    chunk_size: int = CHUNK_SIZE,
+    use_copy: bool = True,
+) -> IngestReport:
+    """Load posts, resolving their author by email and their group by domain.
+
+    Rows have ``title``, ``content``, ``caption``, ``author_email``, ``group_domain``
+    and optionally ``date_created``, which defaults to now. Posts whose author or group
+    does not exist are skipped and counted in ``IngestReport.skipped``.
+
+    Returns
+    -------
+        IngestReport: The rows read and written and the load rate
+    """
+    report = IngestReport(Posts.__tablename__)
+    start = time.perf_counter()
+    for chunk in chunked(rows, chunk_size):
+        chunk = [_with_date_created(row) for row in chunk]
+        report.rows += len(chunk)
+        with engine.begin() as connection:
+            if _uses_copy(engine, use_copy):
+                _copy_into_stage(connection, "stage_posts", POST_COLUMNS, chunk)
+                result = connection.exec_driver_sql(
+                    "INSERT INTO posts "
+                    "(title, content, caption, author_id, group_id, date_created) "
+                    "SELECT s.title, s.content, s.caption, u.id, g.id, "
+                    "s.date_created::timestamptz FROM stage_posts s "
+                    "JOIN users u ON u.email = s.author_email "
+                    "JOIN groups g ON g.domain = s.group_domain "
+                    "ORDER BY s.seq"
+                )
+                report.written += result.rowcount
+                continue
+
+            emails = {row["author_email"] for row in chunk}
+            domains = {row["group_domain"] for row in chunk}
+            author_ids = dict(
+                connection.execute(
+                    select(Users.email, Users.id).where(Users.email.in_(emails))
+                ).all()
+            )
+            group_ids = dict(
+                connection.execute(
+                    select(Groups.domain, Groups.id).where(Groups.domain.in_(domains))
+                ).all()
+            )
+            posts = [
+                {
+                    "title": row["title"],
+                    "content": row.get("content"),
+                    "caption": row.get("caption"),
+                    "author_id": author_ids[row["author_email"]],
+                    "group_id": group_ids[row["group_domain"]],
+                    "date_created": row["date_created"],
+                }
+                for row in chunk
+                if row["author_email"] in author_ids
+                and row["group_domain"] in group_ids
+            ]
+            for batch in chunked(posts, INSERT_BATCH_SIZE):
+                report.written += len(
+                    connection.execute(
+                        insert(Posts).values(batch).returning(Posts.id)
+                    ).all()
+                )
+    report.seconds = time.perf_counter() - start
+    return report
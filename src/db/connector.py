@@ -1,8 +1,16 @@
 """Connection strings and settings for the database."""
+import os
+import threading
+import time
+from dataclasses import dataclass
 from os import environ as env
 
-from sqlalchemy.engine.url import URL
-from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy import Engine, create_engine
+from sqlalchemy.engine.url import URL, make_url
+from sqlalchemy.orm import DeclarativeBase, Session, sessionmaker
+from sqlalchemy.pool import QueuePool
+
+from src.instrumentation import instrument_engine
 
 url_object = URL.create(
     "postgresql+psycopg2",
@@ -12,6 +20,10 @@ url_object = URL.create(
     database="reimagined-octo-goggles",
 )
 
+PRIMARY = "primary"
+REPLICA = "replica"
+
+
 class Base(DeclarativeBase):
     """Base class for sqlalchemy models."""
     __abstract__ = True
@@ -19,3 +31,274 @@ class Base(DeclarativeBase):
     def __repr__(self):
         """Return a string representation of the model."""
         return f"<{self.__class__.__name__} {self.id}>"
+
+
+def _env_int(name: str, default: int) -> int:
+    """Read an integer setting from the environment."""
+    return int(env.get(name, default))
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    """Read a boolean setting from the environment."""
+    return env.get(name, str(default)).lower() in ("1", "true", "yes", "on")
+
+
+@dataclass(frozen=True)
+class PoolSettings:
+    """Connection pool settings of an engine.
+
+    Attributes
+    ----------
+    pool_size
+        Connections kept open in the pool.
+    max_overflow
+        Connections opened beyond ``pool_size`` under load.
+    pool_timeout
+        Seconds to wait for a connection before giving up.
+    pool_recycle
+        Seconds after which a connection is replaced, to outlive server and proxy idle
+        timeouts.
+    pool_pre_ping
+        Test connections on checkout and replace dead ones.
+    statement_timeout_ms
+        Server-side statement timeout in milliseconds. 0 for none.
+    instrument
+        Record query latency, slow queries and N+1 patterns with
+        ``src.instrumentation``.
+    slow_query_ms
+        Latency in milliseconds from which a query is logged as slow. 0 to never log.
+    """
+
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: int = 30
+    pool_recycle: int = 1800
+    pool_pre_ping: bool = True
+    statement_timeout_ms: int = 0
+    instrument: bool = True
+    slow_query_ms: int = 500
+
+    @classmethod
+    def from_env(cls) -> "PoolSettings":
+        """Read the settings from the environment, falling back to the defaults.
+
+        The variables are ``DB_POOL_SIZE``, ``DB_MAX_OVERFLOW``, ``DB_POOL_TIMEOUT``,
+        ``DB_POOL_RECYCLE``, ``DB_POOL_PRE_PING``, ``DB_STATEMENT_TIMEOUT_MS``,
+        ``DB_INSTRUMENT`` and ``DB_SLOW_QUERY_MS``.
+
+        Returns
+        -------
+            PoolSettings: The settings
+        """
+        return cls(
+            pool_size=_env_int("DB_POOL_SIZE", cls.pool_size),
+            max_overflow=_env_int("DB_MAX_OVERFLOW", cls.max_overflow),
+            pool_timeout=_env_int("DB_POOL_TIMEOUT", cls.pool_timeout),
+            pool_recycle=_env_int("DB_POOL_RECYCLE", cls.pool_recycle),
+            pool_pre_ping=_env_bool("DB_POOL_PRE_PING", cls.pool_pre_ping),
+            statement_timeout_ms=_env_int(
+                "DB_STATEMENT_TIMEOUT_MS", cls.statement_timeout_ms
+            ),
+            instrument=_env_bool("DB_INSTRUMENT", cls.instrument),
+            slow_query_ms=_env_int("DB_SLOW_QUERY_MS", cls.slow_query_ms),
+        )
+
+
+class PoolMetrics:
+    """Counts pool checkouts and the time spent waiting for a connection."""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, wait: float) -> None:
+        """Record one checkout and its wait in seconds."""
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+    def snapshot(self) -> dict[str, float]:
+        """Return the counters as a dict."""
+        with self._lock:
+            mean_wait = self.total_wait / self.checkouts if self.checkouts else 0.0
+            return {
+                "checkouts": self.checkouts,
+                "total_wait": self.total_wait,
+                "mean_wait": mean_wait,
+                "max_wait": self.max_wait,
+            }
+
+
+class TimedQueuePool(QueuePool):
+    """Queue pool recording how long each checkout waits for a connection."""
+
+    metrics: PoolMetrics
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.metrics.record(time.perf_counter() - start)
+
+    def recreate(self):
+        # Keep the metrics when the pool is replaced, e.g. by Engine.dispose().
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+_engines: dict[str, Engine] = {}
+_session_factories: dict[bool, sessionmaker] = {}
+_registry_lock = threading.Lock()
+
+
+def database_url(name: str = PRIMARY) -> None | URL:
+    """Return the URL of a database.
+
+    The primary database is read from ``DATABASE_URL``, defaulting to ``url_object``.
+    The read replica is read from ``DATABASE_REPLICA_URL`` and is ``None`` if that is
+    not set.
+
+    Returns
+    -------
+        None | URL: The URL, or None if the database is not configured
+    """
+    if name == PRIMARY:
+        return make_url(env["DATABASE_URL"]) if "DATABASE_URL" in env else url_object
+    if name == REPLICA:
+        return (
+            make_url(env["DATABASE_REPLICA_URL"])
+            if "DATABASE_REPLICA_URL" in env
+            else None
+        )
+    msg = f"Unknown database {name}."
+    raise ValueError(msg)
+
+
+def build_engine(url: URL, settings: None | PoolSettings = None) -> Engine:
+    """Create an engine with a timed pool and, unless disabled, instrumented queries.
+
+    Returns
+    -------
+        Engine: Connection to database
+    """
+    settings = settings or PoolSettings.from_env()
+    connect_args = {}
+    if settings.statement_timeout_ms:
+        timeout = settings.statement_timeout_ms
+        connect_args["options"] = f"-c statement_timeout={timeout}"
+    engine = create_engine(
+        url,
+        poolclass=TimedQueuePool,
+        pool_size=settings.pool_size,
+        max_overflow=settings.max_overflow,
+        pool_timeout=settings.pool_timeout,
+        pool_recycle=settings.pool_recycle,
+        pool_pre_ping=settings.pool_pre_ping,
+        connect_args=connect_args,
+    )
+    engine.pool.metrics = PoolMetrics()
+    if settings.instrument:
+        slow = settings.slow_query_ms / 1000 if settings.slow_query_ms else None
+        instrument_engine(engine, slow_query_seconds=slow)
+    return engine
+
+
+def get_engine(name: str = PRIMARY) -> Engine:
+    """Return the process-wide engine of a database, creating it on first use.
+
+    The read replica falls back to the primary engine when ``DATABASE_REPLICA_URL`` is
+    not set.
+
+    Returns
+    -------
+        Engine: Connection to database
+    """
+    with _registry_lock:
+        engine = _engines.get(name)
+        if engine is None:
+            url = database_url(name)
+            if url is None:
+                engine = _engines.get(PRIMARY) or build_engine(database_url(PRIMARY))
+                _engines[PRIMARY] = engine
+            else:
+                engine = build_engine(url)
+            _engines[name] = engine
+        return engine
+
+
+def session_factory(readonly: bool = False) -> sessionmaker:
+    """Return the process-wide session factory.
+
+    Read-only sessions are bound to the read replica, if configured, and run their
+    transactions read-only.
+
+    Returns
+    -------
+        sessionmaker: The session factory
+    """
+    with _registry_lock:
+        factory = _session_factories.get(readonly)
+    if factory is None:
+        if readonly:
+            bind = get_engine(REPLICA).execution_options(postgresql_readonly=True)
+        else:
+            bind = get_engine(PRIMARY)
+        factory = sessionmaker(bind=bind)
+        with _registry_lock:
+            factory = _session_factories.setdefault(readonly, factory)
+    return factory
+
+
+def get_session(readonly: bool = False) -> Session:
+    """Create a session from the process-wide session factory.
+
+    Returns
+    -------
+        Session: The session
+    """
+    return session_factory(readonly)()
+
+
+def pool_metrics() -> dict[str, dict[str, float]]:
+    """Return the checkout-wait metrics of each engine's pool.
+
+    A replica falling back to the primary shares its engine, whose pool is reported
+    once, under the primary.
+    """
+    with _registry_lock:
+        engines = dict(_engines)
+    names: dict[Engine, str] = {}
+    for name, engine in engines.items():
+        names.setdefault(engine, name)
+    return {name: engine.pool.metrics.snapshot() for engine, name in names.items()}
+
+
+def dispose_engines() -> None:
+    """Close all pooled connections and forget the engines and session factories."""
+    with _registry_lock:
+        engines = set(_engines.values())
+        _engines.clear()
+        _session_factories.clear()
+    for engine in engines:
+        engine.dispose()
+
+
+def _after_fork_in_child() -> None:
+    """Drop the parent's pooled connections in a forked child, leaving them open.
+
+    The registry lock is replaced too: if another thread of the parent held it while
+    forking, the child's copy stays locked forever, since that thread does not exist in
+    the child.
+    """
+    global _registry_lock
+    _registry_lock = threading.Lock()
+    for engine in set(_engines.values()):
+        engine.dispose(close=False)
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
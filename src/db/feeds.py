@@ -0,0 +1,212 @@
+"""Keyset pagination of the posts of a group or an author.
+
+A page is read as
+``WHERE (date_created, id) < (last seen) ORDER BY date_created DESC, id DESC LIMIT n``
+(or ``>`` and ascending for the oldest first), which seeks into the
+``(group_id, date_created, id)`` and ``(author_id, date_created, id)`` indexes. Unlike
+``OFFSET``, a deep page costs the same as the first one. Callers get the position of the
+last post as an opaque cursor and pass it back for the next page.
+
+``posts`` is partitioned by month, and the row comparison alone does not let PostgreSQL
+skip partitions, so pages also bound ``date_created`` by the cursor and by the optional
+``since`` and ``until``.
+"""
+import base64
+import binascii
+import json
+from collections.abc import Sequence
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import ColumnElement, tuple_
+from sqlalchemy.orm import Session
+
+from src.db.models import Posts
+from src.db.partitions import created_between
+from src.db.repository import Repository
+
+NEWEST_FIRST = "newest"
+OLDEST_FIRST = "oldest"
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 200
+
+
+@dataclass
+class FeedPage:
+    """A page of posts.
+
+    Attributes
+    ----------
+    posts
+        The posts of the page, in feed order.
+    next_cursor
+        The cursor of the next page, or None if this is the last page.
+    """
+
+    posts: Sequence[Posts]
+    next_cursor: None | str
+
+
+def encode_position(values: list) -> str:
+    """Encode JSON values marking a position in a listing as an opaque cursor.
+
+    Returns
+    -------
+        str: The cursor
+    """
+    payload = json.dumps(values, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_position(cursor: str) -> list:
+    """Decode a cursor made by ``encode_position``.
+
+    Returns
+    -------
+        list: The values
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, UnicodeDecodeError, ValueError) as err:
+        msg = f"Invalid cursor {cursor}."
+        raise ValueError(msg) from err
+    if not isinstance(values, list):
+        msg = f"Invalid cursor {cursor}."
+        raise ValueError(msg)
+    return values
+
+
+def encode_cursor(post: Posts) -> str:
+    """Encode the feed position of a post as an opaque cursor.
+
+    Returns
+    -------
+        str: The cursor
+    """
+    return encode_position([post.date_created.isoformat(), post.id])
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """Decode a cursor into the creation time and id of the post it points at.
+
+    Returns
+    -------
+        tuple[datetime, int]: The position
+    """
+    try:
+        date_created, post_id = decode_position(cursor)
+        return datetime.fromisoformat(date_created), int(post_id)
+    except (TypeError, ValueError) as err:
+        msg = f"Invalid cursor {cursor}."
+        raise ValueError(msg) from err
+
+
+def _feed(
+    session: Session,
+    condition: ColumnElement[bool],
+    cursor: None | str,
+    limit: int,
+    order: str,
+    profile: str,
+    strict: bool,
+    since: None | datetime,
+    until: None | datetime,
+) -> FeedPage:
+    """Read one page of the posts matching a condition."""
+    if order not in (NEWEST_FIRST, OLDEST_FIRST):
+        msg = f"Unknown order {order}."
+        raise ValueError(msg)
+    if not 0 < limit <= MAX_PAGE_SIZE:
+        msg = f"The page size must be between 1 and {MAX_PAGE_SIZE}."
+        raise ValueError(msg)
+
+    position = tuple_(Posts.date_created, Posts.id)
+    query = (
+        Repository(session, strict)
+        .select(Posts, profile)
+        .where(condition, created_between(since, until))
+    )
+    if order == NEWEST_FIRST:
+        query = query.order_by(Posts.date_created.desc(), Posts.id.desc())
+    else:
+        query = query.order_by(Posts.date_created, Posts.id)
+    if cursor is not None:
+        seen_date, seen_id = decode_cursor(cursor)
+        seen = tuple_(seen_date, seen_id)
+        if order == NEWEST_FIRST:
+            query = query.where(position < seen, Posts.date_created <= seen_date)
+        else:
+            query = query.where(position > seen, Posts.date_created >= seen_date)
+
+    # One extra row tells whether there is a next page without counting.
+    posts = session.scalars(query.limit(limit + 1)).unique().all()
+    if len(posts) <= limit:
+        return FeedPage(posts, None)
+    posts = posts[:limit]
+    return FeedPage(posts, encode_cursor(posts[-1]))
+
+
+def group_feed(
+    session: Session,
+    group_id: int,
+    cursor: None | str = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    order: str = NEWEST_FIRST,
+    profile: str = "post_list",
+    strict: bool = False,
+    since: None | datetime = None,
+    until: None | datetime = None,
+) -> FeedPage:
+    """Get a page of the posts in a group.
+
+    ``since`` and ``until`` bound the creation time of the posts. Raises ``ValueError``
+    for an invalid cursor, order or page size.
+
+    Returns
+    -------
+        FeedPage: The posts and the cursor of the next page
+    """
+    return _feed(
+        session,
+        Posts.group_id == group_id,
+        cursor,
+        limit,
+        order,
+        profile,
+        strict,
+        since,
+        until,
+    )
+
+
+def author_feed(
+    session: Session,
+    author_id: int,
+    cursor: None | str = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    order: str = NEWEST_FIRST,
+    profile: str = "post_list",
+    strict: bool = False,
+    since: None | datetime = None,
+    until: None | datetime = None,
+) -> FeedPage:
+    """Get a page of the posts of an author.
+
+    ``since`` and ``until`` bound the creation time of the posts. Raises ``ValueError``
+    for an invalid cursor, order or page size.
+
+    Returns
+    -------
+        FeedPage: The posts and the cursor of the next page
+    """
+    return _feed(
+        session,
+        Posts.author_id == author_id,
+        cursor,
+        limit,
+        order,
+        profile,
+        strict,
+        since,
+        until,
+    )
@@ -0,0 +1,348 @@
+"""Read-through cache of users by email and groups by domain.
+
+Lookups go to a bounded in-process LRU with a TTL first, then to an optional shared
+backend (e.g. Redis, through ``CacheBackend``), then to the database. Entries are plain
+snapshots rather than ORM objects, so they can be shared between sessions and threads.
+
+Once installed, the cache listens to ``after_insert``, ``after_update`` and
+``after_delete`` on ``Users`` and ``Groups`` and drops the entries of the changed rows,
+under their old and new keys. The keys are dropped again after the session commits, so a
+lookup that re-read the old row while the change was still uncommitted cannot keep it,
+and a lookup that loaded a row before an invalidation of its key does not cache it
+afterwards.
+
+Invalidation only reaches the local cache of this process and the shared backend: the
+local caches of other processes keep their entries until the TTL expires.
+"""
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Any, Protocol
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session, sessionmaker
+
+from src.db import connector
+from src.db.models import Groups, Users
+
+DEFAULT_MAX_SIZE = 10_000
+DEFAULT_TTL = 60.0
+# Key of the session.info set holding the cache keys changed in the session's
+# transaction.
+PENDING_KEYS = "lookup_cache_keys"
+
+
+@dataclass(frozen=True)
+class UserSnapshot:
+    """The cached columns of a user. The password is never cached."""
+
+    id: int
+    name: str
+    email: str
+    date_created: datetime
+
+
+@dataclass(frozen=True)
+class GroupSnapshot:
+    """The cached columns of a group."""
+
+    id: int
+    name: str
+    domain: str
+    date_created: datetime
+
+
+class CacheBackend(Protocol):
+    """A cache shared between processes. Values are dicts of the snapshot fields."""
+
+    def get(self, key: str) -> None | dict[str, Any]:
+        """Return the value of a key, or None if it is missing or expired."""
+
+    def set(self, key: str, value: dict[str, Any], ttl: float) -> None:
+        """Store a value for ``ttl`` seconds."""
+
+    def delete(self, key: str) -> None:
+        """Drop a key."""
+
+
+class LRUCache:
+    """Thread-safe in-process cache of at most ``max_size`` entries.
+
+    Each entry lives at most ``ttl`` seconds.
+    """
+
+    def __init__(
+        self,
+        max_size: int = DEFAULT_MAX_SIZE,
+        ttl: float = DEFAULT_TTL,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Any:
+        """Return the value of a key, or None if it is missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= self.clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: None | float = None) -> None:
+        """Store a value, evicting the least recently used entry when full."""
+        with self._lock:
+            self._entries[key] = (
+                self.clock() + (self.ttl if ttl is None else ttl),
+                value,
+            )
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        """Drop a key."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Drop all keys."""
+        with self._lock:
+            self._entries.clear()
+
+
+class CacheStats:
+    """Counts lookups by where they were answered, and their latency."""
+
+    def __init__(self):
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, source: str, latency: float) -> None:
+        """Record one lookup and its latency in seconds.
+
+        ``source`` is ``hit``, ``shared_hit`` or ``miss``.
+        """
+        with self._lock:
+            if source == "hit":
+                self.hits += 1
+            elif source == "shared_hit":
+                self.shared_hits += 1
+            else:
+                self.misses += 1
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+
+    def snapshot(self) -> dict[str, float]:
+        """Return the counters, the hit ratio and the mean latency as a dict."""
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                "lookups": lookups,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits + self.shared_hits) / lookups
+                if lookups
+                else 0.0,
+                "mean_latency": self.total_latency / lookups if lookups else 0.0,
+                "max_latency": self.max_latency,
+            }
+
+
+def user_key(email: str) -> str:
+    """Return the cache key of a user."""
+    return f"users:email:{email}"
+
+
+def group_key(domain: str) -> str:
+    """Return the cache key of a group."""
+    return f"groups:domain:{domain}"
+
+
+def _changed_keys(target: Users | Groups) -> set[str]:
+    """Return the current and previous cache keys of a changed user or group."""
+    if isinstance(target, Users):
+        attribute, make_key = "email", user_key
+    else:
+        attribute, make_key = "domain", group_key
+    history = inspect(target).attrs[attribute].history
+    values = {getattr(target, attribute), *history.deleted}
+    return {make_key(value) for value in values if value is not None}
+
+
+class LookupCache:
+    """Read-through cache of users by email and groups by domain.
+
+    Lookups read from the primary database by default: a lagging replica could hand back
+    a row the cache was just told to forget.
+    """
+
+    def __init__(
+        self,
+        session_factory: None | sessionmaker = None,
+        max_size: int = DEFAULT_MAX_SIZE,
+        ttl: float = DEFAULT_TTL,
+        backend: None | CacheBackend = None,
+    ):
+        self.session_factory = session_factory
+        self.local = LRUCache(max_size, ttl)
+        self.backend = backend
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._installed = False
+        # Generation of the latest invalidation of recently invalidated keys, bounded
+        # like the local cache; keys dropped from it count as invalidated at the
+        # generation of the latest one dropped.
+        self._generation = 0
+        self._invalidated: OrderedDict[str, int] = OrderedDict()
+        self._forgotten = 0
+        self._generation_lock = threading.Lock()
+
+    def _invalidated_since(self, key: str, generation: int) -> bool:
+        """Return True if a key was invalidated after a generation."""
+        with self._generation_lock:
+            return self._invalidated.get(key, self._forgotten) > generation
+
+    def _lookup(
+        self, key: str, snapshot_type: type, load: Callable[[Session], Any]
+    ) -> Any:
+        """Read a key through the local cache, the shared backend and the database."""
+        start = time.perf_counter()
+        snapshot = self.local.get(key)
+        source = "hit"
+        if snapshot is None and self.backend is not None:
+            value = self.backend.get(key)
+            if value is not None:
+                snapshot = snapshot_type(**value)
+                self.local.set(key, snapshot)
+                source = "shared_hit"
+        if snapshot is None:
+            source = "miss"
+            generation = self._generation
+            factory = self.session_factory or connector.session_factory()
+            with factory() as session:
+                row = load(session)
+                if row is not None:
+                    fields = snapshot_type.__dataclass_fields__
+                    snapshot = snapshot_type(
+                        **{field: getattr(row, field) for field in fields}
+                    )
+            # A change committed while the row loaded invalidated the key already, and
+            # the row may predate it.
+            if snapshot is not None and not self._invalidated_since(key, generation):
+                self.local.set(key, snapshot)
+                if self.backend is not None:
+                    self.backend.set(key, asdict(snapshot), self.ttl)
+        self.stats.record(source, time.perf_counter() - start)
+        return snapshot
+
+    def user_by_email(self, email: str) -> None | UserSnapshot:
+        """Get a user by email.
+
+        Returns
+        -------
+            None | UserSnapshot: The user, or None if not found
+        """
+        return self._lookup(
+            user_key(email),
+            UserSnapshot,
+            lambda session: session.scalars(
+                select(Users).filter_by(email=email)
+            ).first(),
+        )
+
+    def group_by_domain(self, domain: str) -> None | GroupSnapshot:
+        """Get a group by domain.
+
+        Returns
+        -------
+            None | GroupSnapshot: The group, or None if not found
+        """
+        return self._lookup(
+            group_key(domain),
+            GroupSnapshot,
+            lambda session: session.scalars(
+                select(Groups).filter_by(domain=domain)
+            ).first(),
+        )
+
+    def invalidate(self, keys: set[str]) -> None:
+        """Drop keys from the local cache and the shared backend.
+
+        Lookups in flight do not cache them afterwards.
+        """
+        with self._generation_lock:
+            self._generation += 1
+            for key in keys:
+                self._invalidated[key] = self._generation
+                self._invalidated.move_to_end(key)
+            while len(self._invalidated) > self.local.max_size:
+                _, self._forgotten = self._invalidated.popitem(last=False)
+        for key in keys:
+            self.local.delete(key)
+            if self.backend is not None:
+                self.backend.delete(key)
+
+    def clear(self) -> None:
+        """Drop every entry of the local cache."""
+        self.local.clear()
+
+    def _after_change(self, mapper, connection, target: Users | Groups) -> None:
+        """Drop the entries of a changed row and remember them for the commit."""
+        keys = _changed_keys(target)
+        self.invalidate(keys)
+        session = Session.object_session(target)
+        if session is not None:
+            session.info.setdefault(PENDING_KEYS, set()).update(keys)
+
+    def _after_commit(self, session: Session) -> None:
+        """Drop the entries changed in the committed transaction again."""
+        self.invalidate(session.info.pop(PENDING_KEYS, set()))
+
+    def _after_rollback(self, session: Session) -> None:
+        """Forget the entries changed in a rolled back transaction."""
+        session.info.pop(PENDING_KEYS, None)
+
+    def install(self) -> "LookupCache":
+        """Start invalidating entries on ORM changes.
+
+        Returns
+        -------
+            LookupCache: The cache
+        """
+        if not self._installed:
+            for model in (Users, Groups):
+                for name in ("after_insert", "after_update", "after_delete"):
+                    event.listen(model, name, self._after_change)
+            event.listen(Session, "after_commit", self._after_commit)
+            event.listen(Session, "after_rollback", self._after_rollback)
+            self._installed = True
+        return self
+
+    def uninstall(self) -> None:
+        """Stop invalidating entries on ORM changes."""
+        if self._installed:
+            for model in (Users, Groups):
+                for name in ("after_insert", "after_update", "after_delete"):
+                    event.remove(model, name, self._after_change)
+            event.remove(Session, "after_commit", self._after_commit)
+            event.remove(Session, "after_rollback", self._after_rollback)
+            self._installed = False
@@ -0,0 +1,377 @@
+"""Helpers for revisions changing large tables while the application keeps writing.
+
+Alembic runs a revision in one transaction, so an ``UPDATE`` of every row or a plain
+``CREATE INDEX`` holds its locks until the revision commits and stalls every write to
+the table meanwhile. Revisions use these helpers instead:
+
+- ``backfill`` updates rows in key ranges, committing each batch and pausing between
+  them, and can resume from the last key it logged.
+- ``create_index_concurrently`` and ``drop_index_concurrently`` build and drop indexes
+  without blocking writes, one partition at a time for partitioned tables.
+  ``rename_index`` renames an index, including one of those.
+- ``retry_on_lock_timeout`` retries short DDL that gave up waiting for its lock, instead
+  of failing the revision.
+
+``backfill``, ``create_index_concurrently`` and ``drop_index_concurrently`` leave the
+revision's transaction: entering their autocommit block commits the statements the
+revision ran before them. If the revision fails afterwards, those statements stay
+applied while alembic still records the previous revision, so the rerun runs them again.
+Write them to be rerun, e.g. ``ADD COLUMN IF NOT EXISTS``,
+``CREATE OR REPLACE FUNCTION`` or ``DROP TRIGGER IF EXISTS`` before ``CREATE TRIGGER``,
+or move them to a revision of their own. The helpers themselves can be rerun.
+
+``env.py`` sets ``lock_timeout`` on the migration connection, so DDL gives up instead of
+queueing behind long queries while blocking everything queued after it, and runs each
+revision in its own transaction. Options are passed with ``-x``, e.g.
+``alembic -x dry_run=true -x lock_timeout=2s upgrade head``:
+
+- ``dry_run``: run the revisions in a transaction that is rolled back, to check they
+  apply. Backfills only estimate the rows they would touch, and concurrent index builds
+  and drops are skipped, along with renames of the indexes skipped. Other statements run
+  in full: a revision rewriting a table, like partitioning posts, takes as long and
+  holds the same locks as the real run.
+- ``lock_timeout``: how long DDL waits for a lock, ``5s`` by default.
+- ``batch_size`` and ``pause``: the default rows per backfill batch and seconds to sleep
+  between batches.
+"""
+import logging
+import time
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+
+from alembic import context, op
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+LOCK_NOT_AVAILABLE = "55P03"
+logger = logging.getLogger("alembic.runtime.migration")
+# Indexes a dry run skipped building, so the revisions after can skip renaming them.
+_dry_run_indexes: set[str] = set()
+
+
+def _x_bool(value: str) -> bool:
+    """Read a boolean ``-x`` option."""
+    return value.lower() in ("1", "true", "yes", "on")
+
+
+@dataclass(frozen=True)
+class MigrationOptions:
+    """Options of a migration run, read from the ``-x`` arguments of alembic.
+
+    Attributes
+    ----------
+    dry_run
+        Roll every revision back, estimating the work of backfills and skipping
+        concurrent index builds.
+    lock_timeout
+        How long DDL waits for a lock before failing, as a PostgreSQL interval.
+    batch_size
+        Default rows per backfill batch.
+    pause
+        Default seconds to sleep between backfill batches.
+    """
+
+    dry_run: bool = False
+    lock_timeout: str = "5s"
+    batch_size: int = 10_000
+    pause: float = 0.1
+
+    @classmethod
+    def from_context(cls) -> "MigrationOptions":
+        """Read the options of the running migration.
+
+        Returns
+        -------
+            MigrationOptions: The options
+        """
+        arguments = context.get_x_argument(as_dictionary=True)
+        return cls(
+            dry_run=_x_bool(arguments.get("dry_run", str(cls.dry_run))),
+            lock_timeout=arguments.get("lock_timeout", cls.lock_timeout),
+            batch_size=int(arguments.get("batch_size", cls.batch_size)),
+            pause=float(arguments.get("pause", cls.pause)),
+        )
+
+
+@dataclass
+class BackfillReport:
+    """Outcome of a backfill.
+
+    Attributes
+    ----------
+    table
+        The table updated.
+    rows
+        Rows updated, or the estimate of the rows to update in a dry run.
+    batches
+        Batches committed.
+    last_key
+        The highest key covered, to resume from with ``start``.
+    seconds
+        Wall time of the backfill.
+    """
+
+    table: str
+    rows: int
+    batches: int = 0
+    last_key: None | int = None
+    seconds: float = 0.0
+
+
+def set_lock_timeout(timeout: str) -> None:
+    """Set how long the following statements of the migration wait for a lock, e.g.
+
+    ``"2s"``.
+    """
+    op.execute(f"SET lock_timeout = '{timeout}'")
+
+
+def estimate_rows(table: str, where: None | str = None) -> int:
+    """Estimate the rows of a table matching a condition from the planner statistics.
+
+    The rows are not scanned.
+
+    Returns
+    -------
+        int: The estimated number of rows
+    """
+    plan = op.get_bind().scalar(
+        text(f"EXPLAIN (FORMAT JSON) SELECT 1 FROM {table} WHERE {where or 'true'}")
+    )
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def backfill(
+    table: str,
+    values: str,
+    where: None | str = None,
+    key: str = "id",
+    batch_size: None | int = None,
+    pause: None | float = None,
+    start: None | int = None,
+    progress: None | Callable[[BackfillReport], None] = None,
+) -> BackfillReport:
+    """Update the rows of a table in batches of consecutive keys, committing each batch.
+
+    ``values`` is the ``SET`` clause and ``where`` restricts the rows updated. Make
+    ``where`` exclude the rows already done, e.g. ``new_column IS NULL``, so a rerun
+    after a failure skips them; or pass the last key logged as ``start``. ``key`` must
+    be an indexed integer column. Progress is logged after each batch and passed to
+    ``progress``. Offline ``--sql`` scripts get one unbatched ``UPDATE``. The statements
+    the revision ran before are committed first, so they must be rerunnable.
+
+    Returns
+    -------
+        BackfillReport: The rows updated and the last key covered
+    """
+    options = MigrationOptions.from_context()
+    batch_size = batch_size or options.batch_size
+    pause = options.pause if pause is None else pause
+    condition = where or "true"
+    if context.is_offline_mode():
+        op.execute(f"UPDATE {table} SET {values} WHERE {condition}")
+        return BackfillReport(table, 0)
+    if options.dry_run:
+        report = BackfillReport(table, estimate_rows(table, where))
+        logger.info(
+            "Dry run: backfill of %s would update about %d rows.", table, report.rows
+        )
+        return report
+
+    bind = op.get_bind()
+    lowest, highest = bind.execute(
+        text(f"SELECT min({key}), max({key}) FROM {table}")
+    ).one()
+    report = BackfillReport(table, 0, last_key=start)
+    if highest is None:
+        return report
+    lower = lowest - 1 if start is None else start
+    update = text(
+        f"UPDATE {table} SET {values} "
+        f"WHERE {key} > :lower AND {key} <= :upper AND ({condition})"
+    )
+    began = time.perf_counter()
+    with op.get_context().autocommit_block():
+        while lower < highest:
+            upper = min(lower + batch_size, highest)
+            report.rows += (
+                op.get_bind().execute(update, {"lower": lower, "upper": upper}).rowcount
+            )
+            report.batches += 1
+            report.last_key = lower = upper
+            report.seconds = time.perf_counter() - began
+            logger.info(
+                "Backfill of %s: %d rows updated, %s up to %d of %d.",
+                table,
+                report.rows,
+                key,
+                upper,
+                highest,
+            )
+            if progress is not None:
+                progress(report)
+            if pause and lower < highest:
+                time.sleep(pause)
+    return report
+
+
+def _partitions(table: str) -> list[str]:
+    """List the partitions of a table, empty if it is not partitioned."""
+    return list(
+        op.get_bind().scalars(
+            text(
+                "SELECT inhrelid::regclass::text FROM pg_inherits "
+                "WHERE inhparent = CAST(:table AS regclass)"
+            ),
+            {"table": table},
+        )
+    )
+
+
+def _without_lock_timeout(statement: str) -> None:
+    """Run a concurrent index build or drop without the lock timeout of the migration.
+
+    It waits for every transaction using the table to finish, which the timeout would
+    cut short, leaving an invalid index behind; it does not block writes while waiting.
+    """
+    op.execute("SET lock_timeout = 0")
+    try:
+        op.execute(statement)
+    finally:
+        set_lock_timeout(MigrationOptions.from_context().lock_timeout)
+
+
+def _drop_invalid_index(name: str) -> None:
+    """Drop the remains of an index whose concurrent build failed, to build it again."""
+    invalid = op.get_bind().scalar(
+        text(
+            "SELECT EXISTS (SELECT 1 FROM pg_index "
+            "JOIN pg_class ON pg_class.oid = pg_index.indexrelid "
+            "WHERE pg_class.relname = :name AND NOT pg_index.indisvalid)"
+        ),
+        {"name": name},
+    )
+    if invalid:
+        _without_lock_timeout(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+def create_index_concurrently(
+    name: str, table: str, columns: Sequence[str], using: None | str = None
+) -> None:
+    """Build an index without blocking writes to the table.
+
+    ``CREATE INDEX CONCURRENTLY`` cannot run in a transaction, so the revision's
+    transaction is committed first, along with the statements the revision ran before,
+    which must be rerunnable. Partitioned tables do not support it, so the index is
+    created on the parent only, built concurrently on each partition and attached.
+    Reruns skip what was already built, drop and rebuild what a failed build left
+    invalid, and attach the rest.
+    """
+    method = f" USING {using}" if using else ""
+    listed = ", ".join(columns)
+    if context.is_offline_mode():
+        with op.get_context().autocommit_block():
+            op.create_index(
+                name,
+                table,
+                list(columns),
+                postgresql_using=using,
+                postgresql_concurrently=True,
+            )
+        return
+    if MigrationOptions.from_context().dry_run:
+        logger.info(
+            "Dry run: skipped building %s on about %d rows of %s.",
+            name,
+            estimate_rows(table),
+            table,
+        )
+        _dry_run_indexes.add(name)
+        return
+
+    with op.get_context().autocommit_block():
+        partitions = _partitions(table)
+        if not partitions:
+            _drop_invalid_index(name)
+            _without_lock_timeout(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} "
+                f"ON {table}{method} ({listed})"
+            )
+            return
+        # Created on the parent only, the index stays invalid until every partition has
+        # its index attached.
+        op.execute(
+            f"CREATE INDEX IF NOT EXISTS {name} ON ONLY {table}{method} ({listed})"
+        )
+        for partition in partitions:
+            partition_index = f"{partition}_{name.removeprefix(f'ix_{table}_')}_idx"
+            _drop_invalid_index(partition_index)
+            _without_lock_timeout(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {partition_index} "
+                f"ON {partition}{method} ({listed})"
+            )
+            op.execute(f"ALTER INDEX {name} ATTACH PARTITION {partition_index}")
+
+
+def drop_index_concurrently(name: str, table: str) -> None:
+    """Drop an index without blocking writes to the table.
+
+    Indexes of partitioned tables cannot be dropped concurrently; they are dropped with
+    a plain ``DROP INDEX``, which needs a brief exclusive lock and gives up after the
+    lock timeout. Otherwise the revision's transaction is committed first, along with
+    the statements the revision ran before, which must be rerunnable. Dropping an index
+    that is already gone does nothing.
+    """
+    if context.is_offline_mode():
+        with op.get_context().autocommit_block():
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
+        return
+    if MigrationOptions.from_context().dry_run:
+        logger.info("Dry run: skipped dropping %s.", name)
+        return
+    if _partitions(table):
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+        return
+    with op.get_context().autocommit_block():
+        _without_lock_timeout(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+def rename_index(name: str, new_name: str) -> None:
+    """Rename an index.
+
+    In a dry run, an index whose build was skipped is skipped again under its new name.
+    """
+    if name in _dry_run_indexes:
+        logger.info("Dry run: skipped renaming %s to %s.", name, new_name)
+        _dry_run_indexes.add(new_name)
+        return
+    op.execute(f"ALTER INDEX {name} RENAME TO {new_name}")
+
+
+def retry_on_lock_timeout(
+    operation: Callable[[], None], attempts: int = 5, wait: float = 2.0
+) -> None:
+    """Run DDL in a savepoint, retrying it when it gives up waiting for a lock.
+
+    Waiting between attempts lets the queries holding the lock finish, instead of
+    failing the revision or holding up every query queued behind the DDL.
+    """
+    bind = op.get_bind()
+    for attempt in range(1, attempts + 1):
+        try:
+            with bind.begin_nested():
+                operation()
+            return
+        except OperationalError as err:
+            if (
+                getattr(err.orig, "pgcode", None) != LOCK_NOT_AVAILABLE
+                or attempt == attempts
+            ):
+                raise
+            logger.info(
+                "Lock not available, attempt %d of %d, retrying in %.1fs.",
+                attempt,
+                attempts,
+                wait,
+            )
+            time.sleep(wait)
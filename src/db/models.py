@@ -1,6 +1,18 @@
 """Module for sqlalchemy models."""
 
-from sqlalchemy import ForeignKey, Identity, Text, DateTime
+from sqlalchemy import (
+    DDL,
+    Boolean,
+    ForeignKey,
+    Identity,
+    Index,
+    Integer,
+    Text,
+    DateTime,
+    event,
+    func,
+    text,
+)
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from src.db.connector import Base
 
@@ -12,6 +24,9 @@ class Users(Base):
     email: Mapped[str] = mapped_column(Text, unique=True)
     password: Mapped[str] = mapped_column(Text, nullable=False)
     date_created: Mapped[str] = mapped_column(DateTime(timezone=True), nullable=False)
+    post_count: Mapped[int] = mapped_column(
+        Integer, nullable=False, server_default=text("0")
+    )
     posts: Mapped[list["Posts"]] = relationship("Posts", back_populates="author")
 
 class Groups(Base):
@@ -22,11 +37,23 @@ class Groups(Base):
     name: Mapped[str] = mapped_column(Text, nullable=False, unique=False)
     domain: Mapped[str] = mapped_column(Text, unique=True)
     date_created: Mapped[str] = mapped_column(DateTime(timezone=True), nullable=False)
+    post_count: Mapped[int] = mapped_column(
+        Integer, nullable=False, server_default=text("0")
+    )
     posts: Mapped[list["Posts"]] = relationship("Posts", back_populates="group")
 
 class Posts(Base):
     """Model for posts."""
     __tablename__ = "posts"
+    __table_args__ = (
+        # Both foreign keys lead their index, followed by the feed order, so keyset
+        # pages of an author's or group's posts are read straight from the index.
+        Index("ix_posts_author_id_date_created_id", "author_id", "date_created", "id"),
+        Index("ix_posts_group_id_date_created_id", "group_id", "date_created", "id"),
+        # Range partitioned by creation month on PostgreSQL, see src.db.partitions. The
+        # partition key has to be part of the primary key.
+        {"postgresql_partition_by": "RANGE (date_created)"},
+    )
 
     id: Mapped[int] = mapped_column(Identity(start=1), primary_key=True)
     title: Mapped[str] = mapped_column(Text, nullable=False, unique=False)
@@ -34,5 +61,142 @@ class Posts(Base):
     caption: Mapped[str] = mapped_column(Text, nullable=True, unique=False)
     author_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
     group_id: Mapped[int] = mapped_column(ForeignKey("groups.id"))
+    date_created: Mapped[str] = mapped_column(
+        DateTime(timezone=True),
+        primary_key=True,
+        nullable=False,
+        server_default=func.now(),
+    )
     author: Mapped["Users"] = relationship("Users", back_populates="posts")
-    group: Mapped["Groups"] = relationship("Groups", back_populates="posts")
\ No newline at end of file
+    group: Mapped["Groups"] = relationship("Groups", back_populates="posts")
+
+# Search document of a post: the title ranks above the caption, which ranks above the
+# content.
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(caption, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(content, '')), 'C')"
+)
+
+# The search column is generated by PostgreSQL and only used in queries, so it is not
+# mapped and is added to the table only on PostgreSQL, like the migration does.
+event.listen(
+    Posts.__table__,
+    "after_create",
+    DDL(
+        "ALTER TABLE posts ADD COLUMN search_vector tsvector "
+        f"GENERATED ALWAYS AS ({SEARCH_VECTOR}) STORED"
+    ).execute_if(dialect="postgresql"),
+)
+event.listen(
+    Posts.__table__,
+    "after_create",
+    DDL(
+        "CREATE INDEX ix_posts_search_vector ON posts USING gin (search_vector)"
+    ).execute_if(dialect="postgresql"),
+)
+# Rows outside every monthly partition land in the default partition instead of failing.
+event.listen(
+    Posts.__table__,
+    "after_create",
+    DDL("CREATE TABLE posts_default PARTITION OF posts DEFAULT").execute_if(
+        dialect="postgresql"
+    ),
+)
+
+# users.post_count and groups.post_count are kept up to date by statement triggers on
+# posts, see src.db.post_counts. A statement sees the posts it inserted and deleted in
+# transition tables, so a bulk insert updates each author and group once rather than
+# once per post, and an update only touches the counts when it moves posts.
+POST_COUNT_CHANGES = {
+    "INSERT": "SELECT author_id, group_id, 1 AS n FROM inserted",
+    "DELETE": "SELECT author_id, group_id, -1 AS n FROM deleted",
+    "UPDATE": (
+        "SELECT author_id, group_id, 1 AS n FROM inserted "
+        "UNION ALL SELECT author_id, group_id, -1 FROM deleted"
+    ),
+}
+POST_COUNT_UPDATE = (
+    "UPDATE {table} SET post_count = post_count + delta.n "
+    "FROM (SELECT {key}, sum(n) AS n FROM ({changes}) changes GROUP BY {key}) delta "
+    "WHERE {table}.id = delta.{key} AND delta.n <> 0;"
+)
+COUNT_POSTS_FUNCTION = (
+    "CREATE OR REPLACE FUNCTION count_posts() RETURNS trigger LANGUAGE plpgsql "
+    "AS $$ BEGIN "
+    + " ".join(
+        f"IF TG_OP = '{operation}' THEN "
+        + POST_COUNT_UPDATE.format(table="users", key="author_id", changes=changes)
+        + POST_COUNT_UPDATE.format(table="groups", key="group_id", changes=changes)
+        + " END IF;"
+        for operation, changes in POST_COUNT_CHANGES.items()
+    )
+    + " RETURN NULL; END $$"
+)
+COUNT_POSTS_TRIGGERS = "; ".join(
+    f"CREATE TRIGGER count_posts_{operation.lower()} AFTER {operation} ON posts "
+    f"REFERENCING {tables} "
+    "FOR EACH STATEMENT EXECUTE FUNCTION count_posts()"
+    for operation, tables in {
+        "INSERT": "NEW TABLE AS inserted",
+        "DELETE": "OLD TABLE AS deleted",
+        "UPDATE": "OLD TABLE AS deleted NEW TABLE AS inserted",
+    }.items()
+)
+event.listen(
+    Posts.__table__,
+    "after_create",
+    DDL(COUNT_POSTS_FUNCTION).execute_if(dialect="postgresql"),
+)
+event.listen(
+    Posts.__table__,
+    "after_create",
+    DDL(COUNT_POSTS_TRIGGERS).execute_if(dialect="postgresql"),
+)
+
+class TrackingRows(Base):
+    """Model for the rows of the tracking tabs, mirrored from the Google Sheets."""
+    __tablename__ = "tracking_rows"
+    __table_args__ = (
+        # Partial indexes over the few open rows of each request, for the completion and
+        # next-row queries.
+        Index(
+            "ix_tracking_rows_incomplete",
+            "sheet_id",
+            "tab_name",
+            "request_uuid",
+            "row_number",
+            postgresql_where=text("incomplete"),
+            sqlite_where=text("incomplete"),
+        ),
+        Index(
+            "ix_tracking_rows_leased",
+            "sheet_id",
+            "tab_name",
+            "request_uuid",
+            postgresql_where=text("leased"),
+            sqlite_where=text("leased"),
+        ),
+    )
+
+    sheet_id: Mapped[str] = mapped_column(Text, primary_key=True)
+    tab_name: Mapped[str] = mapped_column(Text, primary_key=True)
+    request_uuid: Mapped[str] = mapped_column(Text, primary_key=True)
+    cell_sn: Mapped[str] = mapped_column(Text, primary_key=True)
+    # Rows repeating a (request UUID, cell SN) pair are numbered in sheet order, the
+    # first one 0.
+    occurrence: Mapped[int] = mapped_column(Integer, primary_key=True)
+    row_number: Mapped[int] = mapped_column(Integer, nullable=False)
+    status: Mapped[str] = mapped_column(Text, nullable=True)
+    incomplete: Mapped[bool] = mapped_column(Boolean, nullable=False)
+    leased: Mapped[bool] = mapped_column(Boolean, nullable=False)
+    date_synced: Mapped[str] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+        onupdate=func.now(),
+    )
+
+    def __repr__(self):
+        """Return a string representation of the model."""
+        return f"<{self.__class__.__name__} {self.request_uuid} {self.cell_sn}>"
@@ -0,0 +1,227 @@
+"""Monthly range partitions of ``posts``.
+
+``posts`` is partitioned by ``date_created`` into one partition per calendar month
+(UTC), named ``posts_p<year>_<month>``, plus ``posts_default`` for rows outside all of
+them. ``ensure_partitions`` creates the partitions of the coming months ahead of time,
+and ``retire_partitions`` detaches old ones and optionally archives or drops them.
+Queries bounded with ``created_between`` let PostgreSQL skip the partitions outside the
+bounds.
+"""
+import re
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from sqlalchemy import Connection, ColumnElement, Engine, and_, text, true
+
+from src.db.models import POST_COUNT_UPDATE, Posts
+
+PARENT = "posts"
+DEFAULT_PARTITION = "posts_default"
+ARCHIVE_SCHEMA = "archive"
+PARTITION_PATTERN = re.compile(r"^posts_p(\d{4})_(\d{2})$")
+# Wait at most this long for the locks of partition DDL, so it never queues up behind
+# long queries and stalls writes.
+LOCK_TIMEOUT = "5s"
+
+
+@dataclass(frozen=True)
+class Partition:
+    """A monthly partition and its bounds, ``lower`` included and ``upper`` excluded."""
+
+    name: str
+    lower: datetime
+    upper: datetime
+
+
+def month_start(moment: datetime) -> datetime:
+    """Return the first instant of the UTC month of a time."""
+    moment = (
+        moment.astimezone(timezone.utc)
+        if moment.tzinfo
+        else moment.replace(tzinfo=timezone.utc)
+    )
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    """Return the month start ``months`` after another, or before if negative."""
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_for(moment: datetime) -> Partition:
+    """Return the monthly partition holding a time.
+
+    Returns
+    -------
+        Partition: The partition
+    """
+    lower = month_start(moment)
+    return Partition(
+        f"posts_p{lower.year:04d}_{lower.month:02d}", lower, add_months(lower, 1)
+    )
+
+
+def created_between(
+    since: None | datetime = None, until: None | datetime = None
+) -> ColumnElement[bool]:
+    """Bound the creation time of posts, ``since`` included and ``until`` excluded.
+
+    Filtering on the partition key directly lets the planner prune the partitions
+    outside the bounds; conditions that only imply them, like a keyset comparison on
+    ``(date_created, id)``, do not.
+
+    Returns
+    -------
+        ColumnElement[bool]: The condition
+    """
+    conditions = []
+    if since is not None:
+        conditions.append(Posts.date_created >= since)
+    if until is not None:
+        conditions.append(Posts.date_created < until)
+    return and_(true(), *conditions)
+
+
+def list_partitions(connection: Connection) -> list[Partition]:
+    """List the monthly partitions attached to ``posts``, oldest first.
+
+    Returns
+    -------
+        list[Partition]: The partitions
+    """
+    names = connection.scalars(
+        text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = :parent"
+        ),
+        {"parent": PARENT},
+    )
+    partitions = []
+    for name in names:
+        match = PARTITION_PATTERN.match(name)
+        if match:
+            partitions.append(
+                partition_for(
+                    datetime(int(match[1]), int(match[2]), 1, tzinfo=timezone.utc)
+                )
+            )
+    return sorted(partitions, key=lambda partition: partition.lower)
+
+
+def create_partition(connection: Connection, partition: Partition) -> None:
+    """Create a monthly partition, moving rows that landed in the default partition.
+
+    PostgreSQL refuses to attach a partition while the default partition holds rows in
+    its range, so those rows are moved within the caller's transaction: detach the
+    default partition, create the new one, move the rows and attach the default
+    partition back.
+    """
+    connection.execute(text(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'"))
+    bounds = {"lower": partition.lower, "upper": partition.upper}
+    create = (
+        f"CREATE TABLE {partition.name} PARTITION OF {PARENT} "
+        f"FOR VALUES FROM ('{partition.lower.isoformat()}') "
+        f"TO ('{partition.upper.isoformat()}')"
+    )
+    in_range = "date_created >= :lower AND date_created < :upper"
+    stranded = connection.scalar(
+        text(f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE {in_range})"),
+        bounds,
+    )
+    if not stranded:
+        connection.execute(text(create))
+        return
+
+    # Moving between partitions directly does not fire the post count triggers of posts,
+    # the counts stay the same.
+    columns = ", ".join(column.name for column in Posts.__table__.columns)
+    connection.execute(
+        text(f"ALTER TABLE {PARENT} DETACH PARTITION {DEFAULT_PARTITION}")
+    )
+    connection.execute(text(create))
+    connection.execute(
+        text(
+            f"INSERT INTO {partition.name} ({columns}) "
+            f"SELECT {columns} FROM {DEFAULT_PARTITION} WHERE {in_range}"
+        ),
+        bounds,
+    )
+    connection.execute(
+        text(f"DELETE FROM {DEFAULT_PARTITION} WHERE {in_range}"), bounds
+    )
+    connection.execute(
+        text(f"ALTER TABLE {PARENT} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT")
+    )
+
+
+def ensure_partitions(
+    engine: Engine, months_ahead: int = 3, now: None | datetime = None
+) -> list[str]:
+    """Create the missing partitions of the current and next ``months_ahead`` months.
+
+    Run it on a schedule, e.g. daily, so inserts never fall through to the default
+    partition.
+
+    Returns
+    -------
+        list[str]: The names of the partitions created
+    """
+    current = month_start(now or datetime.now(timezone.utc))
+    created = []
+    with engine.begin() as connection:
+        existing = {partition.name for partition in list_partitions(connection)}
+        for months in range(months_ahead + 1):
+            partition = partition_for(add_months(current, months))
+            if partition.name not in existing:
+                create_partition(connection, partition)
+                created.append(partition.name)
+    return created
+
+
+def retire_partitions(
+    engine: Engine,
+    keep_months: int,
+    archive: None | str = ARCHIVE_SCHEMA,
+    drop: bool = False,
+    now: None | datetime = None,
+) -> list[str]:
+    """Detach the partitions ending before the ``keep_months`` most recent months.
+
+    Detached partitions become standalone tables: moved to the ``archive`` schema (kept
+    in place if None), or dropped if ``drop`` is set. Their rows are no longer visible
+    through ``posts``, nor counted in the post counts of their authors and groups.
+
+    Returns
+    -------
+        list[str]: The names of the partitions retired
+    """
+    cutoff = add_months(month_start(now or datetime.now(timezone.utc)), -keep_months)
+    retired = []
+    with engine.begin() as connection:
+        connection.execute(text(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'"))
+        if archive and not drop:
+            connection.execute(text(f"CREATE SCHEMA IF NOT EXISTS {archive}"))
+        for partition in list_partitions(connection):
+            if partition.upper > cutoff:
+                continue
+            changes = f"SELECT author_id, group_id, -1 AS n FROM {partition.name}"
+            for table, key in (("users", "author_id"), ("groups", "group_id")):
+                connection.execute(
+                    text(
+                        POST_COUNT_UPDATE.format(table=table, key=key, changes=changes)
+                    )
+                )
+            connection.execute(
+                text(f"ALTER TABLE {PARENT} DETACH PARTITION {partition.name}")
+            )
+            if drop:
+                connection.execute(text(f"DROP TABLE {partition.name}"))
+            elif archive:
+                connection.execute(
+                    text(f"ALTER TABLE {partition.name} SET SCHEMA {archive}")
+                )
+            retired.append(partition.name)
+    return retired
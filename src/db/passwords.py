@@ -0,0 +1,365 @@
+"""Password hashing for ``Users.password``.
+
+Passwords are hashed with scrypt, a memory-hard KDF, and stored as
+``scrypt$<version>$<salt>$<hash>``. The version names the cost parameters in
+``PARAMETERS``: to raise the cost, add a version and point ``CURRENT_VERSION`` at it.
+Hashes of older versions keep verifying, and ``authenticate`` rehashes them with the
+current parameters on the next successful login (``AsyncRepository.authenticate`` from
+coroutines). Rows still holding a plaintext password are verified as such and hashed the
+same way, or all at once with ``hash_plaintext_passwords``
+(``python -m src.db.passwords``). ``src.db.bulk.ingest_users`` hashes the plaintext
+passwords it loads.
+
+A login for an unknown email verifies the password against a dummy hash, so it takes as
+long as a wrong password and does not tell whether the email has an account. A stored
+value that looks like a hash but is malformed, e.g. a plaintext password starting with
+``scrypt$``, fails every login rather than raising.
+
+A hash costs tens of milliseconds of CPU, so hashing and verification run on a bounded
+thread pool (scrypt releases the GIL, so the threads use as many cores) and the async
+variants never block the event loop.
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+
+from sqlalchemy import Engine, select, update
+from sqlalchemy.orm import Session
+
+from src.db.connector import get_engine
+from src.db.models import Users
+
+PREFIX = "scrypt"
+SALT_BYTES = 16
+HASH_BYTES = 32
+MIGRATION_CHUNK_SIZE = 1_000
+
+
+@dataclass(frozen=True)
+class ScryptParameters:
+    """Cost parameters of scrypt.
+
+    Attributes
+    ----------
+    n
+        CPU and memory cost, a power of 2.
+    r
+        Block size.
+    p
+        Parallelism.
+    """
+
+    n: int
+    r: int
+    p: int
+
+    @property
+    def memory(self) -> int:
+        """Bytes of memory one hash needs."""
+        return 128 * self.n * self.r * self.p
+
+
+# Never change or remove a version that stored hashes may use, add a new one instead.
+PARAMETERS = {
+    1: ScryptParameters(n=2**15, r=8, p=1),
+}
+CURRENT_VERSION = 1
+
+
+def _b64encode(data: bytes) -> str:
+    """Encode bytes as unpadded URL-safe base64."""
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def _b64decode(data: str) -> bytes:
+    """Decode unpadded URL-safe base64."""
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _scrypt(password: str, salt: bytes, parameters: ScryptParameters) -> bytes:
+    """Derive the hash of a password."""
+    return hashlib.scrypt(
+        password.encode(),
+        salt=salt,
+        n=parameters.n,
+        r=parameters.r,
+        p=parameters.p,
+        maxmem=2 * parameters.memory,
+        dklen=HASH_BYTES,
+    )
+
+
+def is_hashed(stored: str) -> bool:
+    """Return True if a stored password is a hash rather than legacy plaintext."""
+    return stored.startswith(f"{PREFIX}$")
+
+
+def hash_password(
+    password: str, version: None | int = None, salt: None | bytes = None
+) -> str:
+    """Hash a password with the parameters of a version, the current one by default.
+
+    The salt is random unless given; only give one for reproducible test data.
+
+    Returns
+    -------
+        str: The hash to store
+    """
+    version = CURRENT_VERSION if version is None else version
+    salt = secrets.token_bytes(SALT_BYTES) if salt is None else salt
+    digest = _scrypt(password, salt, PARAMETERS[version])
+    return f"{PREFIX}${version}${_b64encode(salt)}${_b64encode(digest)}"
+
+
+def verify_password(password: str, stored: str) -> bool:
+    """Check a password against a stored hash or legacy plaintext, in constant time.
+
+    Raises ``ValueError`` for a malformed hash or an unknown version.
+
+    Returns
+    -------
+        bool: True if the password matches
+    """
+    if not is_hashed(stored):
+        return hmac.compare_digest(password.encode(), stored.encode())
+    try:
+        _, version, salt, digest = stored.split("$")
+        parameters = PARAMETERS[int(version)]
+    except (KeyError, ValueError) as err:
+        msg = "Malformed password hash."
+        raise ValueError(msg) from err
+    return hmac.compare_digest(
+        _scrypt(password, _b64decode(salt), parameters), _b64decode(digest)
+    )
+
+
+def needs_rehash(stored: str) -> bool:
+    """Return True if a stored password needs hashing with the current parameters."""
+    return not stored.startswith(f"{PREFIX}${CURRENT_VERSION}$")
+
+
+def hash_plaintext(stored: str) -> str:
+    """Hash a password unless it is already hashed.
+
+    Returns
+    -------
+        str: The hash to store
+    """
+    return stored if is_hashed(stored) else hash_password(stored)
+
+
+def _verify_login(password: str, stored: str) -> bool:
+    """Check a password like ``verify_password``, a malformed hash matching nothing."""
+    try:
+        return verify_password(password, stored)
+    except ValueError:
+        return False
+
+
+class PasswordHasher:
+    """Hashes and verifies passwords on a bounded thread pool.
+
+    At most ``workers`` hashes run at once, by default one per core; further calls
+    queue. Blocking callers use ``hash``/``verify`` and coroutines
+    ``hash_async``/``verify_async``. Verification treats a malformed stored hash as a
+    wrong password.
+    """
+
+    def __init__(self, workers: None | int = None):
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="passwords"
+        )
+        self._dummy_hashes: dict[int, Future[str]] = {}
+        self._dummy_lock = threading.Lock()
+
+    def dummy_hash(self) -> Future[str]:
+        """Hash a random password once on the pool, to verify unknown emails against.
+
+        The hash uses the current parameters.
+
+        Blocking callers wait on ``result()`` and coroutines await it with
+        ``asyncio.wrap_future``.
+
+        Returns
+        -------
+            Future[str]: The hash, the same for the life of the hasher
+        """
+        with self._dummy_lock:
+            if CURRENT_VERSION not in self._dummy_hashes:
+                self._dummy_hashes[CURRENT_VERSION] = self.executor.submit(
+                    hash_password, secrets.token_urlsafe()
+                )
+            return self._dummy_hashes[CURRENT_VERSION]
+
+    def hash(self, password: str) -> str:
+        """Hash a password with the current parameters.
+
+        Returns
+        -------
+            str: The hash to store
+        """
+        return self.executor.submit(hash_password, password).result()
+
+    def verify(self, password: str, stored: str) -> bool:
+        """Check a password against a stored hash.
+
+        Returns
+        -------
+            bool: True if the password matches
+        """
+        return self.executor.submit(_verify_login, password, stored).result()
+
+    async def hash_async(self, password: str) -> str:
+        """Hash a password with the current parameters, without blocking the event loop.
+
+        Returns
+        -------
+            str: The hash to store
+        """
+        return await asyncio.wrap_future(self.executor.submit(hash_password, password))
+
+    async def verify_async(self, password: str, stored: str) -> bool:
+        """Check a password against a stored hash, without blocking the event loop.
+
+        Returns
+        -------
+            bool: True if the password matches
+        """
+        return await asyncio.wrap_future(
+            self.executor.submit(_verify_login, password, stored)
+        )
+
+    def shutdown(self) -> None:
+        """Wait for the queued work and stop the threads."""
+        self.executor.shutdown()
+
+
+_hasher: None | PasswordHasher = None
+
+
+def get_hasher() -> PasswordHasher:
+    """Return the process-wide hasher, creating it on first use.
+
+    Returns
+    -------
+        PasswordHasher: The hasher
+    """
+    global _hasher
+    if _hasher is None:
+        _hasher = PasswordHasher()
+        # Hash the dummy up front, so the first unknown email does not wait for it.
+        _hasher.dummy_hash()
+    return _hasher
+
+
+def authenticate(
+    session: Session, email: str, password: str, hasher: None | PasswordHasher = None
+) -> None | Users:
+    """Check the password of a user, upgrading its hash if needed. The caller commits.
+
+    Returns
+    -------
+        None | Users: The user, or None if no user has the email or the password is
+        wrong
+    """
+    hasher = hasher or get_hasher()
+    user = session.scalars(select(Users).where(Users.email == email)).one_or_none()
+    # Without a user, verify anyway so the login takes as long as with a wrong password.
+    stored = hasher.dummy_hash().result() if user is None else user.password
+    if not hasher.verify(password, stored) or user is None:
+        return None
+    if needs_rehash(user.password):
+        user.password = hasher.hash(password)
+    return user
+
+
+@dataclass
+class MigrationReport:
+    """Outcome of hashing plaintext passwords.
+
+    Attributes
+    ----------
+    rows
+        Plaintext passwords found.
+    hashed
+        Passwords hashed and written; fewer than ``rows`` if some changed meanwhile.
+    seconds
+        Wall time of the migration.
+    """
+
+    rows: int = 0
+    hashed: int = 0
+    seconds: float = 0.0
+
+
+def hash_plaintext_passwords(
+    engine: Engine,
+    chunk_size: int = MIGRATION_CHUNK_SIZE,
+    hasher: None | PasswordHasher = None,
+) -> MigrationReport:
+    """Hash the plaintext passwords left, ``chunk_size`` users per transaction.
+
+    Users are read in id order and hashed in parallel on the pool. A password changed
+    since it was read is left alone, so the migration can run while users log in, and
+    rerun after an interruption.
+
+    Returns
+    -------
+        MigrationReport: The passwords found and hashed
+    """
+    hasher = hasher or get_hasher()
+    report = MigrationReport()
+    start = time.perf_counter()
+    last_id = 0
+    plaintext = Users.password.not_like(f"{PREFIX}$%")
+    while True:
+        with engine.begin() as connection:
+            rows = connection.execute(
+                select(Users.id, Users.password)
+                .where(Users.id > last_id, plaintext)
+                .order_by(Users.id)
+                .limit(chunk_size)
+            ).all()
+            if not rows:
+                break
+            hashes = hasher.executor.map(
+                hash_password, [password for _, password in rows]
+            )
+            for (user_id, password), hashed in zip(rows, hashes):
+                report.hashed += connection.execute(
+                    update(Users)
+                    .where(Users.id == user_id, Users.password == password)
+                    .values(password=hashed)
+                ).rowcount
+            report.rows += len(rows)
+            last_id = rows[-1].id
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def main(chunk_size: int = MIGRATION_CHUNK_SIZE) -> None:
+    """Hash the plaintext passwords of the database and print the outcome.
+
+    Parameters
+    ----------
+    chunk_size
+        The users hashed per transaction.
+    """
+    report = hash_plaintext_passwords(get_engine(), chunk_size)
+    print(
+        f"{report.hashed} of {report.rows} plaintext passwords hashed "
+        f"in {report.seconds:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else MIGRATION_CHUNK_SIZE)
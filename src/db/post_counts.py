@@ -0,0 +1,165 @@
+"""Post counts of users and groups.
+
+``users.post_count`` and ``groups.post_count`` are kept up to date by statement triggers
+on ``posts`` (see ``src.db.models``), so dashboards read a column instead of counting
+posts for every user or group. The triggers only exist on PostgreSQL.
+
+``reconcile_post_counts`` recounts the posts in batches and fixes the counts that
+drifted, e.g. after posts were restored or changed with the triggers disabled. Run it
+with ``python -m src.db.post_counts [batch size]`` against the database of
+``DATABASE_URL``.
+"""
+import sys
+import time
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+from sqlalchemy import Engine, func, select, update
+from sqlalchemy.orm import Session
+
+from src.db.connector import get_engine
+from src.db.models import Groups, Posts, Users
+
+RECONCILE_BATCH_SIZE = 1_000
+
+
+@dataclass
+class ReconcileReport:
+    """Outcome of reconciling the post counts of a table.
+
+    Attributes
+    ----------
+    table
+        The table reconciled.
+    rows
+        Rows checked.
+    fixed
+        Rows whose count was wrong.
+    seconds
+        Wall time of the reconciliation.
+    """
+
+    table: str
+    rows: int = 0
+    fixed: int = 0
+    seconds: float = 0.0
+
+
+def _reconcile_batch(
+    engine: Engine, model: type, key, lower: int, upper: int
+) -> tuple[int, int]:
+    """Recount the posts of the rows with ids in ``(lower, upper]`` in one transaction.
+
+    The rows are locked before counting, so a post committed meanwhile is either counted
+    or updates the count after the batch, never lost.
+
+    Returns
+    -------
+        tuple[int, int]: The rows checked and fixed
+    """
+    in_batch = (model.id > lower, model.id <= upper)
+    with engine.begin() as connection:
+        rows = len(
+            connection.scalars(
+                select(model.id).where(*in_batch).order_by(model.id).with_for_update()
+            ).all()
+        )
+        counted = (
+            select(model.id, func.count(Posts.id).label("n"))
+            .outerjoin(Posts, key == model.id)
+            .where(*in_batch)
+            .group_by(model.id)
+            .subquery()
+        )
+        fixed = connection.execute(
+            update(model)
+            .where(model.id == counted.c.id, model.post_count != counted.c.n)
+            .values(post_count=counted.c.n)
+        ).rowcount
+    return rows, fixed
+
+
+def reconcile(
+    engine: Engine, model: type, batch_size: int = RECONCILE_BATCH_SIZE
+) -> ReconcileReport:
+    """Recount the posts of every user or group, committing every ``batch_size`` ids.
+
+    Returns
+    -------
+        ReconcileReport: The rows checked and fixed
+    """
+    key = Posts.author_id if model is Users else Posts.group_id
+    report = ReconcileReport(model.__tablename__)
+    start = time.perf_counter()
+    with engine.connect() as connection:
+        lowest, highest = connection.execute(
+            select(func.min(model.id), func.max(model.id))
+        ).one()
+    if highest is not None:
+        for lower in range(lowest - 1, highest, batch_size):
+            rows, fixed = _reconcile_batch(
+                engine, model, key, lower, lower + batch_size
+            )
+            report.rows += rows
+            report.fixed += fixed
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def reconcile_post_counts(
+    engine: Engine, batch_size: int = RECONCILE_BATCH_SIZE
+) -> list[ReconcileReport]:
+    """Recount the posts of every user and every group.
+
+    Returns
+    -------
+        list[ReconcileReport]: The reports of users and groups
+    """
+    return [reconcile(engine, Users, batch_size), reconcile(engine, Groups, batch_size)]
+
+
+def _post_counts(session: Session, model: type, ids: Iterable[int]) -> dict[int, int]:
+    """Read the post counts of users or groups by id."""
+    rows = session.execute(
+        select(model.id, model.post_count).where(model.id.in_(list(ids)))
+    )
+    return dict(rows.tuples().all())
+
+
+def user_post_counts(session: Session, user_ids: Iterable[int]) -> dict[int, int]:
+    """Get the number of posts of users, without reading posts.
+
+    Returns
+    -------
+        dict[int, int]: The counts by user id, without the ids of missing users
+    """
+    return _post_counts(session, Users, user_ids)
+
+
+def group_post_counts(session: Session, group_ids: Iterable[int]) -> dict[int, int]:
+    """Get the number of posts in groups, without reading posts.
+
+    Returns
+    -------
+        dict[int, int]: The counts by group id, without the ids of missing groups
+    """
+    return _post_counts(session, Groups, group_ids)
+
+
+def main(batch_size: int = RECONCILE_BATCH_SIZE) -> None:
+    """Reconcile the post counts of the database and print what was fixed.
+
+    Parameters
+    ----------
+    batch_size
+        The ids recounted per transaction.
+    """
+    for report in reconcile_post_counts(get_engine(), batch_size):
+        print(
+            f"{report.table}: {report.fixed} of {report.rows} counts fixed "
+            f"in {report.seconds:.1f}s"
+        )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else RECONCILE_BATCH_SIZE)
@@ -0,0 +1,214 @@
+"""Queries over the models with named loading profiles.
+
+A profile names the relationships a caller is about to use, so they are loaded up front
+instead of one lazy query per object: collections with ``selectinload`` (one extra query
+per collection) and many-to-one relationships with ``joinedload`` (no extra query). In
+strict mode every relationship left out of the profile raises on access, so a missing
+profile entry fails a test instead of becoming an N+1 query in production.
+"""
+from collections.abc import Sequence
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import Select, select
+from sqlalchemy.orm import (
+    InstrumentedAttribute,
+    Session,
+    joinedload,
+    raiseload,
+    selectinload,
+)
+from sqlalchemy.orm.interfaces import ORMOption
+
+from src.db.models import Groups, Posts, Users
+from src.db.partitions import created_between
+
+
+@dataclass(frozen=True)
+class LoadingProfile:
+    """Relationships to load with a model.
+
+    Attributes
+    ----------
+    model
+        The model queried.
+    paths
+        Chains of relationships from the model, e.g. ``(Users.posts, Posts.group)``.
+    """
+
+    model: type
+    paths: tuple[tuple[InstrumentedAttribute, ...], ...] = ()
+
+    def options(self, strict: bool = False) -> list[ORMOption]:
+        """Build the loader options of the profile.
+
+        Returns
+        -------
+            list[ORMOption]: The options, raising on any other relationship if strict
+        """
+        options = []
+        for path in self.paths:
+            option = None
+            for attribute in path:
+                strategy = selectinload if attribute.property.uselist else joinedload
+                option = (
+                    strategy(attribute)
+                    if option is None
+                    else getattr(option, strategy.__name__)(attribute)
+                )
+            if strict:
+                option = option.raiseload("*")
+            options.append(option)
+        if strict:
+            options.append(raiseload("*"))
+        return options
+
+
+PROFILES = {
+    "post": LoadingProfile(Posts),
+    "post_list": LoadingProfile(Posts, ((Posts.author,), (Posts.group,))),
+    "user": LoadingProfile(Users),
+    "user_posts": LoadingProfile(Users, ((Users.posts, Posts.group),)),
+    "group": LoadingProfile(Groups),
+    "group_posts": LoadingProfile(Groups, ((Groups.posts, Posts.author),)),
+}
+
+
+def select_profile(model: type, profile: str, strict: bool = False) -> Select:
+    """Start a query of a model with the options of a profile.
+
+    Returns
+    -------
+        Select: The query
+    """
+    loading = PROFILES[profile]
+    if loading.model is not model:
+        msg = f"Profile {profile} loads {loading.model.__name__}, not {model.__name__}."
+        raise ValueError(msg)
+    return select(model).options(*loading.options(strict))
+
+
+class Repository:
+    """Queries over users, groups and posts, loading relationships by named profile.
+
+    Profiles are looked up in ``PROFILES``. With ``strict=True`` an access to a
+    relationship that the profile did not load raises
+    ``sqlalchemy.exc.InvalidRequestError``.
+    """
+
+    def __init__(self, session: Session, strict: bool = False):
+        self.session = session
+        self.strict = strict
+
+    def select(self, model: type, profile: str) -> Select:
+        """Start a query of a model with the options of a profile.
+
+        Returns
+        -------
+            Select: The query
+        """
+        return select_profile(model, profile, self.strict)
+
+    def posts(
+        self,
+        profile: str = "post_list",
+        author_id: None | int = None,
+        group_id: None | int = None,
+        limit: None | int = None,
+        since: None | datetime = None,
+        until: None | datetime = None,
+    ) -> Sequence[Posts]:
+        """Get posts, newest first, optionally of one author or group.
+
+        ``since`` and ``until`` bound the creation time, so only the partitions of those
+        months are read.
+
+        Returns
+        -------
+            Sequence[Posts]: The posts
+        """
+        query = (
+            self.select(Posts, profile)
+            .where(created_between(since, until))
+            .order_by(Posts.date_created.desc(), Posts.id.desc())
+            .limit(limit)
+        )
+        if author_id is not None:
+            query = query.where(Posts.author_id == author_id)
+        if group_id is not None:
+            query = query.where(Posts.group_id == group_id)
+        return self.session.scalars(query).unique().all()
+
+    def post(
+        self,
+        post_id: int,
+        profile: str = "post_list",
+        date_created: None | datetime = None,
+    ) -> None | Posts:
+        """Get a post by id.
+
+        The id alone is unique but not the partition key, so the lookup probes the index
+        of every partition of ``posts``. Pass the creation time of the post, e.g. from a
+        feed cursor, to read only its partition.
+
+        Returns
+        -------
+            None | Posts: The post, or None if not found
+        """
+        statement = self.select(Posts, profile).where(Posts.id == post_id)
+        if date_created is not None:
+            statement = statement.where(Posts.date_created == date_created)
+        return self.session.scalars(statement).unique().one_or_none()
+
+    def user(self, user_id: int, profile: str = "user") -> None | Users:
+        """Get a user by id.
+
+        Returns
+        -------
+            None | Users: The user, or None if not found
+        """
+        return (
+            self.session.scalars(self.select(Users, profile).where(Users.id == user_id))
+            .unique()
+            .one_or_none()
+        )
+
+    def user_by_email(self, email: str, profile: str = "user") -> None | Users:
+        """Get a user by email.
+
+        Returns
+        -------
+            None | Users: The user, or None if not found
+        """
+        return (
+            self.session.scalars(
+                self.select(Users, profile).where(Users.email == email)
+            )
+            .unique()
+            .one_or_none()
+        )
+
+    def group(self, group_id: int, profile: str = "group") -> None | Groups:
+        """Get a group by id.
+
+        Returns
+        -------
+            None | Groups: The group, or None if not found
+        """
+        return (
+            self.session.scalars(
+                self.select(Groups, profile).where(Groups.id == group_id)
+            )
+            .unique()
+            .one_or_none()
+        )
+
+    def group_by_domain(self, domain: str, profile: str = "group") -> None | Groups:
+        """Get a group by domain.
+
+        Returns
+        -------
+            None | Groups: The group, or None if not found
+        """
+        query = self.select(Groups, profile).where(Groups.domain == domain)
+        return self.session.scalars(query).unique().one_or_none()
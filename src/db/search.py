@@ -0,0 +1,116 @@
+"""Full-text search of posts.
+
+Posts are matched against the generated ``posts.search_vector`` column through its GIN
+index, instead of scanning every row with ``ILIKE``, and ranked with ``ts_rank_cd``,
+weighting the title above the caption and the caption above the content. Queries use the
+web search syntax: words, ``"quoted phrases"``, ``or`` and ``-excluded`` words.
+
+Pages are read with keyset pagination on (rank, id), handed out as opaque cursors like
+the feeds. Search needs PostgreSQL.
+"""
+from collections.abc import Sequence
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import REAL, cast, func, literal_column, tuple_
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import Session
+
+from src.db.feeds import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    decode_position,
+    encode_position,
+)
+from src.db.models import Posts
+from src.db.partitions import created_between
+from src.db.repository import Repository
+
+SEARCH_CONFIG = "english"
+search_vector = literal_column("posts.search_vector", TSVECTOR)
+
+
+@dataclass
+class SearchHit:
+    """A post matching a search, and its relevance."""
+
+    post: Posts
+    rank: float
+
+
+@dataclass
+class SearchPage:
+    """A page of search results.
+
+    Attributes
+    ----------
+    hits
+        The matching posts, most relevant first.
+    next_cursor
+        The cursor of the next page, or None if this is the last page.
+    """
+
+    hits: Sequence[SearchHit]
+    next_cursor: None | str
+
+
+def search_posts(
+    session: Session,
+    query: str,
+    group_id: None | int = None,
+    author_id: None | int = None,
+    cursor: None | str = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    profile: str = "post_list",
+    strict: bool = False,
+    since: None | datetime = None,
+    until: None | datetime = None,
+) -> SearchPage:
+    """Search posts, optionally in one group or by one author.
+
+    ``since`` and ``until`` bound the creation time, so only the partitions of those
+    months are searched. Raises ``ValueError`` for an invalid cursor or page size.
+
+    Returns
+    -------
+        SearchPage: The matching posts, most relevant first, and the cursor of the next
+        page
+    """
+    if not 0 < limit <= MAX_PAGE_SIZE:
+        msg = f"The page size must be between 1 and {MAX_PAGE_SIZE}."
+        raise ValueError(msg)
+
+    tsquery = func.websearch_to_tsquery(SEARCH_CONFIG, query)
+    rank = func.ts_rank_cd(search_vector, tsquery).label("rank")
+    statement = (
+        Repository(session, strict)
+        .select(Posts, profile)
+        .add_columns(rank)
+        .where(search_vector.bool_op("@@")(tsquery), created_between(since, until))
+        .order_by(rank.desc(), Posts.id.desc())
+    )
+    if group_id is not None:
+        statement = statement.where(Posts.group_id == group_id)
+    if author_id is not None:
+        statement = statement.where(Posts.author_id == author_id)
+    if cursor is not None:
+        try:
+            seen_rank, seen_id = decode_position(cursor)
+            seen = (float(seen_rank), int(seen_id))
+        except (TypeError, ValueError) as err:
+            msg = f"Invalid cursor {cursor}."
+            raise ValueError(msg) from err
+        # ts_rank_cd returns a real; the cursor holds its shortest decimal form, which
+        # only compares equal to the rank once cast back to a real rather than compared
+        # as a double.
+        statement = statement.where(
+            tuple_(rank, Posts.id) < tuple_(cast(seen[0], REAL), seen[1])
+        )
+
+    # One extra row tells whether there is a next page without counting.
+    rows = session.execute(statement.limit(limit + 1)).unique().all()
+    hits = [SearchHit(post, rank) for post, rank in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = encode_position([hits[-1].rank, hits[-1].post.id])
+    return SearchPage(hits, next_cursor)
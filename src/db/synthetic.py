@@ -0,0 +1,264 @@
+"""Deterministic synthetic users, groups and posts, for benchmarks and load tests.
+
+A ``DatasetSpec`` fixes the size of a dataset and its seed, so the same spec always
+produces the same rows. Posts are skewed like production: authors and groups are drawn
+from Zipf-like distributions, so a few prolific authors and hot groups own most of the
+posts, and words are drawn from a Zipf-like vocabulary for search.
+
+Loading a large dataset takes minutes, so ``ensure_template`` loads each spec once into
+a PostgreSQL template database and ``clone_database`` copies it into a fresh database in
+about the time it takes to copy the files.
+"""
+import hashlib
+import random
+from collections.abc import Iterator
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate
+
+from sqlalchemy import Engine, create_engine, text
+from sqlalchemy.engine.url import URL
+from sqlalchemy.pool import NullPool
+from sqlalchemy.schema import CreateTable
+
+from src.db.bulk import IngestReport, ingest_groups, ingest_posts, ingest_users
+from src.db.connector import Base
+from src.db.partitions import ensure_partitions
+from src.db.passwords import hash_password
+
+
+@dataclass(frozen=True)
+class DatasetSpec:
+    """Size, skew and seed of a synthetic dataset.
+
+    Attributes
+    ----------
+    users
+        Number of users.
+    groups
+        Number of groups.
+    posts
+        Number of posts.
+    seed
+        Seed of the random generator; the same spec always generates the same rows.
+    author_skew
+        Zipf exponent of posts per author. 0 spreads posts evenly, 1 or more
+        concentrates them on a few authors.
+    group_skew
+        Zipf exponent of posts per group.
+    vocabulary
+        Number of distinct words in posts.
+    words_per_post
+        Words in the content of a post.
+    start
+        Creation time of the oldest posts.
+    days
+        Days over which posts are created.
+    """
+
+    users: int = 1_000
+    groups: int = 100
+    posts: int = 50_000
+    seed: int = 0
+    author_skew: float = 1.0
+    group_skew: float = 1.2
+    vocabulary: int = 5_000
+    words_per_post: int = 30
+    start: datetime = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    days: int = 180
+
+
+SCALES = {
+    "small": DatasetSpec(users=100, groups=10, posts=2_000),
+    "medium": DatasetSpec(),
+    "large": DatasetSpec(users=100_000, groups=5_000, posts=5_000_000),
+}
+
+
+def email(user: int) -> str:
+    """Return the email of the user of rank ``user``, 0 being the most prolific."""
+    return f"user{user}@example.com"
+
+
+def domain(group: int) -> str:
+    """Return the domain of the group of rank ``group``, 0 being the hottest."""
+    return f"group{group}.example.com"
+
+
+def word(rank: int) -> str:
+    """Return the word of a vocabulary rank, counting from 0 for the most frequent."""
+    return f"w{rank:05d}x"
+
+
+def zipf_weights(size: int, skew: float) -> list[float]:
+    """Return the cumulative Zipf-like weights of ranks 0 to ``size - 1``.
+
+    They are the ``cum_weights`` of ``random.choices``.
+    """
+    return list(accumulate(1 / rank**skew for rank in range(1, size + 1)))
+
+
+def generate_users(spec: DatasetSpec) -> Iterator[dict]:
+    """Generate the users of a dataset, as rows for ``ingest_users``.
+
+    Users share the password ``password``, hashed once with a fixed salt so the rows
+    stay the same for a spec and loading them does not hash every password.
+    """
+    password = hash_password(
+        "password", salt=hashlib.sha256(str(spec).encode()).digest()[:16]
+    )
+    for user in range(spec.users):
+        yield {
+            "name": f"User {user}",
+            "email": email(user),
+            "password": password,
+            "date_created": spec.start,
+        }
+
+
+def generate_groups(spec: DatasetSpec) -> Iterator[dict]:
+    """Generate the groups of a dataset, as rows for ``ingest_groups``."""
+    for group in range(spec.groups):
+        yield {
+            "name": f"Group {group}",
+            "domain": domain(group),
+            "date_created": spec.start,
+        }
+
+
+def generate_posts(spec: DatasetSpec) -> Iterator[dict]:
+    """Generate the posts of a dataset, as rows for ``ingest_posts``, oldest first."""
+    rng = random.Random(spec.seed)
+    authors = zipf_weights(spec.users, spec.author_skew)
+    groups = zipf_weights(spec.groups, spec.group_skew)
+    words = zipf_weights(spec.vocabulary, 1.0)
+    step = timedelta(days=spec.days) / max(spec.posts, 1)
+    for post in range(spec.posts):
+        ranks = rng.choices(
+            range(spec.vocabulary), cum_weights=words, k=spec.words_per_post
+        )
+        yield {
+            "title": " ".join(word(rank) for rank in ranks[:5]),
+            "content": " ".join(word(rank) for rank in ranks[5:]),
+            "caption": None,
+            "author_email": email(
+                rng.choices(range(spec.users), cum_weights=authors)[0]
+            ),
+            "group_domain": domain(
+                rng.choices(range(spec.groups), cum_weights=groups)[0]
+            ),
+            "date_created": spec.start + post * step,
+        }
+
+
+def load_dataset(engine: Engine, spec: DatasetSpec) -> list[IngestReport]:
+    """Load a dataset into empty tables.
+
+    On PostgreSQL, the monthly partitions of its posts are created too.
+
+    Returns
+    -------
+        list[IngestReport]: The reports of users, groups and posts
+    """
+    if engine.dialect.name == "postgresql":
+        ensure_partitions(engine, months_ahead=spec.days // 28 + 1, now=spec.start)
+    return [
+        ingest_users(engine, generate_users(spec)),
+        ingest_groups(engine, generate_groups(spec)),
+        ingest_posts(engine, generate_posts(spec)),
+    ]
+
+
+def template_name(url: URL, spec: DatasetSpec) -> str:
+    """Name the template database of a spec and of the current schema.
+
+    A schema change therefore builds a new template.
+
+    Returns
+    -------
+        str: The database name
+    """
+    dialect = url.get_dialect()()
+    schema = "".join(
+        str(CreateTable(table).compile(dialect=dialect))
+        for table in Base.metadata.sorted_tables
+    )
+    digest = hashlib.sha1(f"{spec}{schema}".encode()).hexdigest()[:12]
+    return f"{url.database[:40]}_template_{digest}"
+
+
+def _admin_engine(url: URL) -> Engine:
+    """Create an engine for CREATE and DROP DATABASE on the server of a URL.
+
+    It connects to the ``postgres`` database, since a database cannot be copied or
+    dropped while connected to, and in autocommit mode, since those statements cannot
+    run in a transaction.
+    """
+    return create_engine(
+        url.set(database="postgres"), isolation_level="AUTOCOMMIT", poolclass=NullPool
+    )
+
+
+def ensure_template(url: URL, spec: DatasetSpec) -> URL:
+    """Return the URL of the template database of a spec, loading it if needed.
+
+    Databases are created next to the database of ``url``. A template is only marked as
+    such once fully loaded, so a load interrupted halfway is dropped and redone by the
+    next call.
+
+    Returns
+    -------
+        URL: The URL of the template database
+    """
+    name = template_name(url, spec)
+    admin = _admin_engine(url)
+    quoted = admin.dialect.identifier_preparer.quote(name)
+    with admin.connect() as connection:
+        ready = connection.scalar(
+            text("SELECT datistemplate FROM pg_database WHERE datname = :name"),
+            {"name": name},
+        )
+        if ready:
+            return url.set(database=name)
+        connection.execute(text(f"DROP DATABASE IF EXISTS {quoted} WITH (FORCE)"))
+        connection.execute(text(f"CREATE DATABASE {quoted}"))
+
+    template = create_engine(url.set(database=name), poolclass=NullPool)
+    Base.metadata.create_all(template)
+    load_dataset(template, spec)
+    with template.connect().execution_options(
+        isolation_level="AUTOCOMMIT"
+    ) as connection:
+        connection.execute(text("VACUUM ANALYZE"))
+    template.dispose()
+    with admin.connect() as connection:
+        connection.execute(text(f"ALTER DATABASE {quoted} WITH IS_TEMPLATE true"))
+    return url.set(database=name)
+
+
+def clone_database(template: URL, name: str) -> URL:
+    """Replace the database ``name`` by a copy of a template database.
+
+    Returns
+    -------
+        URL: The URL of the copy
+    """
+    admin = _admin_engine(template)
+    quoted = admin.dialect.identifier_preparer.quote(name)
+    with admin.connect() as connection:
+        connection.execute(text(f"DROP DATABASE IF EXISTS {quoted} WITH (FORCE)"))
+        connection.execute(
+            text(
+                f"CREATE DATABASE {quoted} "
+                f"TEMPLATE {admin.dialect.identifier_preparer.quote(template.database)}"
+            )
+        )
+    return template.set(database=name)
+
+
+def drop_database(url: URL) -> None:
+    """Drop a database, disconnecting its sessions."""
+    admin = _admin_engine(url)
+    quoted = admin.dialect.identifier_preparer.quote(url.database)
+    with admin.connect() as connection:
+        connection.execute(text(f"DROP DATABASE IF EXISTS {quoted} WITH (FORCE)"))
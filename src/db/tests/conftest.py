@@ -0,0 +1,72 @@
+"Database fixtures shared by the tests."
+from collections.abc import Generator
+from sqlalchemy import Engine, create_engine
+from sqlalchemy.orm import Session
+import pytest
+
+from src.db.connector import Base, database_url, get_engine
+from src.db.synthetic import SCALES, clone_database, drop_database, ensure_template
+
+
+@pytest.fixture(scope="module")
+def test_engine() -> Engine:
+    """Create connection engine to the database for testing.
+
+    This is only used for testing.
+
+    Returns
+    -------
+        Engine: Connection to database
+    """
+    return get_engine()
+
+
+@pytest.fixture(scope="module")
+def init_db(test_engine: Engine) -> Generator[None, None, None]:
+    """Create connection engine to the database for testing.
+
+    This is only used for testing.
+
+    Returns
+    -------
+        Generator: yield database
+    """
+    Base.metadata.drop_all(test_engine)
+    Base.metadata.create_all(test_engine)
+    yield None
+
+
+@pytest.fixture(scope="module")
+def dataset_engine() -> Generator[Engine, None, None]:
+    """Create a connection engine to a copy of the small synthetic dataset.
+
+    The dataset is loaded once into a template database, reused by later runs until the
+    schema changes, and copied into a fresh database for each module.
+
+    Returns
+    -------
+        Generator: yield connection to the copy
+    """
+    template = ensure_template(database_url(), SCALES["small"])
+    url = clone_database(template, f"{database_url().database}_dataset")
+    engine = create_engine(url)
+    yield engine
+    engine.dispose()
+    drop_database(url)
+
+
+@pytest.fixture()
+def rollback_session(dataset_engine: Engine) -> Generator[Session, None, None]:
+    """Create a session whose changes, even committed ones, are rolled back afterwards.
+
+    Returns
+    -------
+        Generator: yield session
+    """
+    with dataset_engine.connect() as connection:
+        transaction = connection.begin()
+        with Session(
+            bind=connection, join_transaction_mode="create_savepoint"
+        ) as session:
+            yield session
+        transaction.rollback()
@@ -0,0 +1,54 @@
+"Test the async engine and repository."
+import asyncio
+
+import pytest
+
+pytest.importorskip("greenlet")
+
+from src.db.async_connector import (
+    dispose_async_engines,
+    get_async_session,
+)  # noqa: E402
+from src.db.async_repository import AsyncRepository  # noqa: E402
+
+
+def test_async_repository(init_db: None):
+    """Test inserts and eager lookups through async sessions."""
+
+    async def run() -> None:
+        async with get_async_session() as session:
+            repository = AsyncRepository(session)
+            user = await repository.add_user("John Doe", "john@you.com", "password")
+            group = await repository.add_group("Group1", "you.com")
+            for i in range(3):
+                await repository.add_post(
+                    f"Post{i}", user, group, content=f"Content{i}"
+                )
+            await session.commit()
+
+        async def lookup(query):
+            async with get_async_session(readonly=True) as session:
+                return await query(AsyncRepository(session))
+
+        # Relationships are loaded eagerly, so they stay usable after their sessions
+        # close.
+        user, group = await asyncio.gather(
+            lookup(lambda repository: repository.user_by_email("john@you.com")),
+            lookup(lambda repository: repository.group_by_domain("you.com")),
+        )
+        assert sorted(post.title for post in user.posts) == ["Post0", "Post1", "Post2"]
+        assert {post.author.email for post in group.posts} == {"john@you.com"}
+
+        async with get_async_session(readonly=True) as session:
+            repository = AsyncRepository(session)
+            posts = await repository.posts(group_id=group.id, limit=2)
+            assert [post.title for post in posts] == ["Post2", "Post1"]
+            assert posts[0].group.domain == "you.com"
+            assert await repository.user_by_email("nobody@you.com") is None
+            assert await repository.authenticate("john@you.com", "wrong") is None
+            assert (
+                await repository.authenticate("john@you.com", "password")
+            ).id == user.id
+        await dispose_async_engines()
+
+    asyncio.run(run())
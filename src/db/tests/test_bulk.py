@@ -0,0 +1,132 @@
+"Test bulk loading."
+from sqlalchemy import Engine, select
+from sqlalchemy.orm import Session
+
+from src.db.bulk import ingest_groups, ingest_posts, ingest_users
+from src.db.models import Groups, Posts, Users
+from src.db.passwords import hash_password, verify_password
+
+
+def test_bulk_ingest(init_db: None, test_engine: Engine):
+    """Test users and groups are upserted and posts resolve their foreign keys.
+
+    The INSERT fallback is used instead of COPY.
+    """
+    engine = test_engine
+
+    users = (
+        {"name": f"User {i}", "email": f"user{i}@you.com", "password": "password"}
+        for i in range(25)
+    )
+    report = ingest_users(engine, users, chunk_size=10, use_copy=False)
+    assert (report.table, report.rows, report.written) == ("users", 25, 25)
+    assert report.rows_per_second > 0
+
+    renamed = [{"name": "Renamed", "email": "user0@you.com", "password": "secret"}]
+    assert ingest_users(engine, renamed, use_copy=False).written == 1
+    # Hashes are loaded as they are.
+    hashed = [
+        {
+            "name": "User 1",
+            "email": "user1@you.com",
+            "password": hash_password("secret"),
+        }
+    ]
+    assert ingest_users(engine, hashed, use_copy=False).written == 1
+    assert ingest_users(engine, renamed, upsert=False, use_copy=False).skipped == 1
+
+    groups = [
+        {"name": "Group1", "domain": "group1.com"},
+        {"name": "Group2", "domain": "group2.com"},
+    ]
+    assert ingest_groups(engine, groups, use_copy=False).written == 2
+
+    posts = (
+        {
+            "title": f"Post {i}",
+            "content": "",
+            "author_email": f"user{i}@you.com",
+            "group_domain": "group1.com",
+        }
+        for i in range(30)
+    )
+    report = ingest_posts(engine, posts, chunk_size=7, use_copy=False)
+    assert (report.rows, report.written, report.skipped) == (30, 25, 5)
+
+    with Session(engine) as session:
+        user = session.scalars(
+            select(Users).where(Users.email == "user0@you.com")
+        ).one()
+        assert user.name == "Renamed"
+        assert verify_password("secret", user.password)
+        stored = session.scalars(
+            select(Users.password).where(Users.email == "user1@you.com")
+        ).one()
+        assert stored == hashed[0]["password"]
+        post = session.scalars(select(Posts).where(Posts.title == "Post 3")).one()
+        assert post.author.email == "user3@you.com"
+        assert post.group.domain == "group1.com"
+        assert post.content == ""
+
+
+def test_bulk_ingest_copy(init_db: None, test_engine: Engine):
+    """Test the COPY path on PostgreSQL, including duplicate keys in one chunk."""
+    users = [
+        {"name": "John Doe", "email": "john@you.com", "password": "password"},
+        {"name": "Jane Doe", "email": "jane@you.com", "password": "password"},
+        {"name": "John Doe", "email": "john@you.com", "password": "password"},
+    ]
+    assert ingest_users(test_engine, users).written == 2
+    groups = [
+        {"name": "Group1", "domain": "you.com"},
+        {"name": "Group2", "domain": "me.com"},
+    ]
+    assert ingest_groups(test_engine, groups).written == 2
+
+    posts = [
+        {
+            "title": "Post1",
+            "content": "",
+            "caption": None,
+            "author_email": "john@you.com",
+            "group_domain": "you.com",
+        },
+        {
+            "title": "Post3",
+            "content": "a\\b\tc\nd",
+            "author_email": "jane@you.com",
+            "group_domain": "me.com",
+        },
+        {
+            "title": "Post2",
+            "content": "Content2",
+            "author_email": "nobody@you.com",
+            "group_domain": "you.com",
+        },
+    ]
+    report = ingest_posts(test_engine, posts)
+    assert (report.written, report.skipped) == (2, 1)
+
+    with Session(test_engine) as session:
+        post = session.scalars(select(Posts).where(Posts.title == "Post1")).one()
+        assert (post.content, post.caption) == ("", None)
+        assert post.author.email == "john@you.com"
+        assert (
+            session.scalars(select(Posts.content).where(Posts.title == "Post3")).one()
+            == "a\\b\tc\nd"
+        )
+        # Ids follow the input order, with the last row of a repeated key.
+        emails = ["jane@you.com", "john@you.com"]
+        assert session.scalars(
+            select(Users.email).where(Users.email.in_(emails)).order_by(Users.id)
+        ).all() == [
+            "john@you.com",
+            "jane@you.com",
+        ]
+        domains = ["me.com", "you.com"]
+        assert session.scalars(
+            select(Groups.domain).where(Groups.domain.in_(domains)).order_by(Groups.id)
+        ).all() == [
+            "you.com",
+            "me.com",
+        ]
@@ -0,0 +1,70 @@
+"Test the engine registry and pool settings."
+import os
+import signal
+import time
+
+import pytest
+from sqlalchemy import text
+
+from src.db import connector
+from src.db.connector import PoolSettings
+
+
+def test_pool_settings_from_env(monkeypatch: pytest.MonkeyPatch):
+    """Test the pool settings are read from the environment."""
+    monkeypatch.setenv("DB_POOL_SIZE", "2")
+    monkeypatch.setenv("DB_POOL_PRE_PING", "false")
+    monkeypatch.setenv("DB_STATEMENT_TIMEOUT_MS", "5000")
+    settings = PoolSettings.from_env()
+    assert settings.pool_size == 2
+    assert settings.max_overflow == PoolSettings.max_overflow
+    assert not settings.pool_pre_ping
+    assert settings.statement_timeout_ms == 5000
+
+
+def test_engine_registry(monkeypatch: pytest.MonkeyPatch, tmp_path):
+    """Test engines are shared and the replica falls back to the primary.
+
+    Checkouts are timed too.
+    """
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'primary.db'}")
+    monkeypatch.delenv("DATABASE_REPLICA_URL", raising=False)
+    connector.dispose_engines()
+    try:
+        engine = connector.get_engine()
+        assert connector.get_engine() is engine
+        assert connector.get_engine(connector.REPLICA) is engine
+
+        with connector.get_session(readonly=True) as session:
+            assert session.execute(text("select 1")).scalar() == 1
+        engine.dispose()
+        with connector.get_session() as session:
+            session.execute(text("select 1"))
+        # The replica falls back to the primary engine, whose pool is reported once.
+        assert list(connector.pool_metrics()) == [connector.PRIMARY]
+        assert connector.pool_metrics()[connector.PRIMARY]["checkouts"] == 2
+    finally:
+        connector.dispose_engines()
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+def test_fork_while_registry_locked(monkeypatch: pytest.MonkeyPatch, tmp_path):
+    """Test a child forked while the registry lock is held can still create engines."""
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'primary.db'}")
+    connector.dispose_engines()
+    with connector._registry_lock:
+        pid = os.fork()
+        if pid == 0:
+            connector.get_engine()
+            os._exit(0)
+    deadline = time.monotonic() + 10
+    while (status := os.waitpid(pid, os.WNOHANG)) == (
+        0,
+        0,
+    ) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    if status == (0, 0):
+        os.kill(pid, signal.SIGKILL)
+        os.waitpid(pid, 0)
+    connector.dispose_engines()
+    assert status[0] == pid and os.waitstatus_to_exitcode(status[1]) == 0
@@ -1,9 +1,6 @@
 "Test models."
-from collections.abc import Generator
-from sqlalchemy import Engine, create_engine
-from sqlalchemy.engine.url import URL
+from sqlalchemy import Engine
 from sqlalchemy.orm import sessionmaker
-import pytest
 
 from src.db.models import (
     Users,
@@ -11,43 +8,6 @@ from src.db.models import (
     Posts,
 )
 
-from src.db.connector import Base
-
-
-@pytest.fixture(scope="module")
-def test_engine() -> Engine:
-    """Create connection engine to the database for testing. 
-
-    This is only used for testing.
-
-    Returns
-    -------
-        Engine: Connection to database
-    """
-    url_object = URL.create(
-        "postgresql+psycopg2",
-        username="postgres",
-        password="postgres",  # plain (unescaped) text
-        host="localhost",
-        database="reimagined-octo-goggles",
-    )
-    return create_engine(url_object)
-
-
-@pytest.fixture(scope="module")
-def init_db(test_engine: Engine) -> Generator[None, None, None]:
-    """Create connection engine to the database for testing.
-
-    This is only used for testing.
-
-    Returns
-    -------
-        Generator: yield database
-    """
-    Base.metadata.drop_all(test_engine)
-    Base.metadata.create_all(test_engine)
-    yield None
-
 def test_users_model(init_db: None, test_engine: Engine):
     """Test the Users model."""
     Session = sessionmaker(bind=test_engine)
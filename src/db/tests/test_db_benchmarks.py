@@ -0,0 +1,56 @@
+"Benchmark common operations on the small synthetic dataset and guard query counts."
+from sqlalchemy import Engine, func, select
+from sqlalchemy.orm import Session
+
+from benchmarks.bench_db import print_stats, run_benchmarks
+from src.db.models import Groups, Posts, Users
+from src.db.synthetic import SCALES, email
+
+# Most queries per run of each read operation; more means a relationship started loading
+# lazily.
+EXPECTED_QUERIES = {
+    "user_with_posts": 2,
+    "post_by_id": 1,
+    "group_feed_page": 1,
+    "group_feed_three_pages": 3,
+    "search": 1,
+    "dashboard_counts": 1,
+}
+
+
+def test_dataset(rollback_session: Session):
+    """Test the dataset is loaded with its skew.
+
+    Changes to it are rolled back after the test.
+    """
+    spec = SCALES["small"]
+    assert (
+        rollback_session.scalar(select(func.count()).select_from(Posts)) == spec.posts
+    )
+    counts = rollback_session.scalars(
+        select(Groups.post_count).order_by(Groups.post_count.desc())
+    ).all()
+    assert len(counts) == spec.groups and counts[0] > 10 * counts[-1]
+    prolific = rollback_session.scalars(
+        select(Users).where(Users.email == email(0))
+    ).one()
+    prolific.name = "Renamed"
+    rollback_session.commit()
+
+
+def test_rolled_back(rollback_session: Session):
+    """Test the rename of the previous test did not survive it."""
+    assert (
+        rollback_session.scalar(select(Users.name).where(Users.email == email(0)))
+        == "User 0"
+    )
+
+
+def test_benchmarks(dataset_engine: Engine):
+    """Run every operation and check none sends more queries than expected."""
+    stats = run_benchmarks(dataset_engine, SCALES["small"], runs=20)
+    print_stats(stats)
+    queries = {stat.name: stat.queries for stat in stats}
+    for name, expected in EXPECTED_QUERIES.items():
+        assert queries[name] <= expected, name
+    assert all(stat.p50 <= stat.p95 <= stat.p99 for stat in stats)
@@ -0,0 +1,95 @@
+"Test keyset pagination of the feeds."
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import Engine
+from sqlalchemy.orm import Session
+
+from src.db.bulk import ingest_groups, ingest_posts, ingest_users
+from src.db.feeds import OLDEST_FIRST, author_feed, decode_cursor, group_feed
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture(scope="module")
+def seeded(init_db: None, test_engine: Engine) -> None:
+    """Seed 25 posts in one group, two of them created at the same time."""
+    engine = test_engine
+    ingest_users(engine, [{"name": "User", "email": "user@you.com", "password": "pw"}])
+    ingest_groups(
+        engine,
+        [
+            {"name": "Group1", "domain": "group1.com"},
+            {"name": "Group2", "domain": "group2.com"},
+        ],
+    )
+    ingest_posts(
+        engine,
+        (
+            {
+                "title": f"Post {i}",
+                "author_email": "user@you.com",
+                "group_domain": "group1.com",
+                "date_created": START + timedelta(minutes=min(i, 10)),
+            }
+            for i in range(25)
+        ),
+    )
+
+
+@pytest.fixture()
+def session(seeded: None, test_engine: Engine):
+    """Create a session on the seeded database."""
+    with Session(test_engine) as session:
+        yield session
+
+
+def read_feed(feed, **kwargs) -> list[str]:
+    """Follow the cursors of a feed to its end and return the titles read."""
+    titles = []
+    cursor = None
+    while True:
+        page = feed(cursor=cursor, **kwargs)
+        titles += [post.title for post in page.posts]
+        if page.next_cursor is None:
+            return titles
+        cursor = page.next_cursor
+
+
+def test_group_feed(session: Session):
+    """Test pages cover every post once, in order.
+
+    Posts created at the same time are included.
+    """
+    newest = read_feed(
+        lambda **kwargs: group_feed(session, 1, limit=4, strict=True, **kwargs)
+    )
+    assert newest == [f"Post {i}" for i in range(24, -1, -1)]
+    oldest = read_feed(
+        lambda **kwargs: author_feed(session, 1, limit=7, order=OLDEST_FIRST, **kwargs)
+    )
+    assert oldest == [f"Post {i}" for i in range(25)]
+
+    page = group_feed(session, 1, limit=25)
+    assert len(page.posts) == 25 and page.next_cursor is None
+    assert group_feed(session, 2).posts == []
+
+    bounded = group_feed(
+        session,
+        1,
+        since=START + timedelta(minutes=5),
+        until=START + timedelta(minutes=10),
+    )
+    assert [post.title for post in bounded.posts] == [
+        f"Post {i}" for i in range(9, 4, -1)
+    ]
+
+
+def test_invalid_feed_arguments(session: Session):
+    """Test invalid cursors, orders and page sizes are rejected."""
+    with pytest.raises(ValueError):
+        decode_cursor("not a cursor")
+    with pytest.raises(ValueError):
+        group_feed(session, 1, order="random")
+    with pytest.raises(ValueError):
+        group_feed(session, 1, limit=0)
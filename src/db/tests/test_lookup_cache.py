@@ -0,0 +1,140 @@
+"Test the lookup cache."
+from collections.abc import Generator
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from src.db.connector import Base
+from src.db.lookup_cache import LookupCache, LRUCache, UserSnapshot, user_key
+from src.db.models import Groups, Users
+
+
+class DictBackend:
+    """Shared backend keeping values in a dict, ignoring the TTL."""
+
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, ttl):
+        self.values[key] = value
+
+    def delete(self, key):
+        self.values.pop(key, None)
+
+
+@pytest.fixture()
+def session_factory(tmp_path) -> Generator[sessionmaker, None, None]:
+    """Create a session factory on a sqlite database with one user and one group."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'lookup_cache.db'}")
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    now = datetime.now(timezone.utc)
+    with factory() as session:
+        session.add(
+            Users(
+                name="John Doe",
+                email="john@you.com",
+                password="password",
+                date_created=now,
+            )
+        )
+        session.add(Groups(name="Group1", domain="you.com", date_created=now))
+        session.commit()
+    yield factory
+
+
+def test_read_through(session_factory: sessionmaker):
+    """Test lookups try the local cache, then the shared backend, then the database."""
+    backend = DictBackend()
+    cache = LookupCache(session_factory, backend=backend)
+    assert cache.user_by_email("john@you.com").name == "John Doe"
+    assert cache.user_by_email("john@you.com").name == "John Doe"
+    assert cache.group_by_domain("you.com").domain == "you.com"
+    assert cache.user_by_email("nobody@you.com") is None
+    assert "password" not in backend.values[user_key("john@you.com")]
+
+    other = LookupCache(session_factory, backend=backend)
+    assert other.user_by_email("john@you.com").email == "john@you.com"
+
+    stats = cache.stats.snapshot()
+    assert (stats["hits"], stats["misses"], stats["lookups"]) == (1, 3, 4)
+    assert stats["hit_ratio"] == 0.25
+    assert other.stats.snapshot()["shared_hits"] == 1
+
+
+def test_orm_changes_invalidate(session_factory: sessionmaker):
+    """Test inserts, updates under a new key and deletes drop the cached entries."""
+    cache = LookupCache(session_factory).install()
+    try:
+        assert cache.user_by_email("jane@you.com") is None
+        with session_factory() as session:
+            session.add(
+                Users(
+                    name="Jane",
+                    email="jane@you.com",
+                    password="pw",
+                    date_created=datetime.now(),
+                )
+            )
+            session.commit()
+        assert cache.user_by_email("jane@you.com").name == "Jane"
+
+        assert cache.user_by_email("john@you.com").name == "John Doe"
+        with session_factory() as session:
+            user = session.scalars(select(Users).filter_by(email="john@you.com")).one()
+            user.email = "johnny@you.com"
+            session.commit()
+        assert cache.user_by_email("john@you.com") is None
+        assert cache.user_by_email("johnny@you.com").email == "johnny@you.com"
+
+        assert cache.group_by_domain("you.com") is not None
+        with session_factory() as session:
+            session.delete(session.scalars(select(Groups)).one())
+            session.commit()
+        assert cache.group_by_domain("you.com") is None
+    finally:
+        cache.uninstall()
+
+
+def test_invalidation_during_load(session_factory: sessionmaker):
+    """Test a row loaded before a concurrent change commits is returned, not cached."""
+    backend = DictBackend()
+    cache = LookupCache(session_factory, backend=backend).install()
+    key = user_key("john@you.com")
+
+    def load_then_rename(session):
+        user = session.scalars(select(Users).filter_by(email="john@you.com")).one()
+        with session_factory() as other:
+            other.scalars(
+                select(Users).filter_by(email="john@you.com")
+            ).one().name = "Johnny"
+            other.commit()
+        return user
+
+    try:
+        assert cache._lookup(key, UserSnapshot, load_then_rename).name == "John Doe"
+        assert cache.local.get(key) is None
+        assert key not in backend.values
+        assert cache.user_by_email("john@you.com").name == "Johnny"
+        assert cache.local.get(key).name == "Johnny"
+    finally:
+        cache.uninstall()
+
+
+def test_lru_cache():
+    """Test entries expire after their TTL and the least recently used is evicted."""
+    now = [0.0]
+    cache = LRUCache(max_size=2, ttl=10, clock=lambda: now[0])
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
+    now[0] = 10
+    assert cache.get("a") is None
+    assert len(cache) == 1
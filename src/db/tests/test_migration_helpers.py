@@ -0,0 +1,143 @@
+"Test the helpers of online migrations."
+from argparse import Namespace
+from collections.abc import Iterator
+
+import pytest
+from alembic.config import Config
+from alembic.operations import Operations
+from alembic.runtime.environment import EnvironmentContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import Connection, Engine, create_engine, text
+from sqlalchemy.exc import DataError
+
+from src.db.migration_helpers import (
+    MigrationOptions,
+    backfill,
+    create_index_concurrently,
+)
+
+
+@pytest.fixture()
+def connection(tmp_path) -> Iterator[Connection]:
+    """Open a migration context on a sqlite database with 10 rows to backfill.
+
+    It runs with ``-x batch_size=3``.
+    """
+    engine = create_engine(f"sqlite:///{tmp_path / 'migration.db'}")
+    with engine.begin() as setup:
+        setup.execute(
+            text("CREATE TABLE items (id INTEGER PRIMARY KEY, value INTEGER)")
+        )
+        setup.execute(
+            text(
+                "INSERT INTO items (id) VALUES "
+                + ", ".join(f"({i})" for i in range(1, 11))
+            )
+        )
+    config = Config()
+    config.cmd_opts = Namespace(x=["batch_size=3", "pause=0"])
+    with engine.connect() as connection, EnvironmentContext(
+        config, ScriptDirectory("src/db/alembic")
+    ) as environment:
+        # Transactional DDL like on PostgreSQL, so helpers run inside a migration
+        # transaction.
+        environment.configure(connection=connection, transactional_ddl=True)
+        with environment.begin_transaction(), Operations.context(
+            environment.get_context()
+        ):
+            yield connection
+
+
+@pytest.fixture()
+def partitioned(test_engine: Engine) -> Iterator[Connection]:
+    """Open a migration context on PostgreSQL with a table of two partitions.
+
+    The second partition holds a zero.
+    """
+    with test_engine.begin() as setup:
+        setup.execute(text("DROP TABLE IF EXISTS ranges"))
+        setup.execute(
+            text(
+                "CREATE TABLE ranges (id INTEGER, value INTEGER) "
+                "PARTITION BY RANGE (id)"
+            )
+        )
+        setup.execute(
+            text(
+                "CREATE TABLE ranges_low PARTITION OF ranges "
+                "FOR VALUES FROM (0) TO (10)"
+            )
+        )
+        setup.execute(
+            text(
+                "CREATE TABLE ranges_high PARTITION OF ranges "
+                "FOR VALUES FROM (10) TO (20)"
+            )
+        )
+        setup.execute(text("INSERT INTO ranges VALUES (1, 1), (11, 0)"))
+    with test_engine.connect() as connection, EnvironmentContext(
+        Config(), ScriptDirectory("src/db/alembic")
+    ) as environment:
+        environment.configure(connection=connection)
+        with environment.begin_transaction(), Operations.context(
+            environment.get_context()
+        ):
+            yield connection
+    with test_engine.begin() as teardown:
+        teardown.execute(text("DROP TABLE ranges"))
+
+
+def test_options(connection: Connection):
+    """Test options are read from the ``-x`` arguments, with defaults for the others."""
+    assert MigrationOptions.from_context() == MigrationOptions(batch_size=3, pause=0.0)
+
+
+def test_backfill(connection: Connection):
+    """Test rows are updated in committed batches.
+
+    Reruns and resumes skip the rows done.
+    """
+    keys = []
+    report = backfill(
+        "items",
+        "value = id * 2",
+        where="value IS NULL AND id <= 8",
+        progress=lambda done: keys.append(done.last_key),
+    )
+    assert (report.rows, report.batches, report.last_key) == (8, 4, 10)
+    assert keys == [3, 6, 9, 10]
+
+    with create_engine(connection.engine.url).connect() as other:
+        assert (
+            other.execute(
+                text("SELECT count(*) FROM items WHERE value = id * 2")
+            ).scalar()
+            == 8
+        )
+    assert (
+        backfill("items", "value = id * 2", where="value IS NULL AND id <= 8").rows == 0
+    )
+    resumed = backfill("items", "value = 0", start=8, batch_size=5)
+    assert (resumed.rows, resumed.batches, resumed.last_key) == (2, 1, 10)
+
+
+def test_index_rebuilt_after_failure(partitioned: Connection):
+    """Test rerunning a failed partitioned index build.
+
+    The rerun rebuilds the invalid index left and validates the parent.
+    """
+    valid = text(
+        "SELECT relname, indisvalid FROM pg_index JOIN pg_class ON oid = indexrelid "
+        "WHERE relname LIKE '%inverse%'"
+    )
+    with pytest.raises(DataError):
+        create_index_concurrently("ix_ranges_inverse", "ranges", ["(1 / value)"])
+    assert dict(partitioned.execute(valid).all()) == {
+        "ix_ranges_inverse": False,
+        "ranges_low_inverse_idx": True,
+        "ranges_high_inverse_idx": False,
+    }
+    partitioned.execute(text("UPDATE ranges SET value = 1"))
+    partitioned.commit()
+    create_index_concurrently("ix_ranges_inverse", "ranges", ["(1 / value)"])
+    assert all(dict(partitioned.execute(valid).all()).values())
@@ -0,0 +1,99 @@
+"Test the monthly partitions of posts."
+from datetime import datetime, timezone
+
+from sqlalchemy import Engine, select, text
+from sqlalchemy.orm import Session
+
+from src.db.bulk import ingest_groups, ingest_posts, ingest_users
+from src.db.models import Posts
+from src.db.partitions import (
+    add_months,
+    created_between,
+    ensure_partitions,
+    list_partitions,
+    month_start,
+    partition_for,
+    retire_partitions,
+)
+from src.db.post_counts import user_post_counts
+
+NOW = datetime(2026, 11, 20, 15, 30, tzinfo=timezone.utc)
+
+
+def test_partition_bounds():
+    """Test months are computed in UTC and across year ends."""
+    assert month_start(
+        datetime(2026, 12, 1, 1, tzinfo=timezone.utc).astimezone()
+    ) == datetime(2026, 12, 1, tzinfo=timezone.utc)
+    assert add_months(month_start(NOW), 2) == datetime(2027, 1, 1, tzinfo=timezone.utc)
+    assert add_months(month_start(NOW), -11) == datetime(
+        2025, 12, 1, tzinfo=timezone.utc
+    )
+    partition = partition_for(NOW)
+    assert (partition.name, partition.lower, partition.upper) == (
+        "posts_p2026_11",
+        datetime(2026, 11, 1, tzinfo=timezone.utc),
+        datetime(2026, 12, 1, tzinfo=timezone.utc),
+    )
+
+
+def test_partition_maintenance(init_db: None, test_engine: Engine):
+    """Test rows move out of the default partition and bounded queries are pruned.
+
+    Old partitions are retired.
+    """
+    ingest_users(
+        test_engine, [{"name": "User", "email": "user@you.com", "password": "pw"}]
+    )
+    ingest_groups(test_engine, [{"name": "Group", "domain": "you.com"}])
+    posts = [
+        {
+            "title": f"Post {month}",
+            "author_email": "user@you.com",
+            "group_domain": "you.com",
+            "date_created": month,
+        }
+        for month in (
+            datetime(2026, 9, 15, tzinfo=timezone.utc),
+            datetime(2026, 11, 2, tzinfo=timezone.utc),
+        )
+    ]
+    ingest_posts(test_engine, posts)
+
+    created = ensure_partitions(test_engine, months_ahead=2, now=NOW)
+    assert created == ["posts_p2026_11", "posts_p2026_12", "posts_p2027_01"]
+    assert ensure_partitions(test_engine, months_ahead=2, now=NOW) == []
+    assert ensure_partitions(
+        test_engine, months_ahead=0, now=datetime(2026, 9, 1, tzinfo=timezone.utc)
+    ) == ["posts_p2026_09"]
+    with test_engine.connect() as connection:
+        assert [partition.name for partition in list_partitions(connection)] == [
+            "posts_p2026_09",
+            "posts_p2026_11",
+            "posts_p2026_12",
+            "posts_p2027_01",
+        ]
+        assert connection.scalar(text("SELECT count(*) FROM posts_default")) == 0
+        assert connection.scalar(text("SELECT count(*) FROM posts_p2026_11")) == 1
+        query = select(Posts.id).where(
+            created_between(since=datetime(2026, 11, 1, tzinfo=timezone.utc))
+        )
+        sql = query.compile(
+            dialect=connection.dialect, compile_kwargs={"literal_binds": True}
+        )
+        plan = "\n".join(connection.execute(text(f"EXPLAIN {sql}")).scalars())
+        assert "posts_p2026_11" in plan and "posts_p2026_09" not in plan
+
+    with Session(test_engine) as session:
+        assert user_post_counts(session, [1]) == {1: 2}
+    assert retire_partitions(test_engine, keep_months=1, now=NOW) == ["posts_p2026_09"]
+    with Session(test_engine) as session:
+        assert session.scalars(select(Posts.title)).all() == [
+            "Post 2026-11-02 00:00:00+00:00"
+        ]
+        assert user_post_counts(session, [1]) == {1: 1}
+    with test_engine.begin() as connection:
+        assert (
+            connection.scalar(text("SELECT count(*) FROM archive.posts_p2026_09")) == 1
+        )
+        connection.execute(text("DROP SCHEMA archive CASCADE"))
@@ -0,0 +1,180 @@
+"Test password hashing."
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import Engine, create_engine, select
+from sqlalchemy.orm import Session
+
+from src.db import passwords
+from src.db.connector import Base
+from src.db.models import Users
+from src.db.passwords import (
+    PasswordHasher,
+    ScryptParameters,
+    authenticate,
+    hash_password,
+    hash_plaintext_passwords,
+    needs_rehash,
+    verify_password,
+)
+
+
+@pytest.fixture(autouse=True)
+def cheap_parameters(monkeypatch):
+    """Use cheap cost parameters, with version 2 current, to keep the tests fast."""
+    monkeypatch.setattr(
+        passwords,
+        "PARAMETERS",
+        {
+            1: ScryptParameters(n=2**4, r=8, p=1),
+            2: ScryptParameters(n=2**5, r=8, p=1),
+        },
+    )
+    monkeypatch.setattr(passwords, "CURRENT_VERSION", 2)
+
+
+@pytest.fixture()
+def hasher():
+    """Create a hasher with two threads."""
+    hasher = PasswordHasher(workers=2)
+    yield hasher
+    hasher.shutdown()
+
+
+@pytest.fixture()
+def engine(tmp_path) -> Engine:
+    """Create a sqlite database with users holding plaintext, old and current hashes."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'passwords.db'}")
+    Base.metadata.create_all(engine)
+    now = datetime.now(timezone.utc)
+    with Session(engine) as session:
+        session.add_all(
+            Users(
+                name=f"User {i}",
+                email=f"user{i}@you.com",
+                password=f"pw{i}",
+                date_created=now,
+            )
+            for i in range(5)
+        )
+        session.add(
+            Users(
+                name="Old",
+                email="old@you.com",
+                password=hash_password("old", version=1),
+                date_created=now,
+            )
+        )
+        session.add(
+            Users(
+                name="New",
+                email="new@you.com",
+                password=hash_password("new"),
+                date_created=now,
+            )
+        )
+        session.commit()
+    return engine
+
+
+def test_hash_and_verify():
+    """Test hashes are salted, verify their password only and name their version."""
+    stored = hash_password("secret")
+    assert stored.startswith("scrypt$2$")
+    assert stored != hash_password("secret")
+    assert verify_password("secret", stored)
+    assert not verify_password("Secret", stored)
+    assert not needs_rehash(stored)
+    assert needs_rehash(hash_password("secret", version=1))
+    with pytest.raises(ValueError):
+        verify_password("secret", "scrypt$9$c2FsdA$aGFzaA")
+
+
+def test_plaintext():
+    """Test legacy plaintext passwords still verify and need a rehash."""
+    assert verify_password("secret", "secret")
+    assert not verify_password("secret", "Secret")
+    assert needs_rehash("secret")
+
+
+def test_hasher(hasher: PasswordHasher):
+    """Test the pool hashes and verifies, blocking and from coroutines."""
+
+    async def login() -> tuple[bool, bool]:
+        stored = await hasher.hash_async("secret")
+        return await asyncio.gather(
+            hasher.verify_async("secret", stored), hasher.verify_async("nope", stored)
+        )
+
+    assert hasher.verify("secret", hasher.hash("secret"))
+    assert asyncio.run(login()) == [True, False]
+
+
+def test_authenticate(engine: Engine, hasher: PasswordHasher, monkeypatch):
+    """Test logins check the password and upgrade plaintext and old hashes.
+
+    Unknown emails verify against a hash too.
+    """
+    verified = []
+    verify = hasher.verify
+    monkeypatch.setattr(
+        hasher,
+        "verify",
+        lambda password, stored: verified.append(stored) or verify(password, stored),
+    )
+    with Session(engine) as session:
+        assert authenticate(session, "user0@you.com", "wrong", hasher) is None
+        assert authenticate(session, "nobody@you.com", "pw0", hasher) is None
+        assert verified[-1] == hasher.dummy_hash().result()
+        assert verified[-1].startswith("scrypt$2$")
+        assert authenticate(
+            session, "user0@you.com", "pw0", hasher
+        ).password.startswith("scrypt$2$")
+        assert authenticate(session, "old@you.com", "old", hasher).password.startswith(
+            "scrypt$2$"
+        )
+        new = session.scalars(
+            select(Users.password).where(Users.email == "new@you.com")
+        ).one()
+        assert authenticate(session, "new@you.com", "new", hasher).password == new
+        session.commit()
+    with Session(engine) as session:
+        assert authenticate(session, "user0@you.com", "pw0", hasher) is not None
+        assert authenticate(session, "old@you.com", "old", hasher) is not None
+
+
+def test_authenticate_malformed_hash(engine: Engine, hasher: PasswordHasher):
+    """Test a malformed stored hash fails the login instead of raising."""
+    with Session(engine) as session:
+        session.add(
+            Users(
+                name="Odd",
+                email="odd@you.com",
+                password="scrypt$oops",
+                date_created=datetime.now(timezone.utc),
+            )
+        )
+        session.commit()
+        assert authenticate(session, "odd@you.com", "scrypt$oops", hasher) is None
+        assert authenticate(session, "odd@you.com", "oops", hasher) is None
+
+
+def test_hash_plaintext_passwords(engine: Engine, hasher: PasswordHasher):
+    """Test the migration hashes plaintext passwords in chunks.
+
+    It leaves hashes alone and can rerun.
+    """
+    with Session(engine) as session:
+        query = select(Users.email, Users.password).where(
+            Users.name.in_(["Old", "New"])
+        )
+        hashed = dict(session.execute(query).tuples().all())
+    report = hash_plaintext_passwords(engine, chunk_size=2, hasher=hasher)
+    assert (report.rows, report.hashed) == (5, 5)
+    with Session(engine) as session:
+        users = session.scalars(select(Users).order_by(Users.id)).all()
+        for i, user in enumerate(users[:5]):
+            assert verify_password(f"pw{i}", user.password)
+        assert {user.email: user.password for user in users[5:]} == hashed
+    assert hash_plaintext_passwords(engine, chunk_size=2, hasher=hasher).rows == 0
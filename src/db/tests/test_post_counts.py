@@ -0,0 +1,69 @@
+"Test the post counts of users and groups."
+from sqlalchemy import Engine, delete, update
+from sqlalchemy.orm import Session
+
+from src.db.bulk import ingest_groups, ingest_posts, ingest_users
+from src.db.models import Groups, Posts, Users
+from src.db.post_counts import (
+    group_post_counts,
+    reconcile_post_counts,
+    user_post_counts,
+)
+
+
+def test_post_counts(init_db: None, test_engine: Engine):
+    """Test the triggers follow inserts, moves and deletes.
+
+    Reconciling fixes counts that drifted.
+    """
+    users = [
+        {"name": f"User {i}", "email": f"user{i}@you.com", "password": "pw"}
+        for i in range(1, 4)
+    ]
+    ingest_users(test_engine, users)
+    ingest_groups(
+        test_engine,
+        [
+            {"name": "Group1", "domain": "group1.com"},
+            {"name": "Group2", "domain": "group2.com"},
+        ],
+    )
+    posts = [
+        {
+            "title": f"Post {i}",
+            "author_email": f"user{i % 2 + 1}@you.com",
+            "group_domain": "group1.com",
+        }
+        for i in range(10)
+    ]
+    ingest_posts(test_engine, posts)
+    ingest_posts(test_engine, posts[:3], use_copy=False)
+
+    with Session(test_engine) as session:
+        assert user_post_counts(session, [1, 2, 3, 4]) == {1: 7, 2: 6, 3: 0}
+        assert group_post_counts(session, [1, 2]) == {1: 13, 2: 0}
+
+        session.execute(
+            update(Posts).where(Posts.author_id == 2).values(author_id=3, group_id=2)
+        )
+        session.execute(
+            update(Posts).where(Posts.author_id == 1).values(title="Renamed")
+        )
+        session.execute(delete(Posts).where(Posts.title == "Renamed"))
+        session.commit()
+        assert user_post_counts(session, [1, 2, 3]) == {1: 0, 2: 0, 3: 6}
+        assert group_post_counts(session, [1, 2]) == {1: 0, 2: 6}
+
+        session.execute(update(Users).values(post_count=100))
+        session.execute(update(Groups).where(Groups.id == 2).values(post_count=-1))
+        session.commit()
+
+    reports = reconcile_post_counts(test_engine, batch_size=2)
+    assert [(report.table, report.rows, report.fixed) for report in reports] == [
+        ("users", 3, 3),
+        ("groups", 2, 1),
+    ]
+    with Session(test_engine) as session:
+        assert user_post_counts(session, [1, 2, 3]) == {1: 0, 2: 0, 3: 6}
+        assert group_post_counts(session, [1, 2]) == {1: 0, 2: 6}
+    assert [report.fixed for report in reconcile_post_counts(test_engine)] == [0, 0]
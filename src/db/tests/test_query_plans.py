@@ -0,0 +1,168 @@
+"Test the hot queries on posts use indexes instead of sequential scans."
+from collections.abc import Generator, Iterator
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import Engine, Select, func, select, text, tuple_
+
+from src.db.models import Posts
+from src.db.partitions import ensure_partitions
+from src.db.search import search_vector
+
+USERS = 2_000
+GROUPS = 200
+POSTS = 200_000
+
+
+@pytest.fixture(scope="module")
+def seeded_db(init_db: None, test_engine: Engine) -> Generator[set[str], None, None]:
+    """Seed a dataset large enough for the planner to prefer indexes.
+
+    Its statistics are collected too.
+
+    Returns
+    -------
+        Generator: yield the partitions of posts holding rows
+    """
+    # The posts span about five months, spread over monthly partitions like in
+    # production.
+    ensure_partitions(
+        test_engine,
+        months_ahead=6,
+        now=datetime.now(timezone.utc) - timedelta(minutes=POSTS),
+    )
+    with test_engine.begin() as connection:
+        connection.execute(
+            text(
+                "INSERT INTO users (name, email, password, date_created) "
+                "SELECT 'User ' || i, 'user' || i || '@you.com', 'password', now() "
+                "FROM generate_series(1, :users) i"
+            ),
+            {"users": USERS},
+        )
+        connection.execute(
+            text(
+                "INSERT INTO groups (name, domain, date_created) "
+                "SELECT 'Group ' || i, 'group' || i || '.com', now() "
+                "FROM generate_series(1, :groups) i"
+            ),
+            {"groups": GROUPS},
+        )
+        connection.execute(
+            text(
+                "INSERT INTO posts (title, content, author_id, group_id, date_created) "
+                "SELECT 'Post ' || i, repeat('content ', 20), "
+                "1 + i % :users, 1 + i % :groups, "
+                "now() - (:posts - i) * interval '1 minute' "
+                "FROM generate_series(1, :posts) i"
+            ),
+            {"users": USERS, "groups": GROUPS, "posts": POSTS},
+        )
+    with test_engine.connect().execution_options(
+        isolation_level="AUTOCOMMIT"
+    ) as connection:
+        connection.exec_driver_sql("ANALYZE users, groups, posts")
+        populated = (
+            connection.exec_driver_sql(
+                "SELECT DISTINCT tableoid::regclass::text FROM posts"
+            )
+            .scalars()
+            .all()
+        )
+    yield set(populated)
+
+
+def plan_nodes(plan: dict) -> Iterator[dict]:
+    """Walk the nodes of a JSON ``EXPLAIN`` plan."""
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+def explain(engine: Engine, statement: Select) -> list[dict]:
+    """Plan a statement with its bound parameters and return its nodes."""
+    with engine.connect() as connection:
+        compiled = statement.compile(
+            engine, compile_kwargs={"render_postcompile": True}
+        )
+        plan = connection.exec_driver_sql(
+            f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params
+        ).scalar_one()
+    return list(plan_nodes(plan[0]["Plan"]))
+
+
+NEWEST_FIRST = (Posts.date_created.desc(), Posts.id.desc())
+# A post halfway through the seeded posts.
+SEEN = datetime.now(timezone.utc) - timedelta(minutes=POSTS // 2)
+# Feed pages must walk the index in order rather than sort all of a group's or author's
+# posts.
+FEED_QUERIES = {"latest_group_posts", "next_group_posts", "oldest_author_posts"}
+
+HOT_QUERIES = {
+    # Lazy loading Users.posts and Groups.posts.
+    "author_posts": select(Posts).where(Posts.author_id == 42),
+    "group_posts": select(Posts).where(Posts.group_id == 7),
+    # selectinload of Users.posts for a page of users.
+    "authors_posts": select(Posts).where(Posts.author_id.in_(range(1, 51))),
+    # Feed pages of a group or an author, see src.db.feeds.
+    "latest_group_posts": select(Posts)
+    .where(Posts.group_id == 7)
+    .order_by(*NEWEST_FIRST)
+    .limit(21),
+    "next_group_posts": (
+        select(Posts)
+        .where(
+            Posts.group_id == 7,
+            tuple_(Posts.date_created, Posts.id) < tuple_(SEEN, POSTS // 2),
+        )
+        .order_by(*NEWEST_FIRST)
+        .limit(21)
+    ),
+    "oldest_author_posts": (
+        select(Posts)
+        .where(
+            Posts.author_id == 42,
+            tuple_(Posts.date_created, Posts.id) > tuple_(SEEN, POSTS // 2),
+        )
+        .order_by(Posts.date_created, Posts.id)
+        .limit(21)
+    ),
+    # Full-text search, see src.db.search. Only "Post 4242" has the word 4242.
+    "search_posts": select(Posts).where(
+        search_vector.bool_op("@@")(func.websearch_to_tsquery("english", "4242"))
+    ),
+}
+
+
+@pytest.mark.parametrize("name", HOT_QUERIES)
+def test_hot_query_uses_index(seeded_db: set[str], test_engine: Engine, name: str):
+    """Test a hot query reads posts through an index."""
+    nodes = explain(test_engine, HOT_QUERIES[name])
+    # Scans of posts name the partitions they read. Empty partitions, ahead of the posts
+    # or the default one, cost nothing to scan sequentially, so only those holding posts
+    # count.
+    scans = [node for node in nodes if node.get("Relation Name") in seeded_db]
+    assert scans
+    assert all(node["Node Type"] != "Seq Scan" for node in scans), nodes
+    if name in FEED_QUERIES:
+        assert all(node["Node Type"] != "Sort" for node in nodes), nodes
+
+
+def test_post_lookup_prunes_partitions(seeded_db: set[str], test_engine: Engine):
+    """Test a post looked up with its creation time reads one partition.
+
+    Without it, the lookup reads every partition.
+    """
+    lookup = select(Posts).where(Posts.id == POSTS // 2)
+    scanned = {
+        node["Relation Name"]
+        for node in explain(test_engine, lookup)
+        if "Relation Name" in node
+    }
+    assert seeded_db < scanned
+    hinted = {
+        node["Relation Name"]
+        for node in explain(test_engine, lookup.where(Posts.date_created == SEEN))
+        if "Relation Name" in node
+    }
+    assert len(hinted) == 1
@@ -0,0 +1,109 @@
+"Test the loading profiles of the repository."
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import Engine, event
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.orm import Session
+
+from src.db.bulk import ingest_groups, ingest_posts, ingest_users
+from src.db.models import Posts, Users
+from src.db.repository import Repository
+
+
+@pytest.fixture(scope="module")
+def seeded(init_db: None, test_engine: Engine) -> None:
+    """Seed users, groups and posts."""
+    engine = test_engine
+    ingest_users(
+        engine,
+        (
+            {"name": f"User {i}", "email": f"user{i}@you.com", "password": "pw"}
+            for i in range(5)
+        ),
+    )
+    ingest_groups(
+        engine,
+        [
+            {"name": "Group1", "domain": "group1.com"},
+            {"name": "Group2", "domain": "group2.com"},
+        ],
+    )
+    ingest_posts(
+        engine,
+        (
+            {
+                "title": f"Post {i}",
+                "author_email": f"user{i % 5}@you.com",
+                "group_domain": f"group{i % 2 + 1}.com",
+            }
+            for i in range(20)
+        ),
+    )
+
+
+@pytest.fixture()
+def session(seeded: None, test_engine: Engine):
+    """Create a session on the seeded database, counting its queries.
+
+    The count is kept in ``session.info["queries"]``.
+    """
+    with Session(test_engine) as session:
+        session.info["queries"] = 0
+
+        def count(*args):
+            session.info["queries"] += 1
+
+        event.listen(test_engine, "before_cursor_execute", count)
+        yield session
+        event.remove(test_engine, "before_cursor_execute", count)
+
+
+def test_post_list_profile(session: Session):
+    """Test posts load their author and group in one query.
+
+    Strict mode catches other lazy loads.
+    """
+    posts = Repository(session, strict=True).posts(limit=10)
+    assert len(posts) == 10
+    assert {post.author.email for post in posts} == {
+        f"user{i}@you.com" for i in range(5)
+    }
+    assert {post.group.domain for post in posts} == {"group1.com", "group2.com"}
+    assert session.info["queries"] == 1
+    with pytest.raises(InvalidRequestError):
+        posts[0].author.posts
+
+
+def test_collection_profile(session: Session):
+    """Test a collection and the relationships below it load with one query each."""
+    repository = Repository(session, strict=True)
+    user = repository.user_by_email("user1@you.com", profile="user_posts")
+    # The relationship has no order, sort by id before comparing.
+    posts = sorted(user.posts, key=lambda post: post.id)
+    assert [post.title for post in posts] == ["Post 1", "Post 6", "Post 11", "Post 16"]
+    assert {post.group.domain for post in user.posts} == {"group1.com", "group2.com"}
+    assert session.info["queries"] == 2
+    with pytest.raises(InvalidRequestError):
+        user.posts[0].author
+    with pytest.raises(ValueError):
+        repository.select(Users, "post_list")
+
+
+def test_post_by_creation_time(session: Session):
+    """Test the creation time of a post narrows its lookup by id."""
+    repository = Repository(session)
+    post = repository.post(1)
+    assert repository.post(1, date_created=post.date_created) is post
+    assert (
+        repository.post(1, date_created=post.date_created - timedelta(seconds=1))
+        is None
+    )
+
+
+def test_lazy_profile(session: Session):
+    """Test without strict mode relationships outside the profile still load lazily."""
+    post = Repository(session).post(1, profile="post")
+    assert isinstance(post, Posts)
+    assert post.author.email == "user0@you.com"
+    assert session.info["queries"] == 2
@@ -0,0 +1,61 @@
+"Test full-text search of posts."
+from sqlalchemy import Engine, select
+from sqlalchemy.orm import Session
+
+from src.db.bulk import ingest_groups, ingest_posts, ingest_users
+from src.db.models import Groups, Posts
+from src.db.search import search_posts
+
+
+def test_search_posts(init_db: None, test_engine: Engine):
+    """Test matches are ranked by field, filtered, and paged without repeats."""
+    ingest_users(
+        test_engine,
+        [{"name": "John Doe", "email": "john@you.com", "password": "password"}],
+    )
+    ingest_groups(
+        test_engine,
+        [
+            {"name": "Group1", "domain": "you.com"},
+            {"name": "Group2", "domain": "me.com"},
+        ],
+    )
+    posts = [
+        {"title": "Cats", "content": "About pets", "group_domain": "you.com"},
+        {"title": "Pets", "caption": "Cats and dogs", "group_domain": "you.com"},
+        {"title": "Pets", "content": "Our cat sleeps", "group_domain": "me.com"},
+        {"title": "Dogs", "content": "Nothing feline here", "group_domain": "you.com"},
+    ]
+    posts += [
+        {"title": f"Cat {i}", "content": "cats", "group_domain": "me.com"}
+        for i in range(10)
+    ]
+    ingest_posts(
+        test_engine, ({**post, "author_email": "john@you.com"} for post in posts)
+    )
+
+    with Session(test_engine) as session:
+        group_id = session.scalars(
+            select(Groups.id).where(Groups.domain == "you.com")
+        ).one()
+        dogs_id = session.scalars(
+            select(Posts.id).where(Posts.caption == "Cats and dogs")
+        ).one()
+        page = search_posts(session, "cat", group_id=group_id)
+        assert [hit.post.title for hit in page.hits] == ["Cats", "Pets"]
+        assert page.hits[0].rank > page.hits[1].rank
+        assert page.next_cursor is None
+        assert page.hits[0].post.author.email == "john@you.com"
+
+        # "Cats and dogs" is excluded, the other 12 posts mention cats.
+        post_ids = []
+        cursor = None
+        while True:
+            page = search_posts(session, "cats -dogs", cursor=cursor, limit=5)
+            post_ids += [hit.post.id for hit in page.hits]
+            if page.next_cursor is None:
+                break
+            cursor = page.next_cursor
+        assert len(post_ids) == len(set(post_ids)) == 12
+        assert dogs_id not in post_ids
+        assert search_posts(session, "giraffe").hits == []
@@ -0,0 +1,42 @@
+"Test the synthetic dataset generator."
+from collections import Counter
+from dataclasses import replace
+
+from src.db.synthetic import (
+    SCALES,
+    domain,
+    email,
+    generate_groups,
+    generate_posts,
+    generate_users,
+)
+
+
+def test_generated_rows():
+    """Test rows are the same for a seed, differ for another seed, and are skewed."""
+    spec = SCALES["small"]
+    posts = list(generate_posts(spec))
+    assert posts == list(generate_posts(spec))
+    assert posts != list(generate_posts(replace(spec, seed=1)))
+    assert len(posts) == spec.posts
+    assert [post["date_created"] for post in posts] == sorted(
+        post["date_created"] for post in posts
+    )
+
+    assert {user["email"] for user in generate_users(spec)} >= {
+        post["author_email"] for post in posts
+    }
+    assert {group["domain"] for group in generate_groups(spec)} >= {
+        post["group_domain"] for post in posts
+    }
+    groups = Counter(post["group_domain"] for post in posts)
+    authors = Counter(post["author_email"] for post in posts)
+    assert (
+        groups.most_common(1)[0][0] == domain(0) and groups[domain(0)] > spec.posts / 4
+    )
+    assert authors[email(0)] > 5 * authors[email(spec.users - 1)]
+
+    even = Counter(
+        post["group_domain"] for post in generate_posts(replace(spec, group_skew=0))
+    )
+    assert max(even.values()) < 2 * min(even.values())
@@ -0,0 +1,145 @@
+"Test the tracking tab mirror."
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session
+
+from src.db import tracking_mirror
+from src.db.connector import Base
+from src.db.models import TrackingRows
+from src.sheets_interface.fake_sheets import FakeSheetsBackend
+from src.sheets_interface.sheets import TrackingSheet
+from src.sheets_interface.tracking_data import Lease, TrackingData
+
+SHEET_ID = "fake-spreadsheet"
+TAB = "tracking"
+VALUES = [
+    ["Request_UUID", "Cell_SN", "Completed"],
+    ["request1", "some_num", "Done"],
+    ["request1", "other_num", "Queued"],
+    ["request1", "just_entered"],
+    ["request2", "done_num", "Done"],
+    ["request2"],
+    ["request3", "blank_num", " "],
+    ["request3", "dup_num", "Done"],
+    ["request3", "dup_num", "Done"],
+    ["request4", "leased_num", Lease("worker", 0, "claim").status],
+]
+
+
+def test_sync_and_queries(tmp_path):
+    """Test syncs apply only the changed rows and the mirror answers like the sheet."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'mirror.db'}")
+    Base.metadata.create_all(engine)
+    backend = FakeSheetsBackend()
+    backend.set_values(SHEET_ID, TAB, VALUES)
+    sheet = TrackingSheet(SHEET_ID, TAB, http=backend.http())
+
+    report = tracking_mirror.sync_tracking_sheet(engine, sheet)
+    assert (report.inserted, report.updated, report.deleted, report.unchanged) == (
+        8,
+        0,
+        0,
+        0,
+    )
+    assert report.duplicates == [("request3", "dup_num")]
+
+    snapshot = TrackingData.from_values(VALUES, 2)
+    with Session(engine) as session:
+        for request_uuid in ("request1", "request2", "request3", "request4"):
+            complete = tracking_mirror.request_complete(
+                session, SHEET_ID, TAB, request_uuid
+            )
+            assert complete == snapshot.request_complete(request_uuid)
+            expected = snapshot.first_incomplete_row(request_uuid)
+            if expected is None:
+                with pytest.raises(ValueError):
+                    tracking_mirror.next_unused_row_sn(
+                        session, SHEET_ID, TAB, request_uuid
+                    )
+            else:
+                assert (
+                    tracking_mirror.next_unused_row_sn(
+                        session, SHEET_ID, TAB, request_uuid
+                    )
+                    == expected
+                )
+        assert (
+            tracking_mirror.find_row(session, SHEET_ID, TAB, "request1", "other_num")
+            == 3
+        )
+        with pytest.raises(ValueError, match="multiple times"):
+            tracking_mirror.find_row(session, SHEET_ID, TAB, "request3", "dup_num")
+        assert tracking_mirror.open_requests(session, SHEET_ID, TAB) == [
+            "request1",
+            "request3",
+            "request4",
+        ]
+
+    sheet.put_single_value_by_address(4, "C", "Done")
+    values = backend.values(SHEET_ID, TAB)
+    del values[2]
+    backend.set_values(SHEET_ID, TAB, values)
+    report = tracking_mirror.sync_tracking_sheet(engine, sheet)
+    # "other_num" is gone, and the rows below it moved up a row.
+    assert (report.inserted, report.updated, report.deleted, report.unchanged) == (
+        0,
+        6,
+        1,
+        1,
+    )
+    assert tracking_mirror.sync_tracking_sheet(engine, sheet).unchanged == 7
+
+    with Session(engine) as session:
+        row = session.get(TrackingRows, (SHEET_ID, TAB, "request1", "just_entered", 0))
+        assert (row.row_number, row.status, row.incomplete) == (3, "Done", False)
+        assert tracking_mirror.request_complete(session, SHEET_ID, TAB, "request1")
+        assert session.scalar(select(TrackingRows.date_synced).limit(1)) is not None
+
+
+def test_duplicate_rows_count(tmp_path):
+    """Test a repeated pair without a status keeps its request open, as in the sheet."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'mirror.db'}")
+    Base.metadata.create_all(engine)
+    values = [VALUES[0], ["request1", "dup_num", "Done"], ["request1", "dup_num"]]
+    tracking_mirror.apply_snapshot(
+        engine, SHEET_ID, TAB, TrackingData.from_values(values, 2)
+    )
+    with Session(engine) as session:
+        assert not tracking_mirror.request_complete(session, SHEET_ID, TAB, "request1")
+        assert tracking_mirror.next_unused_row_sn(
+            session, SHEET_ID, TAB, "request1"
+        ) == (3, "dup_num")
+
+
+def test_tabs_synced_apart(tmp_path):
+    """Test syncing a tab leaves other tabs' rows alone and queries see one tab."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'mirror.db'}")
+    Base.metadata.create_all(engine)
+    other_values = [
+        VALUES[0],
+        ["request1", "other_tab_num"],
+        ["request9", "num", "Done"],
+    ]
+    tracking_mirror.apply_snapshot(
+        engine, SHEET_ID, TAB, TrackingData.from_values(VALUES, 2)
+    )
+    report = tracking_mirror.apply_snapshot(
+        engine, SHEET_ID, "other", TrackingData.from_values(other_values, 2)
+    )
+    assert (report.inserted, report.deleted) == (2, 0)
+
+    with Session(engine) as session:
+        assert (
+            session.scalar(select(func.count()).where(TrackingRows.tab_name == TAB))
+            == 8
+        )
+        assert tracking_mirror.next_unused_row_sn(
+            session, SHEET_ID, TAB, "request1"
+        ) == (4, "just_entered")
+        assert tracking_mirror.next_unused_row_sn(
+            session, SHEET_ID, "other", "request1"
+        ) == (2, "other_tab_num")
+        assert tracking_mirror.request_complete(session, SHEET_ID, "other", "request9")
+        assert tracking_mirror.open_requests(session, SHEET_ID, "other") == ["request1"]
+        with pytest.raises(ValueError):
+            tracking_mirror.find_row(session, SHEET_ID, "other", "request1", "some_num")
@@ -0,0 +1,302 @@
+"""Mirror of tracking tabs in the ``tracking_rows`` table.
+
+``sync_tracking_sheet`` reads a tab, diffs it row by row against the tab's rows in the
+mirror and applies only the inserted, updated and deleted rows in one transaction. The
+completion and next-row queries of ``TrackingSheet`` can then run as indexed SQL against
+the mirror, without the Sheets API, and join with the rest of the database. Each tab is
+mirrored, synced and queried on its own, by spreadsheet id and tab name.
+
+The mirror keeps each row's status and the two flags the queries need, computed with the
+sheet's own rules: a row is incomplete if it has a cell SN but no status, or a
+whitespace-only status, and leased if its status is a worker's lease. Rows without a
+cell SN cannot be keyed and are not mirrored. Rows repeating a (request UUID, cell SN)
+pair are mirrored too, numbered by their occurrence, so completion and next-row queries
+count them like ``TrackingData``; ``find_row`` refuses repeated pairs like
+``TrackingSheet.find_row``, and the sync report lists them.
+"""
+import time
+from dataclasses import dataclass, field
+
+from sqlalchemy import (
+    ColumnElement,
+    Engine,
+    and_,
+    delete,
+    exists,
+    insert,
+    select,
+    text,
+    tuple_,
+    update,
+)
+from sqlalchemy.orm import Session
+
+from src.db.bulk import chunked
+from src.db.models import TrackingRows
+from src.sheets_interface.sheets import TrackingSheet
+from src.sheets_interface.tracking_data import (
+    LEASE_PREFIX,
+    TrackingData,
+    row_incomplete,
+)
+
+# Keys per DELETE statement.
+DELETE_BATCH_SIZE = 1_000
+MIRRORED_COLUMNS = ("row_number", "status", "incomplete", "leased")
+
+# Request UUID, cell SN and occurrence of the pair in the tab, counting from 0.
+MirrorKey = tuple[str, str, int]
+MirrorRow = tuple[int, None | str, bool, bool]
+
+
+@dataclass
+class SyncReport:
+    """Outcome of a sync.
+
+    Attributes
+    ----------
+    inserted
+        Rows added to the mirror.
+    updated
+        Rows whose row number or status changed.
+    deleted
+        Rows removed from the tab.
+    unchanged
+        Rows already up to date.
+    duplicates
+        The (request UUID, cell SN) pairs repeated in the tab.
+    seconds
+        Wall time of the sync, including reading the tab.
+    """
+
+    inserted: int = 0
+    updated: int = 0
+    deleted: int = 0
+    unchanged: int = 0
+    duplicates: list[tuple[str, str]] = field(default_factory=list)
+    seconds: float = 0.0
+
+
+def mirror_rows(tracking_data: TrackingData) -> dict[MirrorKey, MirrorRow]:
+    """Compute the mirrored values of each row of a tab.
+
+    Returns
+    -------
+        dict[MirrorKey, MirrorRow]: The row number, status, incomplete and leased flags
+        of each key
+    """
+    rows = {}
+    for key, first_row in tracking_data.row_by_key.items():
+        for occurrence, row in enumerate(
+            tracking_data.duplicate_keys.get(key, [first_row])
+        ):
+            row_data = tracking_data.row_data(row)
+            status = row_data.get("Completed")
+            leased = status is not None and status.startswith(LEASE_PREFIX)
+            rows[(*key, occurrence)] = (
+                row,
+                status,
+                row_incomplete(row_data, tracking_data.num_columns),
+                leased,
+            )
+    return rows
+
+
+def diff_rows(
+    current: dict[MirrorKey, MirrorRow], desired: dict[MirrorKey, MirrorRow]
+) -> tuple[list[MirrorKey], list[MirrorKey], list[MirrorKey]]:
+    """Compare the mirror with the tab.
+
+    Returns
+    -------
+        tuple[list, list, list]: The keys to insert, update and delete
+    """
+    inserts = [key for key in desired if key not in current]
+    updates = [
+        key
+        for key, values in desired.items()
+        if key in current and current[key] != values
+    ]
+    deletes = [key for key in current if key not in desired]
+    return inserts, updates, deletes
+
+
+def _in_tab(sheet_id: str, tab_name: str) -> ColumnElement[bool]:
+    """Restrict the mirror to the rows of a tab."""
+    return and_(TrackingRows.sheet_id == sheet_id, TrackingRows.tab_name == tab_name)
+
+
+def _values(sheet_id: str, tab_name: str, key: MirrorKey, row: MirrorRow) -> dict:
+    """Build the column values of a mirrored row."""
+    request_uuid, cell_sn, occurrence = key
+    return {
+        "sheet_id": sheet_id,
+        "tab_name": tab_name,
+        "request_uuid": request_uuid,
+        "cell_sn": cell_sn,
+        "occurrence": occurrence,
+        **dict(zip(MIRRORED_COLUMNS, row)),
+    }
+
+
+def apply_snapshot(
+    engine: Engine, sheet_id: str, tab_name: str, tracking_data: TrackingData
+) -> SyncReport:
+    """Bring the mirror of a tab in line with its tracking data, in one transaction.
+
+    Returns
+    -------
+        SyncReport: The rows changed
+    """
+    desired = mirror_rows(tracking_data)
+    report = SyncReport(duplicates=list(tracking_data.duplicate_keys))
+    with Session(engine) as session, session.begin():
+        if engine.dialect.name == "postgresql":
+            # Serialise concurrent syncs of the tab, which would otherwise race to
+            # insert the same rows.
+            session.execute(
+                text(
+                    "SELECT pg_advisory_xact_lock("
+                    "hashtext('tracking_rows'), hashtext(:tab))"
+                ),
+                {"tab": f"{sheet_id}!{tab_name}"},
+            )
+        columns = [TrackingRows.__table__.c[column] for column in MIRRORED_COLUMNS]
+        query = select(
+            TrackingRows.request_uuid,
+            TrackingRows.cell_sn,
+            TrackingRows.occurrence,
+            *columns,
+        ).where(_in_tab(sheet_id, tab_name))
+        current = {tuple(row[:3]): tuple(row[3:]) for row in session.execute(query)}
+
+        inserts, updates, deletes = diff_rows(current, desired)
+        if inserts:
+            rows = [_values(sheet_id, tab_name, key, desired[key]) for key in inserts]
+            session.execute(insert(TrackingRows), rows)
+        if updates:
+            # ORM bulk UPDATE by primary key, one executemany.
+            rows = [_values(sheet_id, tab_name, key, desired[key]) for key in updates]
+            session.execute(update(TrackingRows), rows)
+        key = tuple_(
+            TrackingRows.request_uuid, TrackingRows.cell_sn, TrackingRows.occurrence
+        )
+        for batch in chunked(deletes, DELETE_BATCH_SIZE):
+            session.execute(
+                delete(TrackingRows).where(_in_tab(sheet_id, tab_name), key.in_(batch))
+            )
+
+    report.inserted, report.updated, report.deleted = (
+        len(inserts),
+        len(updates),
+        len(deletes),
+    )
+    report.unchanged = len(desired) - report.inserted - report.updated
+    return report
+
+
+def sync_tracking_sheet(engine: Engine, sheet: TrackingSheet) -> SyncReport:
+    """Read a tracking tab and apply its changes to the mirror.
+
+    Raises ``ConnectionError`` if the tab cannot be read.
+
+    Returns
+    -------
+        SyncReport: The rows changed
+    """
+    start = time.perf_counter()
+    report = apply_snapshot(
+        engine,
+        sheet.sheet_id,
+        sheet.tab_name,
+        sheet.get_tracking_snapshot(force_refresh=True),
+    )
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def find_row(
+    session: Session, sheet_id: str, tab_name: str, request_uuid: str, cell_sn: str
+) -> int:
+    """Find the sheet row number of a request UUID and cell SN in the mirror of a tab.
+
+    Raises ``ValueError`` if the pair is not found or found multiple times.
+
+    Returns
+    -------
+        int: The row number
+    """
+    query = select(TrackingRows.row_number).where(
+        _in_tab(sheet_id, tab_name),
+        TrackingRows.request_uuid == request_uuid,
+        TrackingRows.cell_sn == cell_sn,
+    )
+    rows = session.scalars(query.limit(2)).all()
+    if not rows:
+        msg = f"Request UUID {request_uuid} and Cell SN {cell_sn} not found."
+        raise ValueError(msg)
+    if len(rows) > 1:
+        msg = f"Request UUID {request_uuid} and Cell SN {cell_sn} found multiple times."
+        raise ValueError(msg)
+    return rows[0]
+
+
+def request_complete(
+    session: Session, sheet_id: str, tab_name: str, request_uuid: str
+) -> bool:
+    """Determine if a request of a tab is done.
+
+    It is done when it has no rows without a status and no leased rows.
+
+    Returns
+    -------
+        bool: True if the request is done
+    """
+    open_rows = exists().where(
+        _in_tab(sheet_id, tab_name),
+        TrackingRows.request_uuid == request_uuid,
+        TrackingRows.incomplete | TrackingRows.leased,
+    )
+    return not session.scalar(select(open_rows))
+
+
+def next_unused_row_sn(
+    session: Session, sheet_id: str, tab_name: str, request_uuid: str
+) -> tuple[int, str]:
+    """Find the first row of a request of a tab without a status.
+
+    Returns
+    -------
+        tuple[int, str]: The row number and the cell SN
+    """
+    row = session.execute(
+        select(TrackingRows.row_number, TrackingRows.cell_sn)
+        .where(
+            _in_tab(sheet_id, tab_name),
+            TrackingRows.request_uuid == request_uuid,
+            TrackingRows.incomplete,
+        )
+        .order_by(TrackingRows.row_number)
+        .limit(1)
+    ).first()
+    if row is None:
+        msg = f"Request UUID {request_uuid} not found."
+        raise ValueError(msg)
+    return row.row_number, row.cell_sn
+
+
+def open_requests(session: Session, sheet_id: str, tab_name: str) -> list[str]:
+    """List the request UUIDs of a tab that are not done.
+
+    Returns
+    -------
+        list[str]: The request UUIDs, in order
+    """
+    query = (
+        select(TrackingRows.request_uuid)
+        .where(
+            _in_tab(sheet_id, tab_name), TrackingRows.incomplete | TrackingRows.leased
+        )
+        .distinct()
+    )
+    return list(session.scalars(query.order_by(TrackingRows.request_uuid)))
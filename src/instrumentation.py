@@ -0,0 +1,670 @@
+"""Timing of database queries and Sheets API calls, exported as Prometheus text or JSON.
+
+Database queries are timed by cursor event hooks that ``src.db.connector.build_engine``
+attaches to every engine (set ``DB_INSTRUMENT=0`` to leave them out). They keep a
+latency histogram per kind of statement, totals per normalized statement, a log of the
+queries slower than ``DB_SLOW_QUERY_MS`` and a count of N+1 patterns: the same
+``SELECT`` sent ``N_PLUS_ONE_THRESHOLD`` times or more in one transaction, typically
+lazy loads in a loop.
+
+``TrackingSheet`` and ``AsyncTrackingSheet`` operations are wrapped with
+``instrumented``, which keeps a latency histogram per operation and the API calls and
+bytes they caused, while every call of the API is recorded per API method.
+
+``export_prometheus`` and ``export_json`` render the metrics of the process, and
+``write_metrics`` writes them to a file, e.g. for the textfile collector of the
+Prometheus node exporter.
+"""
+
+import functools
+import inspect
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+from collections import deque
+from collections.abc import Callable
+from contextvars import ContextVar
+from pathlib import Path
+
+from sqlalchemy import Engine
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the latency buckets in seconds, as in the Prometheus client libraries.
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SLOW_QUERY_SECONDS = 0.5
+N_PLUS_ONE_THRESHOLD = 5
+# Normalized statements tracked individually; further ones are only counted in their
+# kind's histogram.
+MAX_STATEMENTS = 500
+SLOW_QUERY_LOG_SIZE = 100
+
+STRING_PATTERN = re.compile(r"'(?:[^']|'')*'")
+NUMBER_PATTERN = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+PLACEHOLDER_PATTERN = re.compile(r"%\(\w+\)s|%s|(?<!:):\w+|\$\d+|\?")
+LIST_PATTERN = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+SPACE_PATTERN = re.compile(r"\s+")
+
+
+@functools.lru_cache(maxsize=2048)
+def normalize_sql(statement: str) -> str:
+    """Reduce a statement to its shape, grouping statements that differ only in values.
+
+    Literals and bound parameters of any paramstyle become ``?``, lists of them become
+    ``(?)`` and whitespace is collapsed. Statements compiled by SQLAlchemy repeat, so
+    the result is cached.
+
+    Parameters
+    ----------
+    statement
+        The SQL statement.
+
+    Returns
+    -------
+    str
+        The normalized statement.
+    """
+    statement = STRING_PATTERN.sub("?", statement)
+    statement = PLACEHOLDER_PATTERN.sub("?", statement)
+    statement = NUMBER_PATTERN.sub("?", statement)
+    statement = LIST_PATTERN.sub("(?)", statement)
+    return SPACE_PATTERN.sub(" ", statement).strip()
+
+
+def statement_kind(statement: str) -> str:
+    """Return the first keyword of a statement, e.g. ``SELECT``."""
+    return (
+        statement.lstrip("( \n\t").split(None, 1)[0].upper()
+        if statement.strip()
+        else "EMPTY"
+    )
+
+
+class Histogram:
+    """Cumulative latency histogram with fixed buckets.
+
+    Not thread-safe, callers hold their metrics' lock.
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """Record a value.
+
+        Parameters
+        ----------
+        value
+            The latency in seconds.
+        """
+        self.count += 1
+        self.sum += value
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+
+    def snapshot(self) -> dict:
+        """Return the histogram as a dict.
+
+        Bucket counts are cumulative and keyed by upper bound.
+        """
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        buckets["+Inf"] = self.count
+        return {"count": self.count, "sum": self.sum, "buckets": buckets}
+
+
+class QueryMetrics:
+    """Latency of database queries, slow queries and N+1 patterns.
+
+    Recorded by ``instrument_engine``.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget everything recorded."""
+        with self._lock:
+            self.latency: dict[str, Histogram] = {}
+            self.statements: dict[str, dict[str, float]] = {}
+            self.errors = 0
+            self.slow_queries: deque[dict] = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+            self.slow_query_count = 0
+            self.n_plus_one: Counter[str] = Counter()
+
+    def record(
+        self, statement: str, seconds: float, slow_query_seconds: None | float
+    ) -> None:
+        """Record a query.
+
+        Parameters
+        ----------
+        statement
+            The normalized statement.
+        seconds
+            Its latency.
+        slow_query_seconds
+            The latency from which the query is logged as slow. ``None`` to never log.
+        """
+        kind = statement_kind(statement)
+        with self._lock:
+            histogram = self.latency.get(kind)
+            if histogram is None:
+                histogram = self.latency[kind] = Histogram()
+            histogram.observe(seconds)
+            totals = self.statements.get(statement)
+            if totals is None and len(self.statements) < MAX_STATEMENTS:
+                totals = self.statements[statement] = {
+                    "calls": 0,
+                    "seconds": 0.0,
+                    "max_seconds": 0.0,
+                }
+            if totals is not None:
+                totals["calls"] += 1
+                totals["seconds"] += seconds
+                totals["max_seconds"] = max(totals["max_seconds"], seconds)
+            slow = slow_query_seconds is not None and seconds >= slow_query_seconds
+            if slow:
+                self.slow_query_count += 1
+                self.slow_queries.append(
+                    {"statement": statement, "seconds": seconds, "time": time.time()}
+                )
+        if slow:
+            logger.warning("Slow query (%.3fs): %s", seconds, statement)
+
+    def record_error(self) -> None:
+        """Record a query that failed."""
+        with self._lock:
+            self.errors += 1
+
+    def record_n_plus_one(self, statement: str, count: int) -> None:
+        """Record a statement repeated ``count`` times in one transaction."""
+        with self._lock:
+            self.n_plus_one[statement] += 1
+        logger.warning(
+            "Possible N+1 queries, %d times in one transaction: %s", count, statement
+        )
+
+    def snapshot(self) -> dict:
+        """Return the metrics as a dict."""
+        with self._lock:
+            return {
+                "latency": {
+                    kind: histogram.snapshot()
+                    for kind, histogram in self.latency.items()
+                },
+                "statements": {
+                    statement: dict(totals)
+                    for statement, totals in self.statements.items()
+                },
+                "errors": self.errors,
+                "slow_queries": {
+                    "count": self.slow_query_count,
+                    "recent": list(self.slow_queries),
+                },
+                "n_plus_one": dict(self.n_plus_one),
+            }
+
+
+class OperationStats:
+    """Latency of an operation and the API calls and bytes it caused.
+
+    Not thread-safe, see ``ApiMetrics``.
+    """
+
+    def __init__(self) -> None:
+        self.latency = Histogram()
+        self.errors = 0
+        self.api_calls = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def snapshot(self) -> dict:
+        """Return the stats as a dict."""
+        return {
+            "latency": self.latency.snapshot(),
+            "errors": self.errors,
+            "api_calls": self.api_calls,
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+        }
+
+
+class ApiMetrics:
+    """Latency, calls and bytes of Sheets operations and of the API calls they make."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget everything recorded."""
+        with self._lock:
+            self.operations: dict[str, OperationStats] = {}
+            self.api: dict[str, OperationStats] = {}
+
+    @staticmethod
+    def _stats(table: dict[str, OperationStats], name: str) -> OperationStats:
+        stats = table.get(name)
+        if stats is None:
+            stats = table[name] = OperationStats()
+        return stats
+
+    def record_operation(self, name: str, seconds: float, error: bool) -> None:
+        """Record a call of an operation.
+
+        Parameters
+        ----------
+        name
+            The operation, e.g. ``TrackingSheet.find_row``.
+        seconds
+            Its latency.
+        error
+            Whether it raised.
+        """
+        with self._lock:
+            stats = self._stats(self.operations, name)
+            stats.latency.observe(seconds)
+            stats.errors += error
+
+    def record_api_call(
+        self,
+        method: str,
+        seconds: float,
+        bytes_sent: int,
+        bytes_received: int,
+        error: bool,
+        operations: tuple[str, ...],
+    ) -> None:
+        """Record an API call under its method and each operation it was made for.
+
+        Parameters
+        ----------
+        method
+            The API method, e.g. ``values.get``.
+        seconds
+            The latency of the call.
+        bytes_sent
+            The size of the request body.
+        bytes_received
+            The size of the response body.
+        error
+            Whether the call failed.
+        operations
+            The operations running, outermost first.
+        """
+        with self._lock:
+            method_stats = self._stats(self.api, method)
+            method_stats.latency.observe(seconds)
+            method_stats.errors += error
+            for stats in [
+                method_stats,
+                *(self._stats(self.operations, name) for name in operations),
+            ]:
+                stats.api_calls += 1
+                stats.bytes_sent += bytes_sent
+                stats.bytes_received += bytes_received
+
+    def snapshot(self) -> dict:
+        """Return the metrics as a dict."""
+        with self._lock:
+            return {
+                "operations": {
+                    name: stats.snapshot() for name, stats in self.operations.items()
+                },
+                "api": {method: stats.snapshot() for method, stats in self.api.items()},
+            }
+
+
+QUERY_METRICS = QueryMetrics()
+SHEETS_METRICS = ApiMetrics()
+
+_START_KEY = "instrumentation_start"
+_STATEMENTS_KEY = "instrumentation_statements"
+_operations: ContextVar[tuple[str, ...]] = ContextVar(
+    "instrumented_operations", default=()
+)
+
+
+def instrument_engine(
+    engine: Engine,
+    metrics: QueryMetrics = QUERY_METRICS,
+    slow_query_seconds: None | float = SLOW_QUERY_SECONDS,
+    n_plus_one_threshold: int = N_PLUS_ONE_THRESHOLD,
+) -> Engine:
+    """Record the queries of an engine.
+
+    Instrument an engine once, or its queries are recorded twice.
+
+    Parameters
+    ----------
+    engine
+        The engine, or the ``sync_engine`` of an async engine.
+    metrics
+        Where to record the queries.
+    slow_query_seconds
+        The latency from which a query is logged as slow. ``None`` to never log.
+    n_plus_one_threshold
+        Times the same ``SELECT`` may run in one transaction before it is reported as
+        N+1.
+
+    Returns
+    -------
+    Engine
+        The engine.
+    """
+
+    @event.listens_for(engine, "begin")
+    def begin(connection) -> None:
+        connection.info.pop(_STATEMENTS_KEY, None)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(
+        connection, cursor, statement, parameters, context, executemany
+    ) -> None:
+        connection.info.setdefault(_START_KEY, []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(
+        connection, cursor, statement, parameters, context, executemany
+    ) -> None:
+        seconds = time.perf_counter() - connection.info[_START_KEY].pop()
+        normalized = normalize_sql(statement)
+        metrics.record(normalized, seconds, slow_query_seconds)
+        if normalized.startswith("SELECT"):
+            counts = connection.info.setdefault(_STATEMENTS_KEY, Counter())
+            counts[normalized] += 1
+            if counts[normalized] == n_plus_one_threshold:
+                metrics.record_n_plus_one(normalized, n_plus_one_threshold)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context) -> None:
+        starts = (
+            context.connection.info.get(_START_KEY)
+            if context.connection is not None
+            else None
+        )
+        if starts:
+            starts.pop()
+            metrics.record_error()
+
+    return engine
+
+
+def current_operations() -> tuple[str, ...]:
+    """Return the instrumented operations running in the current thread or task.
+
+    The outermost comes first.
+    """
+    return _operations.get()
+
+
+def instrumented(
+    name: None | str = None, metrics: ApiMetrics = SHEETS_METRICS
+) -> Callable:
+    """Decorate a function or coroutine function to record its latency and API calls.
+
+    Parameters
+    ----------
+    name
+        The name of the operation. Defaults to the qualified name of the function.
+    metrics
+        Where to record the operation.
+
+    Returns
+    -------
+    Callable
+        The decorator.
+    """
+
+    def decorate(function: Callable) -> Callable:
+        operation = name or function.__qualname__
+
+        if inspect.iscoroutinefunction(function):
+
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                token = _operations.set((*_operations.get(), operation))
+                start = time.perf_counter()
+                error = True
+                try:
+                    result = await function(*args, **kwargs)
+                    error = False
+                    return result
+                finally:
+                    metrics.record_operation(
+                        operation, time.perf_counter() - start, error
+                    )
+                    _operations.reset(token)
+
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            token = _operations.set((*_operations.get(), operation))
+            start = time.perf_counter()
+            error = True
+            try:
+                result = function(*args, **kwargs)
+                error = False
+                return result
+            finally:
+                metrics.record_operation(operation, time.perf_counter() - start, error)
+                _operations.reset(token)
+
+        return wrapper
+
+    return decorate
+
+
+def record_api_call(
+    method: str,
+    seconds: float,
+    bytes_sent: int,
+    bytes_received: int,
+    error: bool = False,
+    metrics: ApiMetrics = SHEETS_METRICS,
+) -> None:
+    """Record an API call under its method and the instrumented operations running.
+
+    Parameters
+    ----------
+    method
+        The API method, e.g. ``values.get``.
+    seconds
+        The latency of the call.
+    bytes_sent
+        The size of the request body.
+    bytes_received
+        The size of the response body.
+    error
+        Whether the call failed.
+    metrics
+        Where to record the call.
+    """
+    metrics.record_api_call(
+        method, seconds, bytes_sent, bytes_received, error, _operations.get()
+    )
+
+
+def snapshot(
+    query_metrics: QueryMetrics = QUERY_METRICS,
+    api_metrics: ApiMetrics = SHEETS_METRICS,
+) -> dict:
+    """Return the database and Sheets metrics as a dict.
+
+    Returns
+    -------
+    dict
+        The metrics under ``db`` and ``sheets``.
+    """
+    return {"db": query_metrics.snapshot(), "sheets": api_metrics.snapshot()}
+
+
+def _labels(**labels: str) -> str:
+    """Format Prometheus labels, escaping their values."""
+    pairs = []
+    for key, value in labels.items():
+        value = value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{key}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _family(metric: str, kind: str, description: str, samples: list[str]) -> list[str]:
+    """Format a metric family, its help and type lines followed by its samples."""
+    return [f"# HELP {metric} {description}", f"# TYPE {metric} {kind}", *samples]
+
+
+def _histogram(
+    metric: str, description: str, label: str, histograms: dict[str, dict]
+) -> list[str]:
+    """Format histogram snapshots as a Prometheus histogram.
+
+    The snapshots are keyed by the value of one label.
+    """
+    samples = []
+    for value, histogram in histograms.items():
+        for bound, count in histogram["buckets"].items():
+            samples.append(
+                f"{metric}_bucket{_labels(**{label: value, 'le': bound})} {count}"
+            )
+        samples.append(f"{metric}_sum{_labels(**{label: value})} {histogram['sum']}")
+        samples.append(
+            f"{metric}_count{_labels(**{label: value})} {histogram['count']}"
+        )
+    return _family(metric, "histogram", description, samples)
+
+
+def _counter(
+    metric: str, description: str, label: None | str, values: float | dict[str, float]
+) -> list[str]:
+    """Format a Prometheus counter.
+
+    Either one value, or values keyed by the value of one label.
+    """
+    if label is None:
+        return _family(metric, "counter", description, [f"{metric} {values}"])
+    samples = [
+        f"{metric}{_labels(**{label: key})} {value}" for key, value in values.items()
+    ]
+    return _family(metric, "counter", description, samples)
+
+
+def export_prometheus(metrics: None | dict = None) -> str:
+    """Render metrics in the Prometheus text exposition format.
+
+    Per statement totals, the slow query log and the N+1 statements are only in the JSON
+    export, to keep SQL out of the labels; Prometheus gets their counts.
+
+    Parameters
+    ----------
+    metrics
+        A ``snapshot``. Defaults to the metrics of the process.
+
+    Returns
+    -------
+    str
+        The metrics.
+    """
+    metrics = metrics or snapshot()
+    db, sheets = metrics["db"], metrics["sheets"]
+    lines = [
+        *_histogram(
+            "db_query_duration_seconds",
+            "Latency of database queries by kind.",
+            "kind",
+            db["latency"],
+        ),
+        *_counter(
+            "db_query_errors_total", "Database queries that failed.", None, db["errors"]
+        ),
+        *_counter(
+            "db_slow_queries_total",
+            "Queries slower than the slow query threshold.",
+            None,
+            db["slow_queries"]["count"],
+        ),
+        *_counter(
+            "db_n_plus_one_total",
+            "Transactions repeating a SELECT up to the N+1 threshold.",
+            None,
+            sum(db["n_plus_one"].values()),
+        ),
+    ]
+    tables = (
+        (
+            "sheets_operation",
+            "operation",
+            "operations",
+            ("errors", "api_calls", "bytes_sent", "bytes_received"),
+        ),
+        ("sheets_api", "method", "api", ("errors", "bytes_sent", "bytes_received")),
+    )
+    for prefix, label, table, fields in tables:
+        stats = sheets[table]
+        latency = {key: value["latency"] for key, value in stats.items()}
+        lines += _histogram(
+            f"{prefix}_duration_seconds",
+            f"Latency of Sheets {table} by {label}.",
+            label,
+            latency,
+        )
+        for field in fields:
+            values = {key: value[field] for key, value in stats.items()}
+            description = (
+                f"{field.replace('_', ' ').capitalize()} of Sheets {table} by {label}."
+            )
+            lines += _counter(f"{prefix}_{field}_total", description, label, values)
+    return "\n".join(lines) + "\n"
+
+
+def export_json(metrics: None | dict = None) -> str:
+    """Render metrics as JSON.
+
+    Parameters
+    ----------
+    metrics
+        A ``snapshot``. Defaults to the metrics of the process.
+
+    Returns
+    -------
+    str
+        The metrics.
+    """
+    return json.dumps(metrics or snapshot(), indent=2)
+
+
+def write_metrics(path: str | Path, fmt: str = "prometheus") -> None:
+    """Write the metrics of the process to a file atomically.
+
+    A scraper never reads half of it.
+
+    Parameters
+    ----------
+    path
+        The file to write.
+    fmt
+        ``prometheus`` or ``json``.
+    """
+    exporters = {"prometheus": export_prometheus, "json": export_json}
+    if fmt not in exporters:
+        msg = f"Unknown metrics format {fmt}."
+        raise ValueError(msg)
+    path = Path(path)
+    temporary = path.with_name(f".{path.name}.{os.getpid()}")
+    temporary.write_text(exporters[fmt]())
+    temporary.replace(path)
@@ -0,0 +1,353 @@
+"""Asyncio counterpart of the tracking sheet.
+
+It polls many sheets and tabs concurrently.
+"""
+
+import asyncio
+import time
+from collections.abc import Iterable
+from urllib.parse import quote
+
+import httpx
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+
+from src.instrumentation import instrumented
+from src.instrumentation import record_api_call
+from src.sheets_interface.sheets import HTTP_TIMEOUT
+from src.sheets_interface.sheets import REQUEST_AND_SN_COLUMNS
+from src.sheets_interface.sheets import batch_update_bodies
+from src.sheets_interface.tracking_data import TrackingData
+
+SHEETS_API_URL = "https://sheets.googleapis.com/v4/spreadsheets"
+# Requests in flight at once per limiter.
+DEFAULT_CONCURRENCY = 10
+# Sheets API method of each HTTP method, as recorded by src.instrumentation.
+API_METHODS = {
+    "GET": "values.get",
+    "PUT": "values.update",
+    "POST": "values.batchUpdate",
+}
+
+
+class AsyncTrackingSheet:
+    """Class for tracking the scan from asyncio code.
+
+    Requests go through a shared ``httpx.AsyncClient`` and are limited by a semaphore,
+    which can be shared between sheets so a sweep over many sheets never has more than a
+    fixed number of requests in flight.
+    """
+
+    def __init__(
+        self,
+        sheet_id: str,
+        tab_name: str,
+        cell_range: str = "A1:C",
+        creds: None | Credentials = None,
+        client: None | httpx.AsyncClient = None,
+        limiter: None | asyncio.Semaphore = None,
+        base_url: str = SHEETS_API_URL,
+    ) -> None:
+        """Set up the tracking sheet.
+
+        Parameters
+        ----------
+        sheet_id
+            The spreadsheet ID.
+        tab_name
+            The name of the tab holding the tracking data.
+        cell_range
+            The A1 range of the tracking data, including the header row.
+        creds
+            The credentials, e.g. from ``TrackingSheet.login``.
+        client
+            The HTTP client. A client owned by the sheet is created if not given.
+        limiter
+            The semaphore limiting concurrent requests. One allowing
+            ``DEFAULT_CONCURRENCY`` requests is created if not given.
+        base_url
+            The URL of the spreadsheets collection of the Sheets API.
+        """
+        self.sheet_id = sheet_id
+        self.tab_name = tab_name
+        self.cell_range = cell_range
+        self.creds = creds
+        self.num_columns = REQUEST_AND_SN_COLUMNS
+        self._owns_client = client is None
+        self.client = client or httpx.AsyncClient(timeout=HTTP_TIMEOUT)
+        self.base_url = base_url
+        self.limiter = limiter or asyncio.Semaphore(DEFAULT_CONCURRENCY)
+
+    async def __aenter__(self) -> "AsyncTrackingSheet":
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Close the HTTP client if the sheet created it."""
+        if self._owns_client:
+            await self.client.aclose()
+
+    async def _request(self, method: str, path: str, **kwargs) -> dict:
+        """Send a request to the Sheets API.
+
+        Parameters
+        ----------
+        method
+            The HTTP method.
+        path
+            The path below the spreadsheet, e.g. ``/values/unit-testing!A1:C``.
+        **kwargs
+            Passed to ``httpx.AsyncClient.request``.
+
+        Raises
+        ------
+        ConnectionError
+            If the connection to the Google Sheet fails.
+
+        Returns
+        -------
+        dict
+            The decoded response.
+        """
+        headers = {}
+        if self.creds is not None:
+            if not self.creds.valid:
+                # Refreshing blocks on its own HTTP request, so keep it off the event
+                # loop.
+                await asyncio.to_thread(self.creds.refresh, Request())
+            headers["Authorization"] = f"Bearer {self.creds.token}"
+
+        async with self.limiter:
+            response = None
+            start = time.perf_counter()
+            try:
+                response = await self.client.request(
+                    method,
+                    f"{self.base_url}/{self.sheet_id}{path}",
+                    headers=headers,
+                    **kwargs,
+                )
+                response.raise_for_status()
+            except httpx.HTTPError as err:
+                raise ConnectionError from err
+            finally:
+                record_api_call(
+                    API_METHODS.get(method, method),
+                    time.perf_counter() - start,
+                    len(response.request.content) if response is not None else 0,
+                    len(response.content) if response is not None else 0,
+                    response is None or response.is_error,
+                )
+        return response.json()
+
+    @instrumented()
+    async def get_tracking_snapshot(self) -> TrackingData:
+        """Get the indexed tracking data.
+
+        Raises
+        ------
+        ConnectionError
+            If the connection to the Google Sheet fails.
+        ValueError
+            If the range holds no data.
+
+        Returns
+        -------
+        TrackingData
+            The tracking data with its indexes.
+        """
+        sheet_range = quote(f"{self.tab_name}!{self.cell_range}", safe="")
+        result = await self._request("GET", f"/values/{sheet_range}")
+        values = result.get("values", [])
+        if not values:
+            msg = "No data found."
+            raise ValueError(msg)
+        return TrackingData.from_values(values, self.num_columns)
+
+    @instrumented()
+    async def get_tracking_data(self) -> tuple[list[str], list[dict[str, str]]]:
+        """Get values from tracking sheet.
+
+        Raises
+        ------
+        ConnectionError
+            If the connection to the Google Sheet fails.
+
+        Returns
+        -------
+        list[str]
+            column_names
+                The column names of the cells. First row of the sheet.
+        list[dict[str, str]]
+            column_data
+                The values of the cells. Remaining rows of the sheet.
+        """
+        tracking_data = await self.get_tracking_snapshot()
+        return tracking_data.column_names, tracking_data.rows
+
+    @instrumented()
+    async def put_single_value_by_address(
+        self, row: int, column: str, status: str
+    ) -> dict:
+        """Put the tracking status to the tracking sheet.
+
+        Parameters
+        ----------
+        row
+            The row number.
+        column
+            Column letter.
+        status
+            The tracking status.
+
+        Raises
+        ------
+        ConnectionError
+            If the connection to the Google Sheet fails.
+
+        Returns
+        -------
+        dict
+            The update response.
+        """
+        cell_address = quote(f"{self.tab_name}!{column}{row!s}", safe="")
+        body = {"values": [[status]], "majorDimension": "COLUMNS"}
+        return await self._request(
+            "PUT",
+            f"/values/{cell_address}",
+            params={"valueInputOption": "RAW"},
+            json=body,
+        )
+
+    @instrumented()
+    async def put_values_by_address(
+        self, updates: Iterable[tuple[int, str, str]]
+    ) -> dict[tuple[int, str], ConnectionError]:
+        """Put many tracking statuses to the sheet in as few requests as possible.
+
+        See ``TrackingSheet.put_values_by_address``. The batch requests are sent
+        concurrently.
+
+        Parameters
+        ----------
+        updates
+            The (row number, column letter, tracking status) of each cell.
+
+        Returns
+        -------
+        dict[tuple[int, str], ConnectionError]
+            The error of each cell that could not be written, keyed by (row, column).
+            Empty if all were written.
+        """
+        bodies = batch_update_bodies(self.tab_name, updates)
+        results = await asyncio.gather(
+            *(
+                self._request("POST", "/values:batchUpdate", json=body)
+                for body, _ in bodies
+            ),
+            return_exceptions=True,
+        )
+        failures: dict[tuple[int, str], ConnectionError] = {}
+        for (_, cells), result in zip(bodies, results):
+            if isinstance(result, ConnectionError):
+                failures.update(dict.fromkeys(cells, result))
+            elif isinstance(result, BaseException):
+                raise result
+        return failures
+
+    @instrumented()
+    async def find_row(self, request_uuid: str, cell_sn: str) -> int:
+        """Find the row number by the request UUID.
+
+        Parameters
+        ----------
+        request_uuid
+            The request UUID.
+        cell_sn
+            The cell SN.
+
+        Raises
+        ------
+        ValueError
+            If the request UUID and cell SN are not found or found multiple times.
+
+        Returns
+        -------
+        int
+            The row number.
+        """
+        tracking_data = await self.get_tracking_snapshot()
+        return tracking_data.find_row(request_uuid, cell_sn)
+
+    @instrumented()
+    async def request_complete(self, request_uuid: str) -> bool:
+        """Determine if the request is done.
+
+        Parameters
+        ----------
+        request_uuid
+            The request UUID.
+
+        Returns
+        -------
+        bool
+            True if the request is done.
+        """
+        tracking_data = await self.get_tracking_snapshot()
+        return tracking_data.request_complete(request_uuid)
+
+    @instrumented()
+    async def next_unused_row_sn(self, request_uuid: str) -> tuple[int, str]:
+        """Find the next row number.
+
+        Parameters
+        ----------
+        request_uuid
+            The request UUID.
+
+        Raises
+        ------
+        ValueError
+            If the request UUID is not found.
+
+        Returns
+        -------
+        tuple[int, str]
+            row, sn
+                The row number and the cell SN of the first row without a status.
+        """
+        tracking_data = await self.get_tracking_snapshot()
+        row_sn = tracking_data.first_incomplete_row(request_uuid)
+        if row_sn is None:
+            msg = f"Request UUID {request_uuid} not found."
+            raise ValueError(msg)
+        return row_sn
+
+
+async def gather_tracking_snapshots(
+    sheets: Iterable[AsyncTrackingSheet],
+) -> list[TrackingData | ConnectionError | ValueError]:
+    """Fetch the tracking data of many sheets concurrently.
+
+    Parameters
+    ----------
+    sheets
+        The sheets to fetch.
+
+    Returns
+    -------
+    list[TrackingData | ConnectionError | ValueError]
+        The tracking data of each sheet, or the error fetching it, in the order of
+        ``sheets``.
+    """
+    results = await asyncio.gather(
+        *(sheet.get_tracking_snapshot() for sheet in sheets), return_exceptions=True
+    )
+    for result in results:
+        if isinstance(result, BaseException) and not isinstance(
+            result, (ConnectionError, ValueError)
+        ):
+            raise result
+    return results
@@ -0,0 +1,303 @@
+"""Process-wide Google credentials, refreshed in the background before they expire."""
+
+import contextlib
+import logging
+import os
+import tempfile
+import threading
+from collections.abc import Iterator
+from datetime import datetime
+from datetime import timezone
+from pathlib import Path
+
+from google.auth.exceptions import GoogleAuthError
+from google.auth.exceptions import RefreshError
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process coordination.
+    fcntl = None
+
+# Seconds before expiry at which the token is refreshed.
+REFRESH_MARGIN = 300
+# Seconds to wait before retrying a failed background refresh, doubled after each
+# failure up to MAX_RETRY_DELAY.
+RETRY_DELAY = 30
+MAX_RETRY_DELAY = 3600
+
+logger = logging.getLogger(__name__)
+
+_providers: dict[Path, "CredentialProvider"] = {}
+_providers_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def file_lock(path: Path) -> Iterator[None]:
+    """Hold an exclusive lock on a file across processes.
+
+    Parameters
+    ----------
+    path
+        The lock file, created if needed.
+
+    Yields
+    ------
+    None
+        While the lock is held.
+    """
+    with path.open("a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def seconds_to_expiry(creds: Credentials) -> float:
+    """Get the seconds until credentials expire.
+
+    Parameters
+    ----------
+    creds
+        The credentials.
+
+    Returns
+    -------
+    float
+        The seconds until expiry, negative once expired, or infinity if they do not
+        expire.
+    """
+    if creds.expiry is None:
+        return float("inf")
+    # google-auth keeps the expiry as a naive UTC datetime.
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    return (creds.expiry - now).total_seconds()
+
+
+class CredentialProvider:
+    """Credentials loaded once from a token file and refreshed before they expire.
+
+    The same ``Credentials`` object is handed to every caller and refreshed in place, so
+    clients holding it pick up new tokens without rebuilding. Refreshes across processes
+    are serialised with a lock file next to the token file: the process taking the lock
+    first refreshes and saves the token, the others find the saved token fresh and adopt
+    it instead of refreshing again.
+    """
+
+    def __init__(
+        self,
+        token_path: Path,
+        scopes: list[str],
+        refresh_margin: float = REFRESH_MARGIN,
+    ) -> None:
+        """Set up the provider.
+
+        Parameters
+        ----------
+        token_path
+            The authorized user token file.
+        scopes
+            The OAuth scopes of the token.
+        refresh_margin
+            Seconds before expiry at which the token is refreshed.
+        """
+        self.token_path = Path(token_path)
+        self.lock_path = self.token_path.with_name(f"{self.token_path.name}.lock")
+        self.scopes = scopes
+        self.refresh_margin = refresh_margin
+        self.refreshes = 0
+        self.error: None | Exception = None
+        self._creds: None | Credentials = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: None | threading.Thread = None
+
+    def credentials(self) -> Credentials:
+        """Get the credentials, loading them and starting their refresh on first use.
+
+        Raises
+        ------
+        FileNotFoundError
+            If there is no token file.
+        RefreshError
+            If the token is expired and cannot be refreshed.
+
+        Returns
+        -------
+        Credentials
+            The shared credentials.
+        """
+        with self._lock:
+            if self._creds is None:
+                self._creds = Credentials.from_authorized_user_file(
+                    self.token_path, self.scopes
+                )
+            creds = self._creds
+        if seconds_to_expiry(creds) <= self.refresh_margin:
+            self.refresh()
+        self.start()
+        return creds
+
+    def refresh(self) -> None:
+        """Refresh the credentials, or adopt a newer token another process saved.
+
+        Raises
+        ------
+        RefreshError
+            If the token cannot be refreshed.
+        """
+        with self._lock, file_lock(self.lock_path):
+            creds = self._creds
+            if creds is None:
+                creds = self._creds = Credentials.from_authorized_user_file(
+                    self.token_path, self.scopes
+                )
+            saved = Credentials.from_authorized_user_file(self.token_path, self.scopes)
+            if seconds_to_expiry(saved) > self.refresh_margin:
+                self._adopt(creds, saved)
+                return
+
+            creds.refresh(Request())
+            self.refreshes += 1
+            self._save(creds)
+
+    def store(self, new_creds: Credentials) -> Credentials:
+        """Save credentials obtained outside the provider, e.g.
+
+        by an interactive login, and share them.
+
+        Parameters
+        ----------
+        new_creds
+            The new credentials.
+
+        Returns
+        -------
+        Credentials
+            The shared credentials, now holding the new token.
+        """
+        with self._lock, file_lock(self.lock_path):
+            self._save(new_creds)
+            if self._creds is None:
+                self._creds = new_creds
+            else:
+                self._adopt(self._creds, new_creds)
+            self.error = None
+            creds = self._creds
+        self.start()
+        return creds
+
+    @staticmethod
+    def _adopt(creds: Credentials, source: Credentials) -> None:
+        """Copy the token, expiry and refresh token of ``source``.
+
+        They go into the shared credentials.
+        """
+        creds.token = source.token
+        creds.expiry = source.expiry
+        # The refresh token may have been rotated; it has no public setter.
+        creds._refresh_token = source.refresh_token
+
+    def _save(self, creds: Credentials) -> None:
+        """Write credentials to the token file atomically.
+
+        Other processes never read a partial file.
+        """
+        with tempfile.NamedTemporaryFile(
+            "w", dir=self.token_path.parent, delete=False
+        ) as token:
+            token.write(creds.to_json())
+        os.replace(token.name, self.token_path)
+
+    def start(self) -> None:
+        """Start the background refresh thread if it is not running."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._refresh_loop, name="credential-refresh", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background refresh thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _refresh_loop(self) -> None:
+        """Refresh the credentials ``refresh_margin`` seconds before each expiry.
+
+        Runs until stopped.
+
+        Failed refreshes, e.g. network errors or a token file caught mid-write, are
+        retried with exponential backoff. A refresh the server rejects for good, e.g.
+        because the refresh token was revoked, stops the loop and is kept in ``error``;
+        ``store`` restarts it after a new login.
+        """
+        delay = 0.0
+        retry_delay = RETRY_DELAY
+        while not self._stop.wait(delay):
+            creds = self._creds
+            wait = (
+                float("inf")
+                if creds is None
+                else seconds_to_expiry(creds) - self.refresh_margin
+            )
+            if wait > 0:
+                delay = min(wait, 3600)
+                continue
+            try:
+                self.refresh()
+                self.error = None
+                delay = 0.0
+                retry_delay = RETRY_DELAY
+            # TransportError and other auth errors, and ValueError for a token file that
+            # cannot be parsed.
+            except (GoogleAuthError, OSError, ValueError) as err:
+                self.error = err
+                if isinstance(err, RefreshError) and not getattr(
+                    err, "retryable", False
+                ):
+                    logger.error(
+                        "Stopped refreshing %s, the token cannot be refreshed: %s",
+                        self.token_path,
+                        err,
+                    )
+                    return
+                logger.warning(
+                    "Refreshing %s failed, retrying in %ss: %s",
+                    self.token_path,
+                    retry_delay,
+                    err,
+                )
+                delay = retry_delay
+                retry_delay = min(retry_delay * 2, MAX_RETRY_DELAY)
+
+
+def get_credential_provider(token_path: Path, scopes: list[str]) -> CredentialProvider:
+    """Get the process-wide credential provider of a token file.
+
+    Parameters
+    ----------
+    token_path
+        The authorized user token file.
+    scopes
+        The OAuth scopes of the token.
+
+    Returns
+    -------
+    CredentialProvider
+        The provider, created on first use.
+    """
+    token_path = Path(token_path).resolve()
+    with _providers_lock:
+        provider = _providers.get(token_path)
+        if provider is None:
+            provider = _providers[token_path] = CredentialProvider(token_path, scopes)
+        return provider
@@ -0,0 +1,384 @@
+"""In-memory stand-in for the Sheets API v4 values endpoints.
+
+``FakeSheetsBackend`` keeps spreadsheets in memory and answers ``values.get``,
+``values.update`` and ``values.batchUpdate`` like the real API, with injectable latency,
+quota errors and failures. ``TrackingSheet`` uses it through ``FakeSheetsBackend.http``
+and ``AsyncTrackingSheet`` through ``FakeSheetsBackend.async_transport``::
+
+    backend = FakeSheetsBackend() backend.set_values("sheet", "unit-testing",
+    [["Request_UUID", "Cell_SN", "Completed"]]) sheet = TrackingSheet("sheet",
+    "unit-testing", http=backend.http())
+"""
+
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from collections import deque
+from urllib.parse import parse_qs
+from urllib.parse import unquote
+from urllib.parse import urlsplit
+
+import httplib2
+import httpx
+
+PATH_PATTERN = re.compile(
+    r"^/v4/spreadsheets/([^/]+)/values(?:/([^/]+)|:(batchUpdate))$"
+)
+RANGE_PATTERN = re.compile(r"^(?:'?(.+?)'?!)?([A-Z]*)(\d*)(?::([A-Z]*)(\d*))?$")
+
+
+def column_index(column: str) -> int:
+    """Convert a column letter to its 0-based index.
+
+    Parameters
+    ----------
+    column
+        The column letters, e.g. ``C`` or ``AA``.
+
+    Returns
+    -------
+    int
+        The index of the column.
+    """
+    index = 0
+    for letter in column:
+        index = index * 26 + ord(letter) - ord("A") + 1
+    return index - 1
+
+
+class FakeSheetsError(Exception):
+    """An error answered by the fake API, with its HTTP status."""
+
+    def __init__(self, status: int, message: str) -> None:
+        self.status = status
+        super().__init__(message)
+
+
+class FakeSheetsBackend:
+    """In-memory spreadsheets answering the Sheets API values endpoints.
+
+    Attributes
+    ----------
+    latency
+        Seconds each request waits before it is answered.
+    quota_per_minute
+        Requests allowed in any 60 second window before answering 429. ``None`` for no
+        quota.
+    failure_rate
+        Probability that a request fails with a 503.
+    calls
+        The number of requests answered, per endpoint (``get``, ``update``,
+        ``batchUpdate``).
+    bytes_sent
+        The size of the response bodies answered.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        quota_per_minute: None | int = None,
+        failure_rate: float = 0.0,
+        seed: int = 0,
+    ) -> None:
+        self.latency = latency
+        self.quota_per_minute = quota_per_minute
+        self.failure_rate = failure_rate
+        self.calls: Counter[str] = Counter()
+        self.bytes_sent = 0
+        self._tabs: dict[tuple[str, str], list[list[str]]] = {}
+        self._failures: deque[int] = deque()
+        self._request_times: deque[float] = deque()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def set_values(self, sheet_id: str, tab_name: str, values: list[list[str]]) -> None:
+        """Replace the values of a tab, creating it if needed.
+
+        Parameters
+        ----------
+        sheet_id
+            The spreadsheet ID.
+        tab_name
+            The name of the tab.
+        values
+            The rows of the tab, starting at ``A1``.
+        """
+        with self._lock:
+            self._tabs[(sheet_id, tab_name)] = [list(row) for row in values]
+
+    def values(self, sheet_id: str, tab_name: str) -> list[list[str]]:
+        """Get a copy of all values of a tab.
+
+        Parameters
+        ----------
+        sheet_id
+            The spreadsheet ID.
+        tab_name
+            The name of the tab.
+
+        Returns
+        -------
+        list[list[str]]
+            The rows of the tab, starting at ``A1``.
+        """
+        with self._lock:
+            return [list(row) for row in self._tabs[(sheet_id, tab_name)]]
+
+    def fail_next(self, count: int = 1, status: int = 500) -> None:
+        """Fail the next requests.
+
+        Parameters
+        ----------
+        count
+            The number of requests to fail.
+        status
+            The HTTP status to answer them with.
+        """
+        with self._lock:
+            self._failures.extend([status] * count)
+
+    def reset_counters(self) -> None:
+        """Reset ``calls`` and ``bytes_sent``."""
+        with self._lock:
+            self.calls.clear()
+            self.bytes_sent = 0
+
+    def http(self) -> "FakeSheetsHttp":
+        """Create an httplib2-compatible transport for ``TrackingSheet``.
+
+        Returns
+        -------
+        FakeSheetsHttp
+            The transport answering from this backend.
+        """
+        return FakeSheetsHttp(self)
+
+    def async_transport(self) -> httpx.MockTransport:
+        """Create an httpx transport for ``AsyncTrackingSheet``.
+
+        Returns
+        -------
+        httpx.MockTransport
+            The transport answering from this backend.
+        """
+
+        async def handle(request: httpx.Request) -> httpx.Response:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            status, content = self.handle(
+                request.method, str(request.url), request.content
+            )
+            return httpx.Response(
+                status, content=content, headers={"content-type": "application/json"}
+            )
+
+        return httpx.MockTransport(handle)
+
+    def handle(
+        self, method: str, uri: str, body: None | bytes | str
+    ) -> tuple[int, bytes]:
+        """Answer a request to the values endpoints, without the latency.
+
+        Parameters
+        ----------
+        method
+            The HTTP method.
+        uri
+            The request URI.
+        body
+            The JSON request body.
+
+        Returns
+        -------
+        tuple[int, bytes]
+            The HTTP status and the JSON response body.
+        """
+        try:
+            result = self._dispatch(method, uri, body)
+            status = 200
+        except FakeSheetsError as err:
+            status = err.status
+            result = {"error": {"code": err.status, "message": str(err)}}
+        content = json.dumps(result).encode()
+        with self._lock:
+            self.bytes_sent += len(content)
+        return status, content
+
+    def _dispatch(self, method: str, uri: str, body: None | bytes | str) -> dict:
+        """Route a request to its endpoint.
+
+        Raises
+        ------
+        FakeSheetsError
+            If the request is unknown, over quota, injected to fail or invalid.
+        """
+        url = urlsplit(uri)
+        match = PATH_PATTERN.match(url.path)
+        if match is None:
+            raise FakeSheetsError(404, f"Unknown path {url.path}.")
+        sheet_id, cell_range, batch_update = match.groups()
+        request = json.loads(body) if body else {}
+
+        with self._lock:
+            now = time.monotonic()
+            while self._request_times and now - self._request_times[0] >= 60:
+                self._request_times.popleft()
+            self._request_times.append(now)
+            if self._failures:
+                raise FakeSheetsError(self._failures.popleft(), "Injected failure.")
+            if (
+                self.quota_per_minute is not None
+                and len(self._request_times) > self.quota_per_minute
+            ):
+                raise FakeSheetsError(429, "Quota exceeded.")
+            if self.failure_rate and self._random.random() < self.failure_rate:
+                raise FakeSheetsError(503, "Injected failure.")
+
+            if batch_update and method == "POST":
+                self.calls["batchUpdate"] += 1
+                for data in request.get("data", []):
+                    self._write(
+                        sheet_id,
+                        data["range"],
+                        data["values"],
+                        data.get("majorDimension", "ROWS"),
+                    )
+                return {
+                    "spreadsheetId": sheet_id,
+                    "totalUpdatedCells": sum(len(d["values"]) for d in request["data"]),
+                }
+            if cell_range and method == "GET":
+                self.calls["get"] += 1
+                return self._read(sheet_id, unquote(cell_range))
+            if cell_range and method == "PUT":
+                self.calls["update"] += 1
+                if parse_qs(url.query).get("valueInputOption") is None:
+                    raise FakeSheetsError(400, "valueInputOption is required.")
+                self._write(
+                    sheet_id,
+                    unquote(cell_range),
+                    request["values"],
+                    request.get("majorDimension", "ROWS"),
+                )
+                return {"spreadsheetId": sheet_id, "updatedRange": unquote(cell_range)}
+        raise FakeSheetsError(405, f"{method} is not allowed on {url.path}.")
+
+    def _tab_and_bounds(
+        self, sheet_id: str, sheet_range: str
+    ) -> tuple[list[list[str]], int, int, int, int]:
+        """Find the tab and the 0-based, inclusive corners of an A1 range.
+
+        Open-ended bounds are returned as a large number.
+        """
+        match = RANGE_PATTERN.match(sheet_range)
+        if (
+            match is None
+            or match.group(1) is None
+            or (sheet_id, match.group(1)) not in self._tabs
+        ):
+            raise FakeSheetsError(400, f"Unable to parse range: {sheet_range}")
+        tab_name, first_column, first_row, last_column, last_row = match.groups()
+        if match.group(4) is None:
+            last_column, last_row = first_column, first_row
+        unbounded = 10**9
+        return (
+            self._tabs[(sheet_id, tab_name)],
+            int(first_row) - 1 if first_row else 0,
+            column_index(first_column) if first_column else 0,
+            int(last_row) - 1 if last_row else unbounded,
+            column_index(last_column) if last_column else unbounded,
+        )
+
+    def _read(self, sheet_id: str, sheet_range: str) -> dict:
+        """Answer ``values.get``.
+
+        Trailing empty cells and rows are dropped, like the API does.
+        """
+        tab, first_row, first_column, last_row, last_column = self._tab_and_bounds(
+            sheet_id, sheet_range
+        )
+        values = []
+        for row in tab[first_row : last_row + 1]:
+            cells = row[first_column : last_column + 1]
+            while cells and cells[-1] == "":
+                cells.pop()
+            values.append(cells)
+        while values and not values[-1]:
+            values.pop()
+        result = {"range": sheet_range, "majorDimension": "ROWS"}
+        if values:
+            result["values"] = values
+        return result
+
+    def _write(
+        self,
+        sheet_id: str,
+        sheet_range: str,
+        values: list[list[str]],
+        major_dimension: str,
+    ) -> None:
+        """Apply ``values.update`` or one range of ``values.batchUpdate``."""
+        tab, first_row, first_column, _, _ = self._tab_and_bounds(sheet_id, sheet_range)
+        if major_dimension == "COLUMNS":
+            values = [list(row) for row in zip(*values)]
+        for row_offset, row_values in enumerate(values):
+            row = first_row + row_offset
+            while len(tab) <= row:
+                tab.append([])
+            cells = tab[row]
+            for column_offset, value in enumerate(row_values):
+                column = first_column + column_offset
+                if len(cells) <= column:
+                    cells.extend([""] * (column - len(cells) + 1))
+                cells[column] = str(value)
+
+
+class FakeSheetsHttp:
+    """httplib2-compatible transport answering from a ``FakeSheetsBackend``.
+
+    It is safe to share between threads, so ``TrackingSheet`` uses one instance for all
+    of them.
+    """
+
+    def __init__(self, backend: FakeSheetsBackend) -> None:
+        self.backend = backend
+
+    def request(
+        self,
+        uri: str,
+        method: str = "GET",
+        body: None | bytes | str = None,
+        headers: None | dict = None,
+        **kwargs,
+    ) -> tuple[httplib2.Response, bytes]:
+        """Answer a request like ``httplib2.Http.request``.
+
+        Parameters
+        ----------
+        uri
+            The request URI.
+        method
+            The HTTP method.
+        body
+            The JSON request body.
+        headers
+            The request headers, ignored.
+        **kwargs
+            Further ``httplib2.Http.request`` arguments, ignored.
+
+        Returns
+        -------
+        tuple[httplib2.Response, bytes]
+            The response and its body.
+        """
+        if self.backend.latency:
+            time.sleep(self.backend.latency)
+        status, content = self.backend.handle(method, uri, body)
+        return (
+            httplib2.Response({"status": status, "content-type": "application/json"}),
+            content,
+        )
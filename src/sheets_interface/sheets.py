@@ -1,12 +1,31 @@
 """Create a Google Sheets API service object and output data from a spreadsheet."""
 
+import re
+import threading
+import time
+import uuid
+from collections.abc import Iterable
+from collections.abc import Iterator
 from pathlib import Path
 
-from google.auth.transport.requests import Request
+import httplib2
+from google.auth.exceptions import RefreshError
 from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
 from google_auth_oauthlib.flow import InstalledAppFlow
+from googleapiclient.discovery import Resource
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpRequest
+
+from src.instrumentation import instrumented
+from src.instrumentation import record_api_call
+from src.sheets_interface.credentials import get_credential_provider
+from src.sheets_interface.tracking_data import FIRST_DATA_ROW
+from src.sheets_interface.tracking_data import LEASE_PREFIX
+from src.sheets_interface.tracking_data import Lease
+from src.sheets_interface.tracking_data import TrackingData
+from src.sheets_interface.tracking_data import row_incomplete
 
 TRACKING_PATH = Path(__file__).resolve().parents[1]
 
@@ -19,46 +38,289 @@ SAMPLE_SPREADSHEET_ID = ""
 REQUEST_AND_SN_COLUMNS = 2
 TEST_TAB = "unit-testing"
 TEST_RANGE = "A1:C"
+HTTP_TIMEOUT = 60
+# Column letter of the status column.
+STATUS_COLUMN = "C"
+# Ranges sent per values().batchUpdate request.
+MAX_BATCH_RANGES = 500
+CELL_RANGE_PATTERN = re.compile(r"^([A-Z]+)(\d*):([A-Z]+)(\d*)$")
+
+
+def split_cell_range(cell_range: str) -> tuple[str, int, str, None | int]:
+    """Split an A1 range into its columns and rows.
+
+    Parameters
+    ----------
+    cell_range
+        The A1 range, e.g. ``A1:C`` or ``A1:C500``.
+
+    Raises
+    ------
+    ValueError
+        If the range is not a two-corner A1 range.
+
+    Returns
+    -------
+    tuple[str, int, str, None | int]
+        first_column, first_row, last_column, last_row
+            The corners of the range. The first row defaults to 1 and the last row is
+            ``None`` if open-ended.
+    """
+    match = CELL_RANGE_PATTERN.match(cell_range)
+    if match is None:
+        msg = f"Cell range {cell_range} is not an A1 range."
+        raise ValueError(msg)
+    first_column, first_row, last_column, last_row = match.groups()
+    return (
+        first_column,
+        int(first_row or 1),
+        last_column,
+        int(last_row) if last_row else None,
+    )
+
+
+def batch_update_bodies(
+    tab_name: str, updates: Iterable[tuple[int, str, str]]
+) -> list[tuple[dict, list[tuple[int, str]]]]:
+    """Coalesce cell updates into ``values().batchUpdate`` request bodies.
+
+    Repeated writes to the same cell are merged, keeping the last value, and runs of
+    adjacent rows in a column become one range. Each body holds at most
+    ``MAX_BATCH_RANGES`` ranges.
+
+    Parameters
+    ----------
+    tab_name
+        The name of the tab.
+    updates
+        The (row number, column letter, tracking status) of each cell.
+
+    Returns
+    -------
+    list[tuple[dict, list[tuple[int, str]]]]
+        body, cells
+            The request body and the (row, column) of each cell it writes.
+    """
+    statuses_by_cell: dict[tuple[int, str], str] = {}
+    for row, column, status in updates:
+        statuses_by_cell[(row, column)] = status
+
+    # Runs of adjacent rows in the same column, as (column, first row, statuses).
+    runs: list[tuple[str, int, list[str]]] = []
+    for row, column in sorted(statuses_by_cell, key=lambda cell: (cell[1], cell[0])):
+        if runs and runs[-1][0] == column and runs[-1][1] + len(runs[-1][2]) == row:
+            runs[-1][2].append(statuses_by_cell[(row, column)])
+        else:
+            runs.append((column, row, [statuses_by_cell[(row, column)]]))
+
+    bodies = []
+    for start in range(0, len(runs), MAX_BATCH_RANGES):
+        chunk = runs[start : start + MAX_BATCH_RANGES]
+        body = {
+            "valueInputOption": "RAW",
+            "data": [
+                {
+                    "range": f"{tab_name}!{column}{row}:"
+                    f"{column}{row + len(statuses) - 1}",
+                    "majorDimension": "COLUMNS",
+                    "values": [statuses],
+                }
+                for column, row, statuses in chunk
+            ],
+        }
+        cells = [
+            (row + offset, column)
+            for column, row, statuses in chunk
+            for offset in range(len(statuses))
+        ]
+        bodies.append((body, cells))
+    return bodies
+
+
+class BatchWriteError(ConnectionError):
+    """Raised when cells of a batch write could not be written.
+
+    Attributes
+    ----------
+    failures
+        The error of each cell that failed, keyed by (row, column).
+    """
+
+    def __init__(self, failures: dict[tuple[int, str], ConnectionError]) -> None:
+        self.failures = failures
+        super().__init__(f"{len(failures)} cells could not be written.")
 
 
 class TrackingSheet:
     """Class for tracking the scan."""
 
-    def __init__(self, sheet_id: str, tab_name: str, cell_range: str = "A1:C") -> None:
+    def __init__(
+        self,
+        sheet_id: str,
+        tab_name: str,
+        cell_range: str = "A1:C",
+        cache_ttl: None | float = None,
+        window_size: None | int = None,
+        http: None | httplib2.Http = None,
+    ) -> None:
+        """Set up the tracking sheet.
+
+        Parameters
+        ----------
+        sheet_id
+            The spreadsheet ID.
+        tab_name
+            The name of the tab holding the tracking data.
+        cell_range
+            The A1 range of the tracking data, including the header row.
+        cache_ttl
+            Seconds a snapshot of the tracking data is reused for. ``None`` disables the
+            snapshot cache.
+        window_size
+            Rows per request when streaming the tracking data. If set and the snapshot
+            cache is disabled, ``request_complete`` and ``next_unused_row_sn`` stream
+            the sheet and stop as soon as they have an answer.
+        http
+            A thread-safe HTTP transport used instead of an authorized ``httplib2.Http``
+            per thread, e.g. from ``FakeSheetsBackend.http``. Credentials are not
+            applied to it.
+        """
         self.sheet_id = sheet_id
         self.tab_name = tab_name
         self.cell_range = cell_range
         self.creds: None | Credentials = None
         self.num_columns = REQUEST_AND_SN_COLUMNS
+        self.window_size = window_size
+        self.http = http
+        self._local = threading.local()
+
+        self.cache_ttl = cache_ttl
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._cache_lock = threading.Lock()
+        self._cache_generation = 0
+        self._snapshot: None | TrackingData = None
+        self._snapshot_time = 0.0
 
     def login(self) -> None:
-        """Login to Google Sheets."""
+        """Login to Google Sheets.
+
+        The credentials come from the process-wide provider of the token file, which
+        loads the token once and refreshes it in the background, so all sheets of the
+        process share them.
+        """
         # The file token.json stores the user's access and refresh tokens, and is
         # created automatically when the authorization flow completes for the first
         # time.
         token_path = TRACKING_PATH / "sheet_token.json"
+        provider = get_credential_provider(token_path, SCOPES)
         if token_path.exists():
-            self.creds = Credentials.from_authorized_user_file(token_path, SCOPES)
-
-            if not self.creds.valid:
+            try:
+                self.creds = provider.credentials()
+            except RefreshError:
                 self.creds = None
-            elif self.creds.expired and self.creds.refresh_token:
-                self.creds.refresh(Request())
-                return
 
         # If there are no (valid) credentials available, let the user log in.
         if not self.creds:
             credentials_path = TRACKING_PATH / "sheet_credentials.json"
             flow = InstalledAppFlow.from_client_secrets_file(credentials_path, SCOPES)
-            self.creds = flow.run_local_server(port=0)
-            # Save the credentials for the next run
-            with Path(token_path).open("w") as token:
-                token.write(self.creds.to_json())
+            # Saved through the provider, so the token file is written atomically and
+            # every sheet shares the login.
+            self.creds = provider.store(flow.run_local_server(port=0))
+
+    def values_api(self) -> Resource:
+        """Get the ``spreadsheets().values()`` collection of the thread's API client.
+
+        The client is built once per thread and then reused, so the discovery document
+        is parsed once and the underlying HTTP connection is kept alive between
+        requests. Each thread gets its own client because the httplib2 transport is not
+        thread-safe. The client is rebuilt when ``self.creds`` is replaced (e.g. by
+        ``login``); refreshes of the same credentials object are picked up by the
+        authorized transport.
 
-    def get_tracking_data(self) -> tuple[list[str], list[dict[str, str]]]:
+        Returns
+        -------
+        Resource
+            The values collection of the Sheets API client.
+        """
+        local = self._local
+        if getattr(local, "values_api", None) is None or local.creds is not self.creds:
+            if self.http is not None:
+                service = build("sheets", "v4", http=self.http, cache_discovery=False)
+            elif self.creds is None:
+                # Falls back to the application default credentials, as build() does.
+                service = build("sheets", "v4", cache_discovery=False)
+            else:
+                http = AuthorizedHttp(
+                    self.creds, http=httplib2.Http(timeout=HTTP_TIMEOUT)
+                )
+                service = build("sheets", "v4", http=http, cache_discovery=False)
+            # Creating the collection resources is as costly as building the client, so
+            # keep them too.
+            local.values_api = service.spreadsheets().values()
+            local.creds = self.creds
+        return local.values_api
+
+    def _execute(self, request: HttpRequest) -> dict:
+        """Execute a request of the Sheets API, recording its latency and traffic.
+
+        The traffic is the bytes sent and received.
+
+        Parameters
+        ----------
+        request
+            The request, e.g. from ``values_api().get(...)``.
+
+        Raises
+        ------
+        HttpError
+            If the API answers with an error.
+
+        Returns
+        -------
+        dict
+            The decoded response.
+        """
+        received = 0
+        # The response size is only known to the post-processing of the raw content,
+        # which stubs may not have.
+        postproc = getattr(request, "postproc", None)
+        if postproc is not None:
+
+            def measure(response, content: bytes) -> dict:
+                nonlocal received
+                received = len(content)
+                return postproc(response, content)
+
+            request.postproc = measure
+        body = getattr(request, "body", None) or ""
+        method_id = getattr(request, "methodId", None) or "unknown"
+        method = method_id.removeprefix("sheets.spreadsheets.")
+        start = time.perf_counter()
+        error = True
+        try:
+            result = request.execute()
+            error = False
+            return result
+        finally:
+            record_api_call(
+                method, time.perf_counter() - start, len(body), received, error
+            )
+
+    @instrumented()
+    def get_tracking_data(
+        self, force_refresh: bool = False
+    ) -> tuple[list[str], list[dict[str, str]]]:
         """Get values from tracking sheet.
 
-        Prints values from a sample spreadsheet.
+        When the snapshot cache is enabled, a snapshot younger than ``cache_ttl``
+        seconds is returned instead of fetching the sheet again. The snapshot is shared
+        between callers and must not be modified.
+
+        Parameters
+        ----------
+        force_refresh
+            Fetch the sheet even if a fresh snapshot is cached.
 
         Raises
         ------
@@ -74,36 +336,197 @@ class TrackingSheet:
             column_data
                 The values of the cells. Remaining rows of the sheet.
         """
-        sheet_range = f"{self.tab_name}!{self.cell_range}"
-        try:
-            service = build("sheets", "v4", credentials=self.creds)
+        tracking_data = self.get_tracking_snapshot(force_refresh)
+        return tracking_data.column_names, tracking_data.rows
 
-            # Call the Sheets API
-            sheet = service.spreadsheets()
-            result = sheet.values().get(spreadsheetId=self.sheet_id, range=sheet_range).execute()
-            values = result.get("values", [])
+    @instrumented()
+    def get_tracking_snapshot(self, force_refresh: bool = False) -> TrackingData:
+        """Get the indexed tracking data, from the snapshot cache if enabled and fresh.
 
-            if not values:
-                msg = "No data found."
-                raise ValueError(msg)
+        Parameters
+        ----------
+        force_refresh
+            Fetch the sheet even if a fresh snapshot is cached.
 
+        Raises
+        ------
+        ConnectionError
+            If the connection to the Google Sheet fails.
+
+        Returns
+        -------
+        TrackingData
+            The tracking data with its indexes.
+        """
+        if self.cache_ttl is None:
+            return self._fetch_tracking_data()
+
+        with self._cache_lock:
+            if (
+                not force_refresh
+                and self._snapshot is not None
+                and time.monotonic() - self._snapshot_time < self.cache_ttl
+            ):
+                self.cache_hits += 1
+                return self._snapshot
+            self.cache_misses += 1
+            generation = self._cache_generation
+
+        fetch_time = time.monotonic()
+        snapshot = self._fetch_tracking_data()
+        with self._cache_lock:
+            # A write while fetching may not be in the snapshot, so only keep it if
+            # nothing was invalidated.
+            if generation == self._cache_generation:
+                self._snapshot = snapshot
+                self._snapshot_time = fetch_time
+        return snapshot
+
+    def invalidate_cache(self) -> None:
+        """Drop the cached snapshot of the tracking data."""
+        with self._cache_lock:
+            self._cache_generation += 1
+            self._snapshot = None
+
+    def _fetch_tracking_data(self) -> TrackingData:
+        """Fetch and index the tracking data from the Sheets API.
+
+        Raises
+        ------
+        ConnectionError
+            If the connection to the Google Sheet fails.
+
+        Returns
+        -------
+        TrackingData
+            The tracking data with its indexes.
+        """
+        values = self._get_values(self.cell_range)
+        if not values:
+            msg = "No data found."
+            raise ValueError(msg)
+
+        return TrackingData.from_values(values, self.num_columns)
+
+    def _get_values(self, cell_range: str) -> list[list[str]]:
+        """Get the values of a range of the tab.
+
+        Parameters
+        ----------
+        cell_range
+            The A1 range within the tab.
+
+        Raises
+        ------
+        ConnectionError
+            If the connection to the Google Sheet fails.
+
+        Returns
+        -------
+        list[list[str]]
+            The values of the rows, without trailing empty rows and cells.
+        """
+        sheet_range = f"{self.tab_name}!{cell_range}"
+        try:
+            # Call the Sheets API
+            result = self._execute(
+                self.values_api().get(spreadsheetId=self.sheet_id, range=sheet_range)
+            )
         except HttpError as err:
             raise ConnectionError from err
+        return result.get("values", [])
+
+    def iter_tracking_rows(
+        self, window_size: None | int = None
+    ) -> Iterator[tuple[int, dict[str, str]]]:
+        """Stream the tracking data in windows of rows.
+
+        The header row is read once, then the rows are fetched ``window_size`` at a time
+        (``A2:C5001``, ``A5002:C10001``, ...) and yielded as they arrive, so a caller
+        that stops early does not download the rest of the sheet. Streaming ends at the
+        first window without any data; a gap of blank rows spanning a whole window ends
+        it early.
+
+        Parameters
+        ----------
+        window_size
+            Rows per request. Defaults to the sheet's ``window_size``, or 5000.
+
+        Raises
+        ------
+        ConnectionError
+            If the connection to the Google Sheet fails.
+        ValueError
+            If the header row is empty.
+
+        Yields
+        ------
+        tuple[int, dict[str, str]]
+            row, row_data
+                The row number and the values of the row, keyed by column name.
+        """
+        window_size = window_size or self.window_size or 5000
+        first_column, first_row, last_column, last_row = split_cell_range(
+            self.cell_range
+        )
+        header = self._get_values(f"{first_column}{first_row}:{last_column}{first_row}")
+        if not header:
+            msg = "No data found."
+            raise ValueError(msg)
+        column_names = header[0]
+
+        row = first_row + 1
+        while last_row is None or row <= last_row:
+            window_end = (
+                row + window_size - 1
+                if last_row is None
+                else min(row + window_size - 1, last_row)
+            )
+            values = self._get_values(f"{first_column}{row}:{last_column}{window_end}")
+            # The API drops the trailing empty rows of a window, so a short window may
+            # still be followed by data after a gap of blank rows. Only an empty window
+            # ends the stream.
+            if not values:
+                return
+            for offset, values_row in enumerate(values):
+                yield row + offset, dict(zip(column_names, values_row))
+            row = window_end + 1
+
+    def _first_incomplete_row(self, request_uuid: str) -> None | tuple[int, str]:
+        """Find the first row of a request without a status.
 
-        column_names = values[0]
+        Streams the sheet when ``window_size`` is set and the snapshot cache is
+        disabled, otherwise uses the indexed snapshot.
+
+        Parameters
+        ----------
+        request_uuid
+            The request UUID.
 
-        data = []
-        for row in values[1:]:
-            row_dict = {}
-            for column_indx, column_value in enumerate(row):
-                row_dict[column_names[column_indx]] = column_value
-            data.append(row_dict)
+        Returns
+        -------
+        None | tuple[int, str]
+            The row number and the cell SN, or ``None`` if every row of the request has
+            a status.
+        """
+        if self.window_size is None or self.cache_ttl is not None:
+            return self.get_tracking_snapshot().first_incomplete_row(request_uuid)
 
-        return column_names, data
+        for row, row_data in self.iter_tracking_rows():
+            if (
+                len(row_data) > 1
+                and row_data["Request_UUID"] == request_uuid
+                and row_incomplete(row_data, self.num_columns)
+            ):
+                return row, row_data["Cell_SN"]
+        return None
 
+    @instrumented()
     def put_single_value_by_address(self, row: int, column: str, status: str) -> None:
         """Put the tracking status to the tracking sheet.
 
+        The cached snapshot of the tracking data is invalidated.
+
         Parameters
         ----------
         row
@@ -119,29 +542,84 @@ class TrackingSheet:
             If the connection to the Google Sheet fails.
         """
         try:
-            service = build("sheets", "v4", credentials=self.creds)
-
             # Call the Sheets API
-            sheet = service.spreadsheets()
             body = {"values": [[status]], "majorDimension": "COLUMNS"}
 
             cell_address = f"{self.tab_name}!{column}{row!s}"
-            result = (
-                sheet.values()
-                .update(
+            result = self._execute(
+                self.values_api().update(
                     spreadsheetId=self.sheet_id,
                     range=cell_address,
                     valueInputOption="RAW",
                     body=body,
                 )
-                .execute()
             )
 
         except HttpError as err:
             raise ConnectionError from err
+        finally:
+            self.invalidate_cache()
 
         return result
 
+    @instrumented()
+    def put_values_by_address(
+        self, updates: Iterable[tuple[int, str, str]]
+    ) -> dict[tuple[int, str], ConnectionError]:
+        """Put many tracking statuses to the sheet in as few requests as possible.
+
+        Repeated writes to the same cell are merged, keeping the last value, and runs of
+        adjacent rows in a column are sent as one range. The ranges are sent through
+        ``values().batchUpdate`` in requests of at most ``MAX_BATCH_RANGES`` ranges. The
+        cached snapshot of the tracking data is invalidated.
+
+        Parameters
+        ----------
+        updates
+            The (row number, column letter, tracking status) of each cell.
+
+        Returns
+        -------
+        dict[tuple[int, str], ConnectionError]
+            The error of each cell that could not be written, keyed by (row, column).
+            Empty if all were written.
+        """
+        failures: dict[tuple[int, str], ConnectionError] = {}
+        try:
+            for body, cells in batch_update_bodies(self.tab_name, updates):
+                try:
+                    self._execute(
+                        self.values_api().batchUpdate(
+                            spreadsheetId=self.sheet_id, body=body
+                        )
+                    )
+                except HttpError as err:
+                    error = ConnectionError(str(err))
+                    error.__cause__ = err
+                    failures.update(dict.fromkeys(cells, error))
+        finally:
+            self.invalidate_cache()
+
+        return failures
+
+    def write_buffer(self, max_size: int = 100, max_age: float = 5.0) -> "WriteBuffer":
+        """Create a write-behind buffer for tracking statuses.
+
+        Parameters
+        ----------
+        max_size
+            The number of buffered cells that triggers a flush.
+        max_age
+            The age in seconds of the oldest buffered write that triggers a flush.
+
+        Returns
+        -------
+        WriteBuffer
+            The buffer writing to this sheet.
+        """
+        return WriteBuffer(self, max_size, max_age)
+
+    @instrumented()
     def find_row(self, request_uuid: str, cell_sn: str) -> int:
         """Find the row number by the request UUID.
 
@@ -162,31 +640,16 @@ class TrackingSheet:
         int
             The row number.
         """
-        column_names, data = self.get_tracking_data()
-        row_ids = []
-        for row, row_data in enumerate(data):
-            if (
-                len(row_data) > 0
-                and row_data["Request_UUID"] == request_uuid
-                and len(row_data) > 1
-                and row_data["Cell_SN"] == cell_sn
-            ):
-                row_ids.append(row + 2)
-        if len(row_ids) == 0:
-            msg = f"Request UUID {request_uuid} and Cell SN {cell_sn} not found."
-            raise ValueError(msg)
-
-        if len(row_ids) > 1:
-            msg = f"Request UUID {request_uuid} and Cell SN {cell_sn} found multiple times."
-            raise ValueError(msg)
-
-        return row_ids[0]
+        return self.get_tracking_snapshot().find_row(request_uuid, cell_sn)
 
+    @instrumented()
     def request_complete(self, request_uuid: str) -> bool:
         """Determine if the request is done.
 
-        If there are any rows with the request UUID and a cell SN but no status, then the request is not done.
-        If there are rows with the request UUID and no cell SN, then the request is done.
+        If there are any rows with the request UUID and a cell SN but no status, then
+        the request is not done. If there are rows with the request UUID and no cell SN,
+        then the request is done. Rows leased by a worker with ``claim_rows`` are not
+        done until the worker writes their status.
 
         Parameters
         ----------
@@ -198,18 +661,116 @@ class TrackingSheet:
         bool
             True if the request is done.
         """
-        column_names, data = self.get_tracking_data()
-        for row_data in data:
-            if len(row_data) > 1 and row_data["Request_UUID"] == request_uuid and len(row_data) == self.num_columns:
-                return False
+        if self.window_size is None or self.cache_ttl is not None:
+            return self.get_tracking_snapshot().request_complete(request_uuid)
+
+        for _, row_data in self.iter_tracking_rows():
             if (
-                len(row_data) > self.num_columns
+                len(row_data) > 1
                 and row_data["Request_UUID"] == request_uuid
-                and row_data["Completed"].isspace()
+                and (
+                    row_incomplete(row_data, self.num_columns)
+                    or row_data.get("Completed", "").startswith(LEASE_PREFIX)
+                )
             ):
                 return False
         return True
 
+    @instrumented()
+    def claim_rows(
+        self,
+        request_uuid: str,
+        worker_id: str,
+        count: int = 1,
+        lease_seconds: float = 300.0,
+        settle_seconds: float = 1.0,
+    ) -> list[tuple[int, str]]:
+        """Lease rows of a request to a worker, so parallel workers get distinct rows.
+
+        Rows without a status and rows whose lease expired are leased by writing a lease
+        status, then read back after ``settle_seconds``; only the rows still holding
+        this claim's lease are returned. When two workers claim the same row at once,
+        the last write wins and the other worker drops the row. The Sheets API has no
+        compare-and-set, so a claim written more than ``settle_seconds`` after the
+        verifying read can still collide; size the settle time above the write latency.
+        Lease expiry uses the workers' clocks.
+
+        The worker finishes a row by writing its status, e.g. with
+        ``put_single_value_by_address``, or gives it back with ``release_rows``.
+
+        Parameters
+        ----------
+        request_uuid
+            The request UUID.
+        worker_id
+            Identifies the worker, e.g. host and process ID.
+        count
+            The maximum number of rows to lease.
+        lease_seconds
+            Seconds until the lease expires and other workers may take the row back.
+        settle_seconds
+            Seconds to wait for concurrent claims before checking the leases.
+
+        Raises
+        ------
+        ConnectionError
+            If the connection to the Google Sheet fails.
+
+        Returns
+        -------
+        list[tuple[int, str]]
+            The row number and the cell SN of each leased row. Empty if no row could be
+            leased.
+        """
+        now = time.time()
+        candidates = self.get_tracking_snapshot(force_refresh=True).claimable_rows(
+            request_uuid, now, count
+        )
+        if not candidates:
+            return []
+
+        lease = Lease(worker_id, now + lease_seconds, uuid.uuid4().hex[:12])
+        failures = self.put_values_by_address(
+            (row, STATUS_COLUMN, lease.status) for row, _ in candidates
+        )
+        if settle_seconds:
+            time.sleep(settle_seconds)
+
+        tracking_data = self.get_tracking_snapshot(force_refresh=True)
+        claimed = []
+        for row, cell_sn in candidates:
+            if (row, STATUS_COLUMN) in failures or row - FIRST_DATA_ROW >= len(
+                tracking_data.table
+            ):
+                continue
+            row_data = tracking_data.row_data(row)
+            if (
+                row_data.get("Cell_SN") == cell_sn
+                and row_data.get("Completed") == lease.status
+            ):
+                claimed.append((row, cell_sn))
+        return claimed
+
+    @instrumented()
+    def release_rows(
+        self, rows: Iterable[int]
+    ) -> dict[tuple[int, str], ConnectionError]:
+        """Give leased rows back without a status, so other workers can claim them.
+
+        Parameters
+        ----------
+        rows
+            The row numbers.
+
+        Returns
+        -------
+        dict[tuple[int, str], ConnectionError]
+            The error of each cell that could not be written, keyed by (row, column).
+        """
+        # A blank status marks the row as not done, like an empty cell.
+        return self.put_values_by_address((row, STATUS_COLUMN, " ") for row in rows)
+
+    @instrumented()
     def next_unused_row_sn(self, request_uuid: str) -> tuple[int, str]:
         """Find the next row number.
 
@@ -229,18 +790,97 @@ class TrackingSheet:
             row, sn
                 The row number and the cell SN of the first row without a status.
         """
-        column_names, data = self.get_tracking_data()
-        for row, row_data in enumerate(data):
-            if len(row_data) > 1 and row_data["Request_UUID"] == request_uuid and len(row_data) == self.num_columns:
-                return row + 2, row_data["Cell_SN"]
-            if (
-                len(row_data) > self.num_columns
-                and row_data["Request_UUID"] == request_uuid
-                and row_data["Completed"].isspace()
-            ):
-                return row + 2, row_data["Cell_SN"]
-        msg = f"Request UUID {request_uuid} not found."
-        raise ValueError(msg)
+        row_sn = self._first_incomplete_row(request_uuid)
+        if row_sn is None:
+            msg = f"Request UUID {request_uuid} not found."
+            raise ValueError(msg)
+        return row_sn
+
+
+class WriteBuffer:
+    """Write-behind buffer merging tracking status writes into batch writes.
+
+    Writes are collected until ``max_size`` cells are buffered or the oldest write is
+    ``max_age`` seconds old, then sent with ``TrackingSheet.put_values_by_address``. The
+    age is checked on each ``put``; there is no background flush. Leaving the buffer as
+    a context manager flushes it and raises ``BatchWriteError`` if any cell failed.
+
+    Attributes
+    ----------
+    failures
+        The error of each cell that failed in a flush, keyed by (row, column).
+    """
+
+    def __init__(
+        self, sheet: TrackingSheet, max_size: int = 100, max_age: float = 5.0
+    ) -> None:
+        self.sheet = sheet
+        self.max_size = max_size
+        self.max_age = max_age
+        self.failures: dict[tuple[int, str], ConnectionError] = {}
+        self._cells: dict[tuple[int, str], str] = {}
+        self._oldest = 0.0
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "WriteBuffer":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.flush()
+        if self.failures and exc_type is None:
+            raise BatchWriteError(self.failures)
+
+    def __len__(self) -> int:
+        return len(self._cells)
+
+    def put(
+        self, row: int, column: str, status: str
+    ) -> dict[tuple[int, str], ConnectionError]:
+        """Buffer a tracking status, replacing a buffered status of the same cell.
+
+        Parameters
+        ----------
+        row
+            The row number.
+        column
+            Column letter.
+        status
+            The tracking status.
+
+        Returns
+        -------
+        dict[tuple[int, str], ConnectionError]
+            The cells that failed if the write triggered a flush, otherwise empty.
+        """
+        with self._lock:
+            if not self._cells:
+                self._oldest = time.monotonic()
+            self._cells[(row, column)] = status
+            full = (
+                len(self._cells) >= self.max_size
+                or time.monotonic() - self._oldest >= self.max_age
+            )
+        if full:
+            return self.flush()
+        return {}
+
+    def flush(self) -> dict[tuple[int, str], ConnectionError]:
+        """Write the buffered statuses to the tracking sheet.
+
+        Returns
+        -------
+        dict[tuple[int, str], ConnectionError]
+            The error of each cell that could not be written, keyed by (row, column).
+        """
+        with self._lock:
+            cells, self._cells = self._cells, {}
+        if not cells:
+            return {}
+        failures = self.sheet.put_values_by_address(
+            (row, column, status) for (row, column), status in cells.items()
+        )
+        self.failures.update(failures)
+        return failures
 
 
 if __name__ == "__main__":
@@ -0,0 +1,73 @@
+"""Tests for src.sheets_interface.async_sheets.py."""
+
+import asyncio
+
+import httpx
+import pytest
+
+from src.sheets_interface.async_sheets import AsyncTrackingSheet
+from src.sheets_interface.async_sheets import gather_tracking_snapshots
+from src.sheets_interface.fake_sheets import FakeSheetsBackend
+
+SPREADSHEET_ID = "fake-spreadsheet"
+TEST_TAB = "unit-testing"
+VALUES = [
+    ["Request_UUID", "Cell_SN", "Completed"],
+    ["request1", "some_num", "Done"],
+    ["request1", "just_entered"],
+]
+
+
+def test_async_tracking_sheet() -> None:
+    """Test the async queries and writes."""
+    backend = FakeSheetsBackend()
+    backend.set_values(SPREADSHEET_ID, TEST_TAB, VALUES)
+
+    async def run() -> None:
+        async with httpx.AsyncClient(transport=backend.async_transport()) as client:
+            sheet = AsyncTrackingSheet(SPREADSHEET_ID, TEST_TAB, client=client)
+            assert await sheet.find_row("request1", "some_num") == 2
+            assert not await sheet.request_complete("request1")
+            assert await sheet.next_unused_row_sn("request1") == (3, "just_entered")
+            with pytest.raises(ValueError, match="not found"):
+                await sheet.next_unused_row_sn("request2")
+
+            await sheet.put_single_value_by_address(3, "C", "Done")
+            assert await sheet.request_complete("request1")
+            assert (
+                await sheet.put_values_by_address(
+                    [(3, "C", "Queued"), (4, "C", "Done")]
+                )
+                == {}
+            )
+            assert backend.values(SPREADSHEET_ID, TEST_TAB)[2:] == [
+                ["request1", "just_entered", "Queued"],
+                ["", "", "Done"],
+            ]
+
+            missing = AsyncTrackingSheet("missing", TEST_TAB, client=client)
+            assert await missing.put_values_by_address([(3, "C", "Done")]) != {}
+            results = await gather_tracking_snapshots([sheet, missing])
+            assert results[0].find_row("request1", "some_num") == 2
+            assert isinstance(results[1], ConnectionError)
+
+    asyncio.run(run())
+
+
+def test_sweep_runs_concurrently() -> None:
+    """Test a sweep over many sheets takes about one round trip, not one per sheet."""
+    backend = FakeSheetsBackend(latency=0.05)
+    for tab in range(10):
+        backend.set_values(SPREADSHEET_ID, f"tab{tab}", VALUES)
+
+    async def run() -> float:
+        async with httpx.AsyncClient(transport=backend.async_transport()) as client:
+            sheets = [
+                AsyncTrackingSheet(SPREADSHEET_ID, f"tab{tab}", client=client)
+                for tab in range(10)
+            ]
+            start = asyncio.get_running_loop().time()
+            await gather_tracking_snapshots(sheets)
+            return asyncio.get_running_loop().time() - start
+
+    assert asyncio.run(run()) < 0.25
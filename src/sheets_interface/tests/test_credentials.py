@@ -0,0 +1,205 @@
+"""Tests for src.sheets_interface.credentials.py."""
+
+import json
+import time
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+from pathlib import Path
+
+import pytest
+from google.auth.exceptions import RefreshError
+from google.auth.exceptions import TransportError
+from google.oauth2.credentials import Credentials
+
+from src.sheets_interface import credentials
+from src.sheets_interface.credentials import CredentialProvider
+from src.sheets_interface.credentials import seconds_to_expiry
+
+SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
+
+
+def write_token(
+    token_path: Path, token: str, expires_in: float, refresh_token: str = "refresh"
+) -> None:
+    """Write an authorized user token file."""
+    expiry = datetime.now(timezone.utc) + timedelta(seconds=expires_in)
+    token_path.write_text(
+        json.dumps(
+            {
+                "token": token,
+                "refresh_token": refresh_token,
+                "client_id": "client",
+                "client_secret": "secret",
+                "expiry": expiry.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            }
+        )
+    )
+
+
+@pytest.fixture()
+def refreshes(monkeypatch: pytest.MonkeyPatch) -> list[str]:
+    """Replace the token refresh with one issuing token-1, token-2, ...
+
+    valid for an hour.
+
+    Returns
+    -------
+        list[str]: The tokens issued
+    """
+    issued: list[str] = []
+
+    def refresh(creds: Credentials, request: object) -> None:
+        issued.append(f"token-{len(issued) + 1}")
+        creds.token = issued[-1]
+        creds.expiry = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(
+            hours=1
+        )
+
+    monkeypatch.setattr(Credentials, "refresh", refresh)
+    return issued
+
+
+def test_expired_token_refreshed_once(tmp_path: Path, refreshes: list[str]) -> None:
+    """Test an expired token is refreshed, saved, and adopted by a second process."""
+    token_path = tmp_path / "sheet_token.json"
+    write_token(token_path, "expired", -10)
+
+    provider = CredentialProvider(token_path, SCOPES)
+    creds = provider.credentials()
+    provider.stop()
+    assert creds.token == "token-1"
+    assert seconds_to_expiry(creds) > provider.refresh_margin
+    assert json.loads(token_path.read_text())["token"] == "token-1"
+
+    other_process = CredentialProvider(token_path, SCOPES)
+    other_process._creds = Credentials.from_authorized_user_info(
+        {
+            "token": "expired",
+            "refresh_token": "refresh",
+            "client_id": "client",
+            "client_secret": "secret",
+        }
+    )
+    other_process.refresh()
+    assert other_process._creds.token == "token-1"
+    assert refreshes == ["token-1"]
+
+
+def test_background_refresh(tmp_path: Path, refreshes: list[str]) -> None:
+    """Test the background thread refreshes a token about to expire."""
+    token_path = tmp_path / "sheet_token.json"
+    write_token(token_path, "fresh", 3600)
+
+    provider = CredentialProvider(token_path, SCOPES, refresh_margin=60)
+    creds = provider.credentials()
+    assert creds.token == "fresh"
+    provider.stop()
+
+    creds.expiry = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(
+        seconds=30
+    )
+    write_token(token_path, "fresh", 30)
+    provider.start()
+    for _ in range(100):
+        if creds.token != "fresh":
+            break
+        time.sleep(0.01)
+    provider.stop()
+    assert creds.token == "token-1"
+
+
+def test_rotated_refresh_token_adopted(tmp_path: Path, refreshes: list[str]) -> None:
+    """Test a token saved by another process is adopted.
+
+    Its rotated refresh token comes with it.
+    """
+    token_path = tmp_path / "sheet_token.json"
+    write_token(token_path, "fresh", 3600)
+    provider = CredentialProvider(token_path, SCOPES)
+    creds = provider.credentials()
+    provider.stop()
+
+    write_token(token_path, "rotated", 3600, refresh_token="refresh-2")
+    provider.refresh()
+    assert (creds.token, creds.refresh_token) == ("rotated", "refresh-2")
+    assert refreshes == []
+
+
+def test_store_login(tmp_path: Path, refreshes: list[str]) -> None:
+    """Test credentials from an interactive login are saved.
+
+    They are shared with the holders of the old ones.
+    """
+    token_path = tmp_path / "sheet_token.json"
+    write_token(token_path, "expired", -10)
+    provider = CredentialProvider(token_path, SCOPES)
+    provider._creds = shared = Credentials.from_authorized_user_file(token_path, SCOPES)
+
+    login = Credentials.from_authorized_user_info(
+        {
+            "token": "login",
+            "refresh_token": "refresh-2",
+            "client_id": "client",
+            "client_secret": "secret",
+        }
+    )
+    login.expiry = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(hours=1)
+    assert provider.store(login) is shared
+    provider.stop()
+    assert (shared.token, shared.refresh_token) == ("login", "refresh-2")
+    assert json.loads(token_path.read_text())["token"] == "login"
+    assert list(tmp_path.glob("tmp*")) == []
+
+
+def test_revoked_token_stops_refresh(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test the background refresh stops once the token is rejected for good.
+
+    It keeps the error.
+    """
+    attempts = []
+
+    def refresh(creds: Credentials, request: object) -> None:
+        attempts.append(1)
+        raise RefreshError("invalid_grant: Token has been expired or revoked.")
+
+    monkeypatch.setattr(Credentials, "refresh", refresh)
+    token_path = tmp_path / "sheet_token.json"
+    write_token(token_path, "expired", -10)
+    provider = CredentialProvider(token_path, SCOPES)
+    provider._creds = Credentials.from_authorized_user_file(token_path, SCOPES)
+    provider.start()
+    provider._thread.join(timeout=5)
+    assert not provider._thread.is_alive()
+    assert isinstance(provider.error, RefreshError)
+    assert attempts == [1]
+
+
+def test_transport_error_retried(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, refreshes: list[str]
+) -> None:
+    """Test the background refresh backs off after a network error and recovers."""
+    refresh = Credentials.refresh
+    failures = [TransportError("Connection reset by peer")]
+
+    def flaky_refresh(creds: Credentials, request: object) -> None:
+        if failures:
+            raise failures.pop()
+        refresh(creds, request)
+
+    monkeypatch.setattr(Credentials, "refresh", flaky_refresh)
+    monkeypatch.setattr(credentials, "RETRY_DELAY", 0.01)
+    token_path = tmp_path / "sheet_token.json"
+    write_token(token_path, "expired", -10)
+    provider = CredentialProvider(token_path, SCOPES)
+    provider._creds = Credentials.from_authorized_user_file(token_path, SCOPES)
+    provider.start()
+    deadline = time.monotonic() + 5
+    while provider._creds.token != "token-1" and time.monotonic() < deadline:
+        time.sleep(0.01)
+    provider.stop()
+    assert failures == []
+    assert provider._creds.token == "token-1"
+    assert provider.error is None
@@ -1,14 +1,34 @@
 """Tests for scan_processing.track.sheets.py."""
 
+import threading
+
+import httplib2
 import pytest
+from google.auth.credentials import AnonymousCredentials
 from google.auth.exceptions import DefaultCredentialsError
+from googleapiclient.errors import HttpError
 
+from src.sheets_interface.fake_sheets import FakeSheetsBackend
+from src.sheets_interface.sheets import BatchWriteError
 from src.sheets_interface.sheets import TrackingSheet
+from src.sheets_interface.sheets import split_cell_range
 from src.sheets_interface.sheets import TRACKING_PATH
+from src.sheets_interface.tracking_data import TrackingData
 
 SPREADSHEET_ID = ""
+FAKE_SPREADSHEET_ID = "fake-spreadsheet"
 TEST_TAB = "unit-testing"
 TEST_RANGE = "A1:C"
+SAMPLE_VALUES = [
+    ["Request_UUID", "Cell_SN", "Completed"],
+    ["request1", "some_num", "Done"],
+    ["request1", "other_num", "Queued"],
+    ["request1", "just_entered"],
+    ["request2", "done_num", "Done"],
+    ["request2"],
+    ["request3", "dup_num", " "],
+    ["request3", "dup_num", "Done"],
+]
 
 
 @pytest.mark.skip_on_github_actions()
@@ -107,3 +127,271 @@ def test_completed_request() -> None:
     sheet = TrackingSheet(SPREADSHEET_ID, TEST_TAB, TEST_RANGE)
     sheet.login()
     assert sheet.request_complete("request2")
+
+
+def test_values_api_reused() -> None:
+    """Test values_api builds one client per thread and credentials."""
+    sheet = TrackingSheet(SPREADSHEET_ID, TEST_TAB, TEST_RANGE)
+    sheet.creds = AnonymousCredentials()
+    values_api = sheet.values_api()
+    assert sheet.values_api() is values_api
+
+    other_thread = []
+    thread = threading.Thread(target=lambda: other_thread.append(sheet.values_api()))
+    thread.start()
+    thread.join()
+    assert other_thread[0] is not values_api
+
+    sheet.creds = AnonymousCredentials()
+    assert sheet.values_api() is not values_api
+
+
+def test_tracking_data_cache(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test the snapshot cache is reused until it expires or is invalidated."""
+    fetches = []
+
+    def fetch() -> TrackingData:
+        fetches.append(1)
+        return TrackingData.from_values(SAMPLE_VALUES, sheet.num_columns)
+
+    sheet = TrackingSheet(SPREADSHEET_ID, TEST_TAB, TEST_RANGE, cache_ttl=60)
+    monkeypatch.setattr(sheet, "_fetch_tracking_data", fetch)
+    sheet.get_tracking_data()
+    sheet.get_tracking_data()
+    assert (sheet.cache_hits, sheet.cache_misses, len(fetches)) == (1, 1, 1)
+
+    sheet.get_tracking_data(force_refresh=True)
+    assert len(fetches) == 2
+
+    sheet.invalidate_cache()
+    sheet.get_tracking_data()
+    assert (sheet.cache_hits, sheet.cache_misses, len(fetches)) == (1, 3, 3)
+
+    sheet.cache_ttl = 0
+    sheet.get_tracking_data()
+    assert len(fetches) == 4
+
+
+def test_indexed_queries(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test find_row, request_complete and next_unused_row_sn on indexed data."""
+    sheet = TrackingSheet(SPREADSHEET_ID, TEST_TAB, TEST_RANGE)
+    monkeypatch.setattr(
+        sheet,
+        "_fetch_tracking_data",
+        lambda: TrackingData.from_values(SAMPLE_VALUES, 2),
+    )
+    assert sheet.find_row("request1", "some_num") == 2
+    with pytest.raises(ValueError, match="not found"):
+        sheet.find_row("request1", "missing")
+    with pytest.raises(ValueError, match="found multiple times"):
+        sheet.find_row("request3", "dup_num")
+
+    assert not sheet.request_complete("request1")
+    assert sheet.request_complete("request2")
+    assert not sheet.request_complete("request3")
+    assert sheet.next_unused_row_sn("request1") == (4, "just_entered")
+    assert sheet.next_unused_row_sn("request3") == (7, "dup_num")
+    with pytest.raises(ValueError, match="not found"):
+        sheet.next_unused_row_sn("request2")
+
+
+class RecordingValuesApi:
+    """Stand-in for the values collection recording batchUpdate bodies."""
+
+    def __init__(self, fail: bool = False) -> None:
+        self.bodies: list[dict] = []
+        self.fail = fail
+
+    def batchUpdate(  # noqa: N802
+        self, spreadsheetId: str, body: dict  # noqa: N803
+    ) -> "RecordingValuesApi":
+        self.bodies.append(body)
+        return self
+
+    def execute(self) -> dict:
+        if self.fail:
+            raise HttpError(httplib2.Response({"status": 429}), b"quota")
+        return {}
+
+
+def test_put_values_by_address(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test batch writes merge repeated cells and adjacent rows."""
+    sheet = TrackingSheet(SPREADSHEET_ID, TEST_TAB, TEST_RANGE)
+    values_api = RecordingValuesApi()
+    monkeypatch.setattr(sheet, "values_api", lambda: values_api)
+    failures = sheet.put_values_by_address(
+        [(3, "C", "Queued"), (2, "C", "Done"), (3, "C", "Done"), (9, "C", "Done")]
+    )
+    assert failures == {}
+    assert values_api.bodies == [
+        {
+            "valueInputOption": "RAW",
+            "data": [
+                {
+                    "range": f"{TEST_TAB}!C2:C3",
+                    "majorDimension": "COLUMNS",
+                    "values": [["Done", "Done"]],
+                },
+                {
+                    "range": f"{TEST_TAB}!C9:C9",
+                    "majorDimension": "COLUMNS",
+                    "values": [["Done"]],
+                },
+            ],
+        }
+    ]
+
+
+def test_write_buffer(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test the write buffer flushes at its size limit and reports failed cells."""
+    sheet = TrackingSheet(SPREADSHEET_ID, TEST_TAB, TEST_RANGE)
+    values_api = RecordingValuesApi()
+    monkeypatch.setattr(sheet, "values_api", lambda: values_api)
+    with sheet.write_buffer(max_size=2) as buffer:
+        buffer.put(2, "C", "Queued")
+        buffer.put(2, "C", "Done")
+        assert len(values_api.bodies) == 0
+        buffer.put(3, "C", "Done")
+        assert len(values_api.bodies) == 1
+        buffer.put(4, "C", "Done")
+    assert len(values_api.bodies) == 2
+
+    values_api.fail = True
+    with pytest.raises(BatchWriteError) as err, sheet.write_buffer() as buffer:
+        buffer.put(5, "C", "Done")
+    assert list(err.value.failures) == [(5, "C")]
+
+
+def test_split_cell_range() -> None:
+    """Test splitting A1 ranges."""
+    assert split_cell_range("A1:C") == ("A", 1, "C", None)
+    assert split_cell_range("B:D20") == ("B", 1, "D", 20)
+    with pytest.raises(ValueError, match="not an A1 range"):
+        split_cell_range("")
+
+
+def test_streaming_stops_early(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test streamed queries only fetch the windows they need."""
+    ranges = []
+
+    def get_values(cell_range: str) -> list[list[str]]:
+        ranges.append(cell_range)
+        _, first_row, _, last_row = split_cell_range(cell_range)
+        return SAMPLE_VALUES[first_row - 1 : last_row]
+
+    sheet = TrackingSheet(SPREADSHEET_ID, TEST_TAB, TEST_RANGE, window_size=2)
+    monkeypatch.setattr(sheet, "_get_values", get_values)
+    assert sheet.next_unused_row_sn("request1") == (4, "just_entered")
+    assert ranges == ["A1:C1", "A2:C3", "A4:C5"]
+
+    assert [row for row, _ in sheet.iter_tracking_rows()] == list(
+        range(2, len(SAMPLE_VALUES) + 1)
+    )
+    assert ranges[-2:] == ["A8:C9", "A10:C11"]
+    assert sheet.request_complete("request2")
+
+
+def test_streaming_past_blank_rows() -> None:
+    """Test rows after a gap of blank rows crossing a window boundary are streamed."""
+    backend = FakeSheetsBackend()
+    backend.set_values(
+        FAKE_SPREADSHEET_ID,
+        TEST_TAB,
+        [*SAMPLE_VALUES[:3], [], [], ["request4", "late_num"]],
+    )
+    sheet = TrackingSheet(
+        FAKE_SPREADSHEET_ID, TEST_TAB, TEST_RANGE, window_size=3, http=backend.http()
+    )
+    rows = [row for row, row_data in sheet.iter_tracking_rows() if row_data]
+    assert rows == [2, 3, 6]
+    assert sheet.next_unused_row_sn("request4") == (6, "late_num")
+
+
+@pytest.fixture()
+def fake_backend() -> FakeSheetsBackend:
+    """Create a fake Sheets API holding SAMPLE_VALUES in the test tab.
+
+    Returns
+    -------
+        FakeSheetsBackend: The fake Sheets API
+    """
+    backend = FakeSheetsBackend()
+    backend.set_values(FAKE_SPREADSHEET_ID, TEST_TAB, SAMPLE_VALUES)
+    return backend
+
+
+def test_fake_backend_round_trip(fake_backend: FakeSheetsBackend) -> None:
+    """Test reads and writes through the Sheets client against the fake API."""
+    sheet = TrackingSheet(
+        FAKE_SPREADSHEET_ID, TEST_TAB, TEST_RANGE, http=fake_backend.http()
+    )
+    columns, data = sheet.get_tracking_data()
+    assert columns == SAMPLE_VALUES[0]
+    assert data[2] == {"Request_UUID": "request1", "Cell_SN": "just_entered"}
+    assert sheet.next_unused_row_sn("request1") == (4, "just_entered")
+
+    sheet.put_single_value_by_address(row=4, column="C", status="Done")
+    assert sheet.request_complete("request1")
+    assert sheet.put_values_by_address([(7, "C", "Done"), (8, "C", "Done")]) == {}
+    values = fake_backend.values(FAKE_SPREADSHEET_ID, TEST_TAB)
+    assert values[6] == ["request3", "dup_num", "Done"]
+    assert fake_backend.calls == {"get": 3, "update": 1, "batchUpdate": 1}
+
+
+def test_fake_backend_errors(fake_backend: FakeSheetsBackend) -> None:
+    """Test quota errors and injected failures surface as connection errors."""
+    sheet = TrackingSheet(
+        FAKE_SPREADSHEET_ID, TEST_TAB, TEST_RANGE, http=fake_backend.http()
+    )
+    fake_backend.fail_next(status=503)
+    with pytest.raises(ConnectionError):
+        sheet.get_tracking_data()
+
+    fake_backend.quota_per_minute = 1
+    assert sheet.put_values_by_address([(2, "C", "Done")]) != {}
+    with pytest.raises(ConnectionError):
+        TrackingSheet(
+            FAKE_SPREADSHEET_ID, "missing-tab", TEST_RANGE, http=fake_backend.http()
+        ).get_tracking_data()
+
+
+def test_claim_rows(fake_backend: FakeSheetsBackend) -> None:
+    """Test workers lease distinct rows and take back expired leases."""
+    sheet = TrackingSheet(
+        FAKE_SPREADSHEET_ID, TEST_TAB, TEST_RANGE, http=fake_backend.http()
+    )
+    assert sheet.claim_rows("request3", "worker1", count=2, settle_seconds=0) == [
+        (7, "dup_num")
+    ]
+    assert sheet.claim_rows("request3", "worker2", settle_seconds=0) == []
+    assert not sheet.request_complete("request3")
+    with pytest.raises(ValueError, match="not found"):
+        sheet.next_unused_row_sn("request3")
+
+    sheet.release_rows([7])
+    assert sheet.claim_rows(
+        "request3", "worker2", lease_seconds=-1, settle_seconds=0
+    ) == [(7, "dup_num")]
+    assert sheet.claim_rows("request3", "worker3", settle_seconds=0) == [(7, "dup_num")]
+    sheet.put_single_value_by_address(row=7, column="C", status="Done")
+    assert sheet.request_complete("request3")
+
+
+def test_concurrent_claims(fake_backend: FakeSheetsBackend) -> None:
+    """Test only one of two simultaneous claims of the same row keeps it."""
+    claims: dict[str, list[tuple[int, str]]] = {}
+
+    def claim(worker_id: str) -> None:
+        sheet = TrackingSheet(
+            FAKE_SPREADSHEET_ID, TEST_TAB, TEST_RANGE, http=fake_backend.http()
+        )
+        claims[worker_id] = sheet.claim_rows("request1", worker_id, settle_seconds=0.2)
+
+    threads = [
+        threading.Thread(target=claim, args=(f"worker{worker}",)) for worker in range(2)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(claims.values()) == [[], [(4, "just_entered")]]
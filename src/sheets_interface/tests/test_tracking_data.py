@@ -0,0 +1,49 @@
+"""Tests for src.sheets_interface.tracking_data.py."""
+
+from src.sheets_interface.tracking_data import TrackingData
+from src.sheets_interface.tracking_data import TrackingTable
+
+VALUES = [
+    ["Request_UUID", "Cell_SN", "Completed"],
+    ["request1", "sn1", "Done"],
+    [],
+    ["request1", "sn2"],
+    ["request2"],
+    ["request1", "sn1", " "],
+]
+
+
+def test_from_values() -> None:
+    """Test parsing and indexing the sheet values."""
+    tracking_data = TrackingData.from_values(VALUES, 2)
+    assert tracking_data.column_names == ["Request_UUID", "Cell_SN", "Completed"]
+    assert tracking_data.rows[0] == {
+        "Request_UUID": "request1",
+        "Cell_SN": "sn1",
+        "Completed": "Done",
+    }
+    assert tracking_data.rows[1] == {}
+    assert tracking_data.row_by_key == {("request1", "sn1"): 2, ("request1", "sn2"): 4}
+    assert tracking_data.duplicate_keys == {("request1", "sn1"): [2, 6]}
+    assert tracking_data.rows_by_request == {"request1": [2, 4, 6], "request2": [5]}
+    assert tracking_data.first_incomplete == {"request1": 4}
+    assert tracking_data.row_data(4) == {"Request_UUID": "request1", "Cell_SN": "sn2"}
+
+
+def test_tracking_table() -> None:
+    """Test the columnar table, its row views and the dicts built from it."""
+    table = TrackingTable.from_values(VALUES)
+    assert len(table) == 5
+    assert table.columns[0] == ["request1", None, "request1", "request2", "request1"]
+    assert table.columns[0][0] is table.columns[0][2]
+    assert list(table.widths) == [3, 0, 2, 1, 3]
+
+    row = table.row(2)
+    assert len(row) == 2
+    assert row["Cell_SN"] == "sn2"
+    assert "Completed" not in row
+    assert dict(row) == {"Request_UUID": "request1", "Cell_SN": "sn2"}
+
+    expected = [dict(zip(VALUES[0], values_row)) for values_row in VALUES[1:]]
+    assert table.to_dicts() == expected
+    assert [dict(row) for row in table] == expected
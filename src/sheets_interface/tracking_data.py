@@ -0,0 +1,458 @@
+"""Parsed tracking data and the indexes used to query it."""
+
+from array import array
+from collections.abc import Iterator
+from collections.abc import Mapping
+from dataclasses import dataclass
+from dataclasses import field
+from functools import cached_property
+
+# Sheet row number of the first data row; row 1 holds the column names.
+FIRST_DATA_ROW = 2
+# Columns whose values repeat across rows and are stored once per distinct value.
+POOLED_COLUMNS = ("Request_UUID", "Completed")
+# Status of a row leased by a worker:
+# Leased|<worker id>|<expiry, epoch seconds>|<claim id>.
+LEASE_PREFIX = "Leased|"
+
+
+@dataclass(frozen=True)
+class Lease:
+    """A worker's lease on a row, stored as the row's status.
+
+    Attributes
+    ----------
+    worker_id
+        The worker holding the lease.
+    expires_at
+        The expiry as epoch seconds.
+    claim_id
+        Identifies the claim that wrote the lease.
+    """
+
+    worker_id: str
+    expires_at: float
+    claim_id: str
+
+    @property
+    def status(self) -> str:
+        """The status the lease is stored as."""
+        return f"{LEASE_PREFIX}{self.worker_id}|{self.expires_at:.0f}|{self.claim_id}"
+
+    @classmethod
+    def from_status(cls, status: None | str) -> "None | Lease":
+        """Parse a status into a lease.
+
+        Parameters
+        ----------
+        status
+            The status of a row.
+
+        Returns
+        -------
+        None | Lease
+            The lease, or ``None`` if the status is not a lease.
+        """
+        if status is None or not status.startswith(LEASE_PREFIX):
+            return None
+        parts = status[len(LEASE_PREFIX) :].rsplit("|", 2)
+        if len(parts) != 3:
+            return None
+        worker_id, expires_at, claim_id = parts
+        try:
+            return cls(worker_id, float(expires_at), claim_id)
+        except ValueError:
+            return None
+
+
+def row_incomplete(row_data: Mapping[str, str], num_columns: int) -> bool:
+    """Determine if a row has a cell SN but no status.
+
+    Parameters
+    ----------
+    row_data
+        The values of the row, keyed by column name.
+    num_columns
+        The number of columns before the status column.
+
+    Returns
+    -------
+    bool
+        True if the row is still to be processed.
+    """
+    if len(row_data) > 1 and len(row_data) == num_columns:
+        return True
+    return len(row_data) > num_columns and row_data["Completed"].isspace()
+
+
+class RowView(Mapping[str, str]):
+    """Read-only view of one row of a ``TrackingTable``.
+
+    Behaves like the row's ``dict``: it only has the cells the API returned, so its
+    length is the row width.
+    """
+
+    __slots__ = ("_table", "_index")
+
+    def __init__(self, table: "TrackingTable", index: int) -> None:
+        self._table = table
+        self._index = index
+
+    def __getitem__(self, column_name: str) -> str:
+        table = self._table
+        try:
+            column = table.column_names.index(column_name)
+        except ValueError:
+            raise KeyError(column_name) from None
+        if column >= table.widths[self._index]:
+            raise KeyError(column_name)
+        return table.columns[column][self._index]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._table.column_names[: self._table.widths[self._index]])
+
+    def __len__(self) -> int:
+        return self._table.widths[self._index]
+
+    def __repr__(self) -> str:
+        return f"RowView({dict(self)!r})"
+
+
+class TrackingTable:
+    """Columnar tracking data with one list per column.
+
+    Missing cells are ``None`` and the number of cells the API returned for each row is
+    kept in ``widths``. Values of the ``POOLED_COLUMNS`` are deduplicated, so each
+    distinct request UUID or status is stored once.
+
+    Attributes
+    ----------
+    column_names
+        The column names of the cells. First row of the sheet.
+    columns
+        The values of each column, in sheet row order.
+    widths
+        The number of cells of each row.
+    """
+
+    __slots__ = ("column_names", "columns", "widths", "_appenders")
+
+    def __init__(self, column_names: list[str]) -> None:
+        self.column_names = column_names
+        self.columns: list[list[None | str]] = [[] for _ in column_names]
+        self.widths = array("H")
+        self._appenders = [
+            (cells.append, {} if column_name in POOLED_COLUMNS else None)
+            for cells, column_name in zip(self.columns, column_names)
+        ]
+
+    @classmethod
+    def from_values(cls, values: list[list[str]]) -> "TrackingTable":
+        """Parse the values of a tracking sheet.
+
+        Parameters
+        ----------
+        values
+            The cell values as returned by the Sheets API, starting with the column
+            names.
+
+        Returns
+        -------
+        TrackingTable
+            The parsed tracking data.
+        """
+        table = cls(values[0])
+        for values_row in values[1:]:
+            table.append(values_row)
+        return table
+
+    def append(self, values_row: list[str]) -> None:
+        """Append a row.
+
+        Parameters
+        ----------
+        values_row
+            The cell values of the row. Cells beyond the column names are dropped.
+        """
+        width = min(len(values_row), len(self._appenders))
+        self.widths.append(width)
+        for column, (append, pool) in enumerate(self._appenders):
+            if column < width:
+                value = values_row[column]
+                append(value if pool is None else pool.setdefault(value, value))
+            else:
+                append(None)
+
+    def __len__(self) -> int:
+        return len(self.widths)
+
+    def __iter__(self) -> Iterator[RowView]:
+        return (RowView(self, index) for index in range(len(self.widths)))
+
+    def row(self, index: int) -> RowView:
+        """Get a view of a row.
+
+        Parameters
+        ----------
+        index
+            The index of the row, 0 for the first data row.
+
+        Returns
+        -------
+        RowView
+            The view of the row.
+        """
+        return RowView(self, index)
+
+    def to_dicts(self) -> list[dict[str, str]]:
+        """Convert the table to one dict per row.
+
+        Returns
+        -------
+        list[dict[str, str]]
+            The values of each row, keyed by column name.
+        """
+        column_names = self.column_names
+        rows = zip(*self.columns) if self.columns else iter([()] * len(self.widths))
+        return [
+            dict(zip(column_names[:width], cells))
+            for width, cells in zip(self.widths, rows)
+        ]
+
+
+@dataclass
+class TrackingData:
+    """Tracking data of a sheet with indexes over the request UUID and cell SN.
+
+    Attributes
+    ----------
+    table
+        The values of the cells in columnar form.
+    row_by_key
+        The sheet row number of each (request UUID, cell SN) pair.
+    duplicate_keys
+        The sheet row numbers of each (request UUID, cell SN) pair found more than once.
+    rows_by_request
+        The sheet row numbers of each request UUID.
+    first_incomplete
+        The sheet row number of the first row without a status, for each request UUID
+        that has one.
+    leased_rows
+        The sheet row numbers of the rows leased by a worker, for each request UUID that
+        has any.
+    num_columns
+        The number of columns before the status column.
+    """
+
+    table: TrackingTable
+    row_by_key: dict[tuple[str, str], int] = field(default_factory=dict)
+    duplicate_keys: dict[tuple[str, str], list[int]] = field(default_factory=dict)
+    rows_by_request: dict[str, list[int]] = field(default_factory=dict)
+    first_incomplete: dict[str, int] = field(default_factory=dict)
+    leased_rows: dict[str, list[int]] = field(default_factory=dict)
+    num_columns: int = 2
+
+    @classmethod
+    def from_values(cls, values: list[list[str]], num_columns: int) -> "TrackingData":
+        """Parse the values of a tracking sheet and index them in a single pass.
+
+        Parameters
+        ----------
+        values
+            The cell values as returned by the Sheets API, starting with the column
+            names.
+        num_columns
+            The number of columns before the status column.
+
+        Returns
+        -------
+        TrackingData
+            The parsed and indexed tracking data.
+        """
+        table = TrackingTable(values[0])
+        tracking_data = cls(table, num_columns=num_columns)
+        row_by_key = tracking_data.row_by_key
+        duplicate_keys = tracking_data.duplicate_keys
+        rows_by_request = tracking_data.rows_by_request
+        first_incomplete = tracking_data.first_incomplete
+        leased_rows = tracking_data.leased_rows
+        widths = table.widths
+        columns = table.columns
+        status_index = (
+            table.column_names.index("Completed")
+            if "Completed" in table.column_names
+            else None
+        )
+
+        for index, values_row in enumerate(values[1:]):
+            table.append(values_row)
+            width = widths[index]
+            if width == 0:
+                continue
+
+            row = index + FIRST_DATA_ROW
+            request_uuid = columns[0][index]
+            request_rows = rows_by_request.get(request_uuid)
+            if request_rows is None:
+                rows_by_request[request_uuid] = [row]
+            else:
+                request_rows.append(row)
+            if width < 2:
+                continue
+
+            key = (request_uuid, columns[1][index])
+            if key in row_by_key:
+                duplicate_keys.setdefault(key, [row_by_key[key]]).append(row)
+            else:
+                row_by_key[key] = row
+            status = (
+                columns[status_index][index]
+                if width > num_columns and status_index is not None
+                else None
+            )
+            if request_uuid not in first_incomplete and (
+                width == num_columns or (status is not None and status.isspace())
+            ):
+                first_incomplete[request_uuid] = row
+            elif status is not None and status.startswith(LEASE_PREFIX):
+                leased_rows.setdefault(request_uuid, []).append(row)
+
+        return tracking_data
+
+    @property
+    def column_names(self) -> list[str]:
+        """The column names of the cells. First row of the sheet."""
+        return self.table.column_names
+
+    @cached_property
+    def rows(self) -> list[dict[str, str]]:
+        """The values of the cells, one dict per row.
+
+        Built from the table on first use.
+        """
+        return self.table.to_dicts()
+
+    def row_data(self, row: int) -> Mapping[str, str]:
+        """Get the values of a sheet row.
+
+        Parameters
+        ----------
+        row
+            The sheet row number.
+
+        Returns
+        -------
+        Mapping[str, str]
+            The values of the row, keyed by column name.
+        """
+        return self.table.row(row - FIRST_DATA_ROW)
+
+    def find_row(self, request_uuid: str, cell_sn: str) -> int:
+        """Find the row number by the request UUID and cell SN.
+
+        Parameters
+        ----------
+        request_uuid
+            The request UUID.
+        cell_sn
+            The cell SN.
+
+        Raises
+        ------
+        ValueError
+            If the request UUID and cell SN are not found or found multiple times.
+
+        Returns
+        -------
+        int
+            The row number.
+        """
+        key = (request_uuid, cell_sn)
+        if key not in self.row_by_key:
+            msg = f"Request UUID {request_uuid} and Cell SN {cell_sn} not found."
+            raise ValueError(msg)
+
+        if key in self.duplicate_keys:
+            msg = (
+                f"Request UUID {request_uuid} and Cell SN {cell_sn} "
+                "found multiple times."
+            )
+            raise ValueError(msg)
+
+        return self.row_by_key[key]
+
+    def first_incomplete_row(self, request_uuid: str) -> None | tuple[int, str]:
+        """Find the first row of a request without a status.
+
+        Parameters
+        ----------
+        request_uuid
+            The request UUID.
+
+        Returns
+        -------
+        None | tuple[int, str]
+            The row number and the cell SN, or ``None`` if every row of the request has
+            a status.
+        """
+        row = self.first_incomplete.get(request_uuid)
+        if row is None:
+            return None
+        return row, self.row_data(row)["Cell_SN"]
+
+    def request_complete(self, request_uuid: str) -> bool:
+        """Determine if the request is done.
+
+        A request is not done while it has rows without a status or rows leased by a
+        worker.
+
+        Parameters
+        ----------
+        request_uuid
+            The request UUID.
+
+        Returns
+        -------
+        bool
+            True if the request is done.
+        """
+        return (
+            request_uuid not in self.first_incomplete
+            and request_uuid not in self.leased_rows
+        )
+
+    def claimable_rows(
+        self, request_uuid: str, now: float, limit: int
+    ) -> list[tuple[int, str]]:
+        """Find the rows of a request a worker can lease.
+
+        These are the rows without a status and the rows whose lease expired, in sheet
+        order.
+
+        Parameters
+        ----------
+        request_uuid
+            The request UUID.
+        now
+            The current time as epoch seconds.
+        limit
+            The maximum number of rows.
+
+        Returns
+        -------
+        list[tuple[int, str]]
+            The row number and the cell SN of each row.
+        """
+        rows = []
+        for row in self.rows_by_request.get(request_uuid, []):
+            if len(rows) >= limit:
+                break
+            row_data = self.row_data(row)
+            if len(row_data) < 2:
+                continue
+            lease = Lease.from_status(row_data.get("Completed"))
+            if row_incomplete(row_data, self.num_columns) or (
+                lease is not None and lease.expires_at <= now
+            ):
+                rows.append((row, row_data["Cell_SN"]))
+        return rows
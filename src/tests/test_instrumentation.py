@@ -0,0 +1,185 @@
+"""Tests for src.instrumentation.py."""
+
+import asyncio
+import json
+from datetime import datetime
+from datetime import timezone
+
+import httpx
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from src.db.connector import Base
+from src.db.models import Users
+from src.instrumentation import SHEETS_METRICS
+from src.instrumentation import QueryMetrics
+from src.instrumentation import export_json
+from src.instrumentation import export_prometheus
+from src.instrumentation import instrument_engine
+from src.instrumentation import normalize_sql
+from src.instrumentation import snapshot
+from src.instrumentation import write_metrics
+from src.sheets_interface.async_sheets import AsyncTrackingSheet
+from src.sheets_interface.fake_sheets import FakeSheetsBackend
+from src.sheets_interface.sheets import TrackingSheet
+
+SPREADSHEET_ID = "fake-spreadsheet"
+TEST_TAB = "unit-testing"
+VALUES = [
+    ["Request_UUID", "Cell_SN", "Completed"],
+    ["request1", "some_num", "Done"],
+    ["request1", "just_entered"],
+]
+
+
+@pytest.fixture()
+def sheets_metrics():
+    """Reset the Sheets metrics of the process around a test."""
+    SHEETS_METRICS.reset()
+    yield SHEETS_METRICS
+    SHEETS_METRICS.reset()
+
+
+def test_normalize_sql() -> None:
+    """Test statements differing only in their values normalize alike."""
+    assert normalize_sql(
+        "SELECT users.id FROM users\n  WHERE users.id = %(id_1)s LIMIT 10"
+    ) == ("SELECT users.id FROM users WHERE users.id = ? LIMIT ?")
+    assert normalize_sql("SELECT * FROM t WHERE a IN (?, ?, ?) AND b = 'it''s'") == (
+        "SELECT * FROM t WHERE a IN (?) AND b = ?"
+    )
+    assert normalize_sql("SELECT x::text FROM posts_p2026_01 WHERE id = $1") == (
+        "SELECT x::text FROM posts_p2026_01 WHERE id = ?"
+    )
+
+
+def test_query_metrics(tmp_path) -> None:
+    """Test queries are timed and slow queries logged.
+
+    Repeated SELECTs in a transaction are reported.
+    """
+    engine = create_engine(f"sqlite:///{tmp_path / 'instrumentation.db'}")
+    Base.metadata.create_all(engine)
+    metrics = QueryMetrics()
+    instrument_engine(engine, metrics, slow_query_seconds=0, n_plus_one_threshold=3)
+
+    now = datetime.now(timezone.utc)
+    with Session(engine) as session:
+        session.add_all(
+            Users(
+                name=f"User {i}",
+                email=f"user{i}@you.com",
+                password="pw",
+                date_created=now,
+            )
+            for i in range(3)
+        )
+        session.commit()
+    with Session(engine) as session:
+        for i in range(3):
+            session.scalars(select(Users).where(Users.id == i + 1)).one()
+    with Session(engine) as session:
+        session.scalars(select(Users).where(Users.id == 1)).one()
+
+    result = metrics.snapshot()
+    assert result["latency"]["SELECT"]["count"] == 4
+    assert result["latency"]["INSERT"]["count"] >= 1
+    lookups = [
+        statement
+        for statement in result["statements"]
+        if statement.startswith("SELECT users.id")
+    ]
+    assert len(lookups) == 1
+    assert result["statements"][lookups[0]]["calls"] == 4
+    assert result["n_plus_one"] == {lookups[0]: 1}
+    assert result["slow_queries"]["count"] == sum(
+        kind["count"] for kind in result["latency"].values()
+    )
+    assert "?" in result["slow_queries"]["recent"][-1]["statement"]
+
+
+def test_sheet_metrics(sheets_metrics) -> None:
+    """Test operations record their latency and the API calls and bytes they caused."""
+    backend = FakeSheetsBackend()
+    backend.set_values(SPREADSHEET_ID, TEST_TAB, VALUES)
+    sheet = TrackingSheet(SPREADSHEET_ID, TEST_TAB, http=backend.http())
+    assert sheet.find_row("request1", "some_num") == 2
+    assert sheet.put_values_by_address([(3, "C", "Done")]) == {}
+    with pytest.raises(ValueError, match="not found"):
+        sheet.next_unused_row_sn("request2")
+
+    operations, api = (
+        sheets_metrics.snapshot()["operations"],
+        sheets_metrics.snapshot()["api"],
+    )
+    assert operations["TrackingSheet.find_row"]["latency"]["count"] == 1
+    assert operations["TrackingSheet.find_row"]["api_calls"] == 1
+    # Nested operations record the calls they caused too.
+    assert operations["TrackingSheet.get_tracking_snapshot"]["api_calls"] == 2
+    assert operations["TrackingSheet.next_unused_row_sn"]["errors"] == 1
+    assert operations["TrackingSheet.put_values_by_address"]["bytes_sent"] > 0
+    assert api["values.get"]["api_calls"] == backend.calls["get"] == 2
+    assert api["values.batchUpdate"]["api_calls"] == backend.calls["batchUpdate"] == 1
+    assert sum(stats["bytes_received"] for stats in api.values()) == backend.bytes_sent
+
+
+def test_async_sheet_metrics(sheets_metrics) -> None:
+    """Test async operations record the API calls of their concurrent requests."""
+    backend = FakeSheetsBackend()
+    backend.set_values(SPREADSHEET_ID, TEST_TAB, VALUES)
+
+    async def run() -> None:
+        async with httpx.AsyncClient(transport=backend.async_transport()) as client:
+            sheet = AsyncTrackingSheet(SPREADSHEET_ID, TEST_TAB, client=client)
+            await asyncio.gather(
+                sheet.find_row("request1", "some_num"),
+                sheet.request_complete("request1"),
+            )
+            await AsyncTrackingSheet(
+                "missing", TEST_TAB, client=client
+            ).put_values_by_address([(3, "C", "Done")])
+
+    asyncio.run(run())
+    operations, api = (
+        sheets_metrics.snapshot()["operations"],
+        sheets_metrics.snapshot()["api"],
+    )
+    assert operations["AsyncTrackingSheet.find_row"]["api_calls"] == 1
+    assert operations["AsyncTrackingSheet.get_tracking_snapshot"]["api_calls"] == 2
+    assert api["values.batchUpdate"]["errors"] == 1
+    assert sum(stats["bytes_received"] for stats in api.values()) == backend.bytes_sent
+
+
+def test_export(tmp_path, sheets_metrics) -> None:
+    """Test the metrics are exported as Prometheus text and JSON."""
+    backend = FakeSheetsBackend()
+    backend.set_values(SPREADSHEET_ID, TEST_TAB, VALUES)
+    TrackingSheet(SPREADSHEET_ID, TEST_TAB, http=backend.http()).find_row(
+        "request1", "some_num"
+    )
+
+    text = export_prometheus()
+    assert "# TYPE sheets_operation_duration_seconds histogram" in text
+    assert (
+        'sheets_operation_duration_seconds_count{operation="TrackingSheet.find_row"} 1'
+        in text
+    )
+    assert (
+        'sheets_operation_duration_seconds_bucket{operation="TrackingSheet.find_row",'
+        'le="+Inf"} 1' in text
+    )
+    assert 'sheets_api_bytes_received_total{method="values.get"}' in text
+    assert json.loads(export_json()) == json.loads(json.dumps(snapshot()))
+
+    write_metrics(tmp_path / "metrics.prom")
+    assert (
+        (tmp_path / "metrics.prom")
+        .read_text()
+        .startswith("# HELP db_query_duration_seconds")
+    )
+    write_metrics(tmp_path / "metrics.json", "json")
+    assert "sheets" in json.loads((tmp_path / "metrics.json").read_text())
+    with pytest.raises(ValueError, match="format"):
+        write_metrics(tmp_path / "metrics.txt", "xml")